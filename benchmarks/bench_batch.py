@@ -0,0 +1,51 @@
+# coding: utf-8
+"""Скорость пакетной симуляции и доля времени на разбор выстрелов массивами NumPy.
+
+Остальное время уходит на выбор выстрела объектами Game, по одной партии за раз.
+
+Запуск: python benchmarks/bench_batch.py [число партий]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import random
+import sys
+import time
+
+from seabattle import batch, density, game
+
+
+STRATEGIES = [
+    ('game', game.Game),
+    ('density', density.Game),
+]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    resolve = batch.Boards.resolve
+    spent = [0.0]
+
+    def timed_resolve(self, games, shots):
+        started = time.time()
+        try:
+            return resolve(self, games, shots)
+        finally:
+            spent[0] += time.time() - started
+
+    batch.Boards.resolve = timed_resolve
+    print('%-10s %10s %10s' % ('strategy', 'games/s', 'resolve'))
+    try:
+        for name, game_cls in STRATEGIES:
+            random.seed(0)
+            spent[0] = 0.0
+            started = time.time()
+            batch.shots_to_win(game_cls, games=count)
+            seconds = time.time() - started
+            print('%-10s %10.0f %9.1f%%' % (name, count / seconds, spent[0] / seconds * 100))
+    finally:
+        batch.Boards.resolve = resolve
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# coding: utf-8
+"""Сравнение списков и битовых масок на горячих операциях игры.
+
+Запуск: python benchmarks/bench_bitboard.py
+"""
+
+from __future__ import print_function, unicode_literals
+
+import random
+import timeit
+
+from seabattle import bitboard, game
+
+
+def play(game_cls):
+    """Играет одну партию стрелком game_cls против поля того же типа"""
+    shooter = game_cls()
+    target = game_cls()
+    shooter.start_new_game(numbers=True)
+    target.start_new_game(numbers=True)
+
+    while not shooter.is_victory():
+        position = shooter.convert_to_position(shooter.do_shot().replace(',', ''))
+        shooter.handle_enemy_reply(target.handle_enemy_shot(position))
+
+
+def bench(name, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=3))
+    print('%-40s %10.1f us' % (name, best / number * 1e6))
+
+
+def main():
+    random.seed(0)
+    for game_cls in (game.Game, bitboard.Game):
+        name = '%s.%s' % (game_cls.__module__, game_cls.__name__)
+
+        g = game_cls()
+        g.start_new_game()
+        bench('%s generate_field' % name, g.generate_field, 2000)
+
+        g.start_new_game()
+        ship_index = g.field.index(game.SHIP) if isinstance(g.field, list) else g.field.indexes(game.SHIP)[0]
+        bench('%s is_dead_ship' % name, lambda: g.is_dead_ship(ship_index), 20000)
+        bench('%s empty enemy cells' % name, g._empty_enemy_indexes, 20000)
+
+        bench('%s full game' % name, lambda: play(game_cls), 200)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+# coding: utf-8
+"""Разбор координат выстрела: прежние регулярные выражения с translit против словаря токенов.
+
+Запуск: python benchmarks/bench_coordinates.py
+"""
+
+from __future__ import print_function, unicode_literals
+
+import timeit
+
+from seabattle import coordinates, game
+
+from legacy import LegacyGame
+
+
+MESSAGES = ['5 7', '10 10', 'пять семь', 'восемь четыре', 'трень 5', 'пять10', 'а 1']
+
+
+def bench(name, parse, number=20000):
+    def run():
+        for message in MESSAGES:
+            try:
+                parse(message)
+            except ValueError:
+                pass
+
+    best = min(timeit.repeat(run, number=number, repeat=3))
+    print('%-40s %8.2f us' % (name, best / number / len(MESSAGES) * 1e6))
+
+
+def main():
+    bench('legacy regex + translit', LegacyGame().convert_to_position)
+    # без запоминания: каждая строка разбирается заново
+    bench('lexicon, cold', coordinates.CoordinateParser()._parse)
+    bench('lexicon, memoized', game.Game().convert_to_position)
+
+
+if __name__ == '__main__':
+    main()
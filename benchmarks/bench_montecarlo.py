@@ -0,0 +1,91 @@
+# coding: utf-8
+"""Сила стратегии montecarlo в зависимости от бюджета времени на выстрел.
+
+Для каждого бюджета стратегия играет одни и те же расстановки; печатается среднее число
+выстрелов до победы, сколько расстановок выбрано в секунду, доля расстановок, перешедших от
+прошлого выстрела, и сколько выстрелов сэкономила каждая лишняя миллисекунда бюджета по
+сравнению с предыдущей строкой. Первая строка -- density.Game для сравнения. Строки --samples
+играют с постоянным числом попыток на выстрел, как в турнирах, и воспроизводятся по зерну.
+
+Запуск: python benchmarks/bench_montecarlo.py [--games 300] [--budgets 1 2 5 10 20] [--samples 250 1000 4000]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import random
+import time
+
+from seabattle import density, game, layouts, montecarlo
+
+
+def play(game_cls, field):
+    target = game.Game()
+    target.start_new_game(field=list(field))
+
+    shooter = game_cls()
+    shooter.start_new_game()
+
+    shots = 0
+    durations = []
+    while not target.is_defeat():
+        started = time.time()
+        shooter.do_shot()
+        durations.append(time.time() - started)
+        shooter.handle_enemy_reply(target.handle_enemy_shot(shooter.last_shot_position))
+        shots += 1
+    return shots, durations
+
+
+def run(game_cls, fields):
+    random.seed(1)
+    shots = []
+    durations = []
+    for field in fields:
+        game_shots, game_durations = play(game_cls, field)
+        shots.append(game_shots)
+        durations.extend(game_durations)
+    durations.sort()
+    return sum(shots) / float(len(shots)), durations[int(len(durations) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сила montecarlo в зависимости от бюджета на выстрел')
+    parser.add_argument('--games', type=int, default=300)
+    parser.add_argument('--budgets', type=float, nargs='+', default=[1, 2, 5, 10, 20])
+    parser.add_argument('--samples', type=int, nargs='*', default=[250, 1000, 4000])
+    args = parser.parse_args()
+
+    random.seed(0)
+    fields = [layouts.generate_field() for _ in range(args.games)]
+
+    print('%-14s %10s %12s %14s %8s %14s' % (
+        'budget ms', 'avg shots', 'p99 shot ms', 'samples/s', 'reused', 'shots per ms'))
+    mean, p99 = run(density.Game, fields)
+    print('%-14s %10.2f %12.2f' % ('density', mean, p99 * 1e3))
+
+    previous = None
+    montecarlo.Game.samples_per_shot = 0
+    for budget in args.budgets:
+        montecarlo.Game.budget = budget / 1e3
+        montecarlo.cache = montecarlo.SampleCache()
+        montecarlo.stats = montecarlo.Stats()
+        mean, p99 = run(montecarlo.Game, fields)
+        info = montecarlo.stats.info()
+        reused = info['reused'] / float(info['reused'] + info['samples'])
+        gain = (previous[1] - mean) / (budget - previous[0]) if previous else float('nan')
+        print('%-14s %10.2f %12.2f %14.0f %7.0f%% %14.3f' % (
+            budget, mean, p99 * 1e3, info['samples_per_second'], reused * 100, gain))
+        previous = budget, mean
+
+    for samples in args.samples:
+        montecarlo.Game.samples_per_shot = samples
+        montecarlo.cache = montecarlo.SampleCache()
+        montecarlo.stats = montecarlo.Stats()
+        mean, p99 = run(montecarlo.Game, fields)
+        print('%-14s %10.2f %12.2f %14.0f' % (
+            '%s samples' % samples, mean, p99 * 1e3, montecarlo.stats.info()['samples_per_second']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# coding: utf-8
+"""Пропускная способность и задержка разбора NLU: по одной реплике и пачками (nlu.BatchParser).
+
+Клиенты в потоках без пауз разбирают реплики; для каждого числа одновременных клиентов
+печатается число реплик в секунду, перцентили задержки и средний размер пачки.
+
+По умолчанию разбирает обученная модель из mldata/ (нужен rasa_nlu). С --synthetic модель
+заменяется вызовом со стоимостью --call-ms на вызов и --item-ms на реплику: так видно, как
+ведет себя сборка пачек, но цифры не говорят о настоящей модели.
+
+Запуск: python benchmarks/bench_nlu_batch.py [--synthetic] [--concurrency 1 4 16 64]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import threading
+import time
+
+from seabattle import nlu
+
+
+MESSAGES = [
+    'новая игра с васей', 'давай начнем', 'мимо е 5', 'ранил', 'убил', 'повтори',
+    'я стреляю в а 1', 'попал', 'не попал', 'потопил корабль', 'сдаюсь', 'ты выиграла',
+]
+
+
+class SyntheticModel(object):
+    """Модель, у которой вызов стоит call_ms, а каждая реплика -- item_ms, без GIL"""
+
+    def __init__(self, call_ms, item_ms):
+        self.call = call_ms / 1e3
+        self.item = item_ms / 1e3
+        # модель одна: одновременные вызовы ждут друг друга, как на одном ядре
+        self.lock = threading.Lock()
+
+    def parse_batch(self, texts):
+        with self.lock:
+            time.sleep(self.call + self.item * len(texts))
+        return [{'text': text, 'intent': {'name': 'miss', 'confidence': 1.0}, 'entities': []} for text in texts]
+
+    def parse(self, text):
+        return self.parse_batch([text])[0]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def run(parse, concurrency, duration):
+    latencies = []
+    stop = time.time() + duration
+
+    def client(offset):
+        i = offset
+        while time.time() < stop:
+            started = time.time()
+            parse(MESSAGES[i % len(MESSAGES)])
+            latencies.append(time.time() - started)
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / (time.time() - started), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Разбор NLU по одной реплике и пачками')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--batch-size', type=int, default=nlu.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--wait-ms', type=float, default=nlu.DEFAULT_BATCH_WAIT * 1e3)
+    parser.add_argument('--synthetic', action='store_true', help='модель-заглушка вместо mldata/')
+    parser.add_argument('--call-ms', type=float, default=4)
+    parser.add_argument('--item-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model = SyntheticModel(args.call_ms, args.item_ms)
+        print('synthetic model: %.1f ms per call + %.1f ms per message' % (args.call_ms, args.item_ms))
+    else:
+        model = nlu.InterpreterBatch.load()
+        model.parse = lambda text: model.parse_batch([text])[0]
+        model.parse_batch(MESSAGES)
+
+    print('%-8s %-12s %10s %8s %8s %8s %6s' % ('clients', 'mode', 'req/s', 'p50 ms', 'p99 ms', 'max ms', 'batch'))
+    for concurrency in args.concurrency:
+        batch_parser = nlu.BatchParser(model.parse_batch, max_batch_size=args.batch_size,
+                                       max_wait=args.wait_ms / 1e3)
+        for mode, parse in [('single', model.parse), ('batch', batch_parser.parse)]:
+            rate, latencies = run(parse, concurrency, args.duration)
+            batch = batch_parser.info().get('mean_batch_size', 1) if mode == 'batch' else 1
+            print('%-8s %-12s %10.0f %8.1f %8.1f %8.1f %6.1f' % (
+                concurrency, mode, rate, percentile(latencies, 0.5) * 1e3,
+                percentile(latencies, 0.99) * 1e3, max(latencies) * 1e3, batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# coding: utf-8
+"""Скорость и хвосты времени генерации расстановок: прежний перебор наугад против
+расстановки по допустимым вариантам (placement.generate_layout).
+
+Запуск: python benchmarks/bench_placement.py [число расстановок]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import random
+import signal
+import sys
+import time
+
+from seabattle import game
+
+from legacy import LegacyGame
+
+
+FLEETS = [
+    ('default', game.BaseGame.default_ships),
+    ('crowded', [4, 4, 3, 3, 3, 2, 2, 2, 2, 1, 1, 1, 1, 1]),
+]
+# сколько секунд ждем прежний генератор, прежде чем считать, что он завис
+LEGACY_TIMEOUT = 5
+
+
+class Timeout(Exception):
+    pass
+
+
+def _alarm(signum, frame):
+    raise Timeout()
+
+
+def measure(game_cls, ships, count):
+    g = game_cls()
+    g.start_new_game(field=[game.EMPTY] * 100, ships=ships)
+
+    durations = []
+    signal.signal(signal.SIGALRM, _alarm)
+    started = time.time()
+    try:
+        for _ in range(count):
+            signal.alarm(LEGACY_TIMEOUT)
+            layout_started = time.time()
+            g.generate_field()
+            durations.append(time.time() - layout_started)
+    except Timeout:
+        return None
+    finally:
+        signal.alarm(0)
+
+    durations.sort()
+    return {
+        'per_second': count / (time.time() - started),
+        'p99': durations[int(len(durations) * 0.99)] * 1e3,
+        'max': durations[-1] * 1e3,
+    }
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    random.seed(0)
+
+    print('%-10s %-12s %14s %10s %10s' % ('fleet', 'generator', 'layouts/s', 'p99, ms', 'max, ms'))
+    for fleet_name, ships in FLEETS:
+        for game_cls in (LegacyGame, game.Game):
+            result = measure(game_cls, ships, count)
+            if result is None:
+                print('%-10s %-12s %14s' % (fleet_name, game_cls.__name__, 'hung > %ss' % LEGACY_TIMEOUT))
+                continue
+            print('%-10s %-12s %14.0f %10.3f %10.3f' % (
+                fleet_name, game_cls.__name__, result['per_second'], result['p99'], result['max']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# coding: utf-8
+"""Сборка ответа навыка на выстрел: форматирование шаблонов и JSON ответа Алисе.
+
+До: шаблоны форматируются через %% со словарем, ответ собирается словарем и кодируется
+json.dumps целиком. После: текст и TTS берутся готовыми для клетки, поле response --
+из кэша закодированных фрагментов.
+
+Запуск: python benchmarks/bench_response.py
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import timeit
+
+from seabattle import dialog_manager as dm, protocol
+
+
+REQUEST = {
+    'version': '1.0',
+    'session': {
+        'new': False,
+        'message_id': 4,
+        'session_id': '2eac4854-fce721f3-b845abba-20d60',
+        'skill_id': '3ad36498-f5rd-4079-a14b-788652932056',
+        'user_id': 'AC9WC3DF6FCE052E45A4566A48E6B7193774B84814CE49A922E163B8B29881DC',
+    },
+    'request': {'command': 'мимо 5 7', 'original_utterance': 'мимо 5 7'},
+}
+SHOTS = ['%s, %s' % (x, y) for x in range(1, 11) for y in range(1, 11)]
+
+
+def before(shot):
+    response_dict = {'shot': shot, 'tts_shot': dm._shot_to_tts(shot)}
+    dmresponse = dm.DMResponse(
+        'miss', dm.MESSAGE_TEMPLATES['miss'] % response_dict, dm.TTS_TEMPLATES['miss'] % response_dict, False)
+    response = {
+        'version': REQUEST['version'],
+        'session': REQUEST['session'],
+        'response': {'text': dmresponse.text, 'end_session': dmresponse.end_session},
+    }
+    if dmresponse.tts is not None:
+        response['response']['tts'] = dmresponse.tts
+    return json.dumps(response)
+
+
+def after(shot):
+    text, tts = dm.SHOT_RESPONSES['miss', shot]
+    return protocol.encode_response(REQUEST, dm.DMResponse('miss', text, tts, False))
+
+
+def bench(name, func, number=200):
+    def run():
+        for shot in SHOTS:
+            func(shot)
+
+    best = min(timeit.repeat(run, number=number, repeat=3))
+    print('%-10s %8.2f us per response' % (name, best / number / len(SHOTS) * 1e6))
+
+
+def main():
+    assert json.loads(before('5, 7')) == json.loads(after('5, 7'))
+    bench('before', before)
+    bench('after', after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# coding: utf-8
+"""Холодный старт сервера навыка: время до готовности и до первого ответа.
+
+Запускает python -m seabattle.server и замеряет:
+- import: импорт seabattle.dialog_manager в отдельном процессе;
+- ready: от запуска процесса до GET /ready == 200 (с прогревом -- модель загружена);
+- first: задержка первой реплики, которая уходит в модель NLU.
+
+Запуск: python benchmarks/bench_startup.py [--runs 3]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+from load_test import _free_port
+
+
+# реплика, которую не разбирает быстрый путь: ее разбирает модель
+MESSAGE = 'давай сыграем в морской бой с петей'
+
+
+def _env(warm_up):
+    return dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get('PYTHONPATH', '')]),
+                SEABATTLE_LOG_LEVEL='WARNING', SEABATTLE_WARM_UP='1' if warm_up else '0')
+
+
+def measure_import():
+    started = time.time()
+    subprocess.check_call([sys.executable, '-c', 'import seabattle.dialog_manager'], env=_env(False))
+    return time.time() - started
+
+
+def _request(connection, method, path, body=None):
+    connection.request(method, path, body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def measure_server(warm_up):
+    port = _free_port()
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'seabattle.server', '--host', '127.0.0.1', '--port', str(port)], env=_env(warm_up))
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError('server exited with %s' % process.returncode)
+            try:
+                connection = HTTPConnection('127.0.0.1', port, timeout=60)
+                if _request(connection, 'GET', '/ready') == 200:
+                    break
+            except (IOError, OSError):
+                pass
+            time.sleep(0.02)
+        ready = time.time() - started
+
+        body = json.dumps({
+            'version': '1.0',
+            'session': {'user_id': 'startup', 'session_id': '1'},
+            'request': {'command': MESSAGE, 'original_utterance': MESSAGE},
+        }).encode('utf-8')
+        request_started = time.time()
+        _request(connection, 'POST', '/', body)
+        return ready, time.time() - request_started
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Холодный старт сервера навыка')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    print('import seabattle.dialog_manager: %.2f s' % min(imports))
+    for warm_up in (True, False):
+        results = [measure_server(warm_up) for _ in range(args.runs)]
+        ready = min(r for r, _ in results)
+        first = min(f for _, f in results)
+        print('%-12s ready %.2f s, first response %.0f ms, start to first response %.2f s' % (
+            'warm-up' if warm_up else 'no warm-up', ready, first * 1e3, ready + first))
+
+
+if __name__ == '__main__':
+    main()
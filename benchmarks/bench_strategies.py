@@ -0,0 +1,66 @@
+# coding: utf-8
+"""Сравнение стратегий стрельбы: сколько выстрелов нужно, чтобы потопить весь флот,
+и сколько времени уходит на выбор одного выстрела.
+
+Каждая стратегия стреляет по одним и тем же расстановкам.
+
+Запуск: python benchmarks/bench_strategies.py [число партий]
+"""
+
+from __future__ import print_function, unicode_literals
+
+import random
+import sys
+import time
+
+from seabattle import density, game, layouts, montecarlo
+
+
+STRATEGIES = [
+    ('game', game.Game),
+    ('density', density.Game),
+    ('montecarlo', montecarlo.Game),
+]
+
+
+def play(game_cls, field):
+    """Число выстрелов до победы над флотом field и время выбора каждого выстрела"""
+    target = game.Game()
+    target.start_new_game(field=list(field))
+
+    shooter = game_cls()
+    shooter.start_new_game()
+
+    durations = []
+    while not target.is_defeat():
+        started = time.time()
+        shooter.do_shot()
+        durations.append(time.time() - started)
+        shooter.handle_enemy_reply(target.handle_enemy_shot(shooter.last_shot_position))
+    return len(durations), durations
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    random.seed(0)
+    fields = [layouts.generate_field() for _ in range(count)]
+
+    print('%-10s %10s %8s %8s %12s %12s' % ('strategy', 'avg shots', 'p50', 'p90', 'p50 shot, ms', 'p99 shot, ms'))
+    for name, game_cls in STRATEGIES:
+        random.seed(1)
+        shots = []
+        durations = []
+        for field in fields:
+            game_shots, game_durations = play(game_cls, field)
+            shots.append(game_shots)
+            durations.extend(game_durations)
+
+        shots.sort()
+        durations.sort()
+        print('%-10s %10.2f %8d %8d %12.3f %12.3f' % (
+            name, sum(shots) / float(len(shots)), shots[len(shots) // 2], shots[int(len(shots) * 0.9)],
+            durations[len(durations) // 2] * 1e3, durations[int(len(durations) * 0.99)] * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# coding: utf-8
+"""Сравнение табличных методов Game с прежними реализациями на арифметике и рекурсии.
+
+Запуск: python benchmarks/bench_tables.py
+"""
+
+from __future__ import print_function, unicode_literals
+
+import random
+import timeit
+
+from seabattle import game
+from seabattle.game import EMPTY, SHIP, HIT, MISS
+
+from legacy import LegacyGame
+
+
+# горизонтальный четырехпалубный корабль в середине поля, подбитый целиком
+SHIP_CELLS = [(4, 5), (5, 5), (6, 5), (7, 5)]
+
+
+def bench(name, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=3))
+    print('%-58s %8.2f us' % (name, best / number * 1e6))
+
+
+def main():
+    random.seed(0)
+    for game_cls in (LegacyGame, game.Game):
+        name = game_cls.__name__
+
+        g = game_cls()
+        g.start_new_game(field=[EMPTY] * 100)
+        for position in SHIP_CELLS:
+            g.field[g.calc_index(position)] = HIT
+        bench('%s is_dead_ship' % name, lambda: g.is_dead_ship(g.calc_index(SHIP_CELLS[1])), 20000)
+
+        # повторный выстрел по потопленному кораблю
+        field = [EMPTY] * 100
+        for x, y in SHIP_CELLS:
+            field[(y - 1) * 10 + x - 1] = SHIP
+        g.start_new_game(field=field)
+        for position in SHIP_CELLS:
+            g.handle_enemy_shot(position)
+        bench('%s handle_enemy_shot' % name, lambda: g.handle_enemy_shot(SHIP_CELLS[1]), 20000)
+
+        g.start_new_game()
+        bench('%s generate_field' % name, g.generate_field, 2000)
+
+        def regular_shots():
+            # все обычные выстрелы партии по полю без кораблей, каждый -- промах
+            g.start_new_game(field=[EMPTY] * 100)
+            for _ in range(100):
+                g.enemy_field[g.calc_index(g.get_next_regular_shot_position())] = MISS
+        bench('%s 100 regular shots' % name, regular_shots, 200)
+
+        def mark_around():
+            g.enemy_field = [EMPTY] * 100
+            for position in SHIP_CELLS:
+                g.enemy_field[g.calc_index(position)] = SHIP
+            g.mark_positions_around_ship_as_missed(SHIP_CELLS[1])
+        bench('%s mark_positions_around_ship_as_missed' % name, mark_around, 5000)
+
+        g.enemy_field = [EMPTY] * 100
+        for position in SHIP_CELLS[:3]:
+            g.enemy_field[g.calc_index(position)] = SHIP
+        bench('%s get_next_possible_shots' % name, lambda: g.get_next_possible_shots(SHIP_CELLS[1]), 20000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+# coding: utf-8
+"""Прежние реализации методов Game, с которыми сравниваются бенчмарки"""
+
+from __future__ import unicode_literals
+
+import random
+import re
+
+from transliterate import translit
+
+from seabattle import game
+from seabattle.game import EMPTY, SHIP, BLOCKED, HIT, MISS, UP, DOWN, LEFT, RIGHT, HORIZONTAL, VERTICAL
+
+
+class LegacyGame(game.Game):
+    """Прежние реализации методов, пересчитывавшие соседей на каждом вызове"""
+
+    def start_new_game(self, size=10, field=None, ships=None, numbers=None):
+        super(LegacyGame, self).start_new_game(size=size, field=field, ships=ships, numbers=numbers)
+        self.predefined_shots_by_step_4 = self.predefined_shots(step=4)
+        self.predefined_shots_by_step_2 = self.predefined_shots(step=2)
+
+    def get_next_regular_shot_position(self):
+        def get_next_position():
+            not_used_predefined_shots_by_step_4 = [
+                (idx, position) for idx, position in enumerate(self.predefined_shots_by_step_4)
+                if position is not None]
+            if not_used_predefined_shots_by_step_4:
+                idx, position = random.choice(not_used_predefined_shots_by_step_4)
+                # отмечаем, что использовали выстрел
+                self.predefined_shots_by_step_4[idx] = None
+                return position
+
+            not_used_predefined_shots_by_step_2 = [
+                (idx, position) for idx, position in enumerate(self.predefined_shots_by_step_2)
+                if position is not None]
+            if not_used_predefined_shots_by_step_2:
+                idx, position = random.choice(not_used_predefined_shots_by_step_2)
+                # отмечаем, что использовали выстрел
+                self.predefined_shots_by_step_2[idx] = None
+                return position
+
+            index = random.choice(self._empty_enemy_indexes())
+            return self.calc_position(index)
+
+        next_position = get_next_position()
+        while self.get_enemy_position_status(position=next_position) != EMPTY:
+            next_position = get_next_position()
+
+        return next_position
+
+    def handle_enemy_shot(self, position):
+        index = self.calc_index(position)
+
+        if self.field[index] == SHIP:
+            self.field[index] = HIT
+
+            if self.is_dead_ship(index):
+                self.ships_count -= 1
+                return 'kill'
+            else:
+                return 'hit'
+        elif self.field[index] == HIT:
+            return 'kill' if self.is_dead_ship(index) else 'hit'
+        else:
+            return 'miss'
+
+    def is_dead_ship(self, last_index):
+        x, y = self.calc_position(last_index)
+        x -= 1
+        y -= 1
+
+        def _line_is_dead(line, index):
+            def _tail_is_dead(tail):
+                for i in tail:
+                    if i == HIT:
+                        continue
+                    elif i == SHIP:
+                        return False
+                    else:
+                        return True
+                return True
+
+            return _tail_is_dead(line[index:]) and _tail_is_dead(line[index::-1])
+
+        return (
+            _line_is_dead(self.field[x::self.size], y) and
+            _line_is_dead(self.field[y * self.size:(y + 1) * self.size], x)
+        )
+
+    def generate_field(self):
+        self.field = [0] * self.size ** 2
+
+        for length in self.ships:
+            self.place_ship(length)
+
+        for i in range(len(self.field)):
+            if self.field[i] == BLOCKED:
+                self.field[i] = EMPTY
+
+    def place_ship(self, length):
+        def _try_to_place():
+            x = random.randint(1, self.size)
+            y = random.randint(1, self.size)
+            direction = random.choice([1, self.size])
+
+            index = self.calc_index((x, y))
+            values = self.field[index:None if direction == self.size else index + self.size - index % self.size:direction][:length]
+
+            if len(values) < length or any(values):
+                return False
+
+            for i in range(length):
+                current_index = index + direction * i
+
+                for j in [0, 1, -1]:
+                    if (j != 0
+                            and current_index % self.size in (0, self.size - 1)
+                            and (current_index + j) % self.size in (0, self.size - 1)):
+                        continue
+
+                    for k in [0, self.size, -self.size]:
+                        neighbour_index = current_index + k + j
+
+                        if (neighbour_index < 0
+                                or neighbour_index >= len(self.field)
+                                or self.field[neighbour_index] == SHIP):
+                            continue
+
+                        self.field[neighbour_index] = BLOCKED
+
+                self.field[current_index] = SHIP
+
+            return True
+
+        while not _try_to_place():
+            pass
+
+    def mark_positions_around_ship_as_missed(self, position, direction=None):
+        x, y = position
+        self.mark_enemy_position((x + 1, y - 1), MISS)
+        self.mark_enemy_position((x + 1, y + 1), MISS)
+        self.mark_enemy_position((x - 1, y - 1), MISS)
+        self.mark_enemy_position((x - 1, y + 1), MISS)
+
+        for current_direction, next_position in ((UP, (x, y - 1)), (RIGHT, (x + 1, y)),
+                                                 (DOWN, (x, y + 1)), (LEFT, (x - 1, y))):
+            if direction in (None, current_direction):
+                if self.get_enemy_position_status(position=next_position) == SHIP:
+                    self.mark_positions_around_ship_as_missed(position=next_position, direction=current_direction)
+                else:
+                    self.mark_enemy_position(next_position, MISS)
+
+    def get_next_possible_shots(self, position, direction=None):
+        start_x, start_y = position
+
+        ship_orientation = None
+        possible_shots = {VERTICAL: [], HORIZONTAL: []}
+
+        for current_direction, orientation, next_position in (
+                (UP, VERTICAL, (start_x, start_y - 1)), (DOWN, VERTICAL, (start_x, start_y + 1)),
+                (RIGHT, HORIZONTAL, (start_x + 1, start_y)), (LEFT, HORIZONTAL, (start_x - 1, start_y))):
+            if direction in (None, current_direction):
+                enemy_position_status = self.get_enemy_position_status(position=next_position)
+                if enemy_position_status == SHIP:
+                    ship_orientation = orientation
+                    possible_shots[orientation] += self.get_next_possible_shots(
+                        position=next_position, direction=current_direction)
+                elif enemy_position_status == EMPTY:
+                    possible_shots[orientation].append(next_position)
+
+        if ship_orientation is not None:
+            return possible_shots[ship_orientation]
+        return possible_shots[VERTICAL] + possible_shots[HORIZONTAL]
+
+    position_patterns = [re.compile('^([a-zа-я]+)(\d+)$', re.UNICODE),  # a1
+                         re.compile('^([a-zа-я]+)\s+(\w+)$', re.UNICODE),  # a 1; a один
+                         re.compile('^(\w+)\s+(\w+)$', re.UNICODE),  # a 1; a один; 7 10
+                         ]
+
+    def convert_to_position(self, position):
+        position = position.lower()
+        for pattern in self.position_patterns:
+            match = pattern.match(position)
+
+            if match is not None:
+                break
+        else:
+            raise ValueError('Can\'t parse entire position: %s' % position)
+
+        bits = match.groups()
+
+        def _try_letter(bit):
+            # проверяем особые случаи неправильного распознования STT
+            bit = self.letters_mapping.get(bit, bit)
+
+            # преобразуем в кириллицу
+            bit = translit(bit, 'ru')
+
+            try:
+                return self.str_letters.index(bit) + 1
+            except ValueError:
+                raise
+
+        def _try_number(bit):
+            # проверяем особые случаи неправильного распознования STT
+            bit = self.letters_mapping.get(bit, bit)
+
+            if bit.isdigit():
+                return int(bit)
+            else:
+                try:
+                    return self.str_numbers.index(bit) + 1
+                except ValueError:
+                    raise
+
+        x = bits[0].strip()
+        try:
+            x = _try_number(x)
+        except ValueError:
+            raise ValueError('Can\'t parse X point: %s' % x)
+
+        y = bits[1].strip()
+        try:
+            y = _try_number(y)
+        except ValueError:
+            raise ValueError('Can\'t parse Y point: %s' % y)
+
+        return x, y
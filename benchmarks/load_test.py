@@ -0,0 +1,161 @@
+# coding: utf-8
+"""Нагрузочный тест вебхука: пропускная способность и хвосты задержки.
+
+Каждый клиент -- отдельный игрок, который по кругу отправляет реплики партии.
+Сервер можно запустить самому или поручить это тесту:
+    python benchmarks/load_test.py --spawn flask --clients 16 --duration 20
+    python benchmarks/load_test.py --spawn server --clients 16 --duration 20
+    python benchmarks/load_test.py --url http://127.0.0.1:5000/ --clients 16
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from http.client import HTTPConnection
+    from urllib.parse import urlparse
+except ImportError:
+    from httplib import HTTPConnection
+    from urlparse import urlparse
+
+from seabattle import protocol
+
+
+SCRIPT = ['новая игра', 'начинаем', 'мимо а 1', 'ранил', 'убил', 'мимо б 2', 'мимо в 3', 'повтори']
+
+
+def _free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def spawn(kind):
+    """Запускает сервер в отдельном процессе и ждет, пока он начнет принимать соединения"""
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.getcwd(), os.environ.get('PYTHONPATH', '')]),
+               SEABATTLE_LOG_LEVEL='WARNING')
+    if kind == 'flask':
+        env['FLASK_APP'] = os.path.join('seabattle', 'api.py')
+        command = [sys.executable, '-m', 'flask', 'run', '--port', str(port)]
+    else:
+        command = [sys.executable, '-m', 'seabattle.server', '--host', '127.0.0.1', '--port', str(port)]
+    process = subprocess.Popen(command, env=env)
+
+    for _ in range(300):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, 'http://127.0.0.1:%s/' % port
+        except socket.error:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('%s server did not start' % kind)
+
+
+def client(url, number, deadline, results):
+    parsed = urlparse(url)
+    connection = HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    step = 0
+    while time.time() < deadline:
+        body = json.dumps({
+            'version': '1.0',
+            'session': {'user_id': 'load-test-%s' % number, 'session_id': str(number)},
+            'request': {'command': SCRIPT[step % len(SCRIPT)], 'original_utterance': ''},
+        })
+        step += 1
+
+        started = time.time()
+        try:
+            connection.request('POST', parsed.path or '/', body.encode('utf-8'), {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            data = response.read().decode('utf-8')
+            ok = response.status == 200
+        except (socket.error, IOError):
+            connection.close()
+            connection = HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+            ok = False
+            data = ''
+        elapsed = time.time() - started
+
+        if not ok:
+            results.append((elapsed, 'error'))
+        elif protocol.RETRY_TEXT in data:
+            results.append((elapsed, 'retry'))
+        else:
+            results.append((elapsed, 'ok'))
+
+
+def run(url, clients, duration):
+    results = []
+    deadline = time.time() + duration
+    threads = [threading.Thread(target=client, args=(url, number, deadline, results)) for number in range(clients)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    if not latencies:
+        return {'requests': 0}
+
+    def percentile(percent):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100.0))] * 1e3
+
+    return {
+        'requests': len(results),
+        'per_second': len(results) / elapsed,
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p99': percentile(99),
+        'max': latencies[-1] * 1e3,
+        'retries': sum(1 for _, status in results if status == 'retry'),
+        'errors': sum(1 for _, status in results if status == 'error'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест вебхука')
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--spawn', choices=['flask', 'server'], default=None)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if args.spawn:
+        process, url = spawn(args.spawn)
+    elif not url:
+        parser.error('either --url or --spawn is required')
+
+    try:
+        result = run(url, args.clients, args.duration)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print('%-10s %8s %8s %9s %9s %9s %9s %8s %8s' % (
+        'target', 'requests', 'req/s', 'p50, ms', 'p90, ms', 'p99, ms', 'max, ms', 'retries', 'errors'))
+    if not result['requests']:
+        print('%-10s %8s' % (args.spawn or 'url', 0))
+        return
+    print('%-10s %8d %8.1f %9.2f %9.2f %9.2f %9.2f %8d %8d' % (
+        args.spawn or 'url', result['requests'], result['per_second'], result['p50'], result['p90'], result['p99'],
+        result['max'], result['retries'], result['errors']))
+
+
+if __name__ == '__main__':
+    main()
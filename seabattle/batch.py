@@ -0,0 +1,205 @@
+# coding: utf-8
+"""Пакетный разбор выстрелов для оценки стратегий стрельбы.
+
+Ускорен только разбор ответов: поля всех партий пачки хранятся в массивах NumPy, и
+попадания, потопления и конец игры считаются сразу для всех партий одной операцией. Выбор
+выстрела остается за объектами Game сравниваемых стратегий, по одному на партию, и идет
+обычным циклом Python. На него уходит почти все время, так что скорость пакета задает
+стратегия: около 1.5 тыс. партий в секунду для game.Game и около 600 для density.Game,
+то есть 100 тыс. партий играются минуты, а не секунды.
+"""
+
+from __future__ import unicode_literals
+
+import numpy as np
+
+from seabattle import game, placement
+
+
+MISS_REPLY = 0
+HIT_REPLY = 1
+KILL_REPLY = 2
+REPLIES = ('miss', 'hit', 'kill')
+
+DEFAULT_BATCH_SIZE = 1000
+PERCENTILES = (10, 50, 90, 99)
+
+
+class Boards(object):
+    """Флоты count партий, сложенные в массивы.
+
+    ship_ids[g, i] -- номер корабля в клетке i партии g (0 -- кораблей нет),
+    decks[g, k] -- сколько целых палуб осталось у корабля k, shot[g, i] -- стреляли ли в клетку,
+    ships_left[g] -- сколько кораблей еще на плаву.
+    """
+
+    def __init__(self, layouts, size=10):
+        count = len(layouts)
+        max_ships = max(len(layout) for layout in layouts) if count else 0
+
+        self.size = size
+        self.ship_ids = np.zeros((count, size ** 2), dtype=np.int8)
+        self.decks = np.zeros((count, max_ships + 1), dtype=np.int8)
+        self.shot = np.zeros((count, size ** 2), dtype=bool)
+        self.ships_left = np.zeros(count, dtype=np.int16)
+
+        for number, layout in enumerate(layouts):
+            for ship_id, cells in enumerate(layout, 1):
+                self.ship_ids[number, list(cells)] = ship_id
+                self.decks[number, ship_id] = len(cells)
+            self.ships_left[number] = len(layout)
+
+    @classmethod
+    def random(cls, count, size=10, ships=None, generate=None):
+        """Случайные флоты; generate -- функция без аргументов, возвращающая расстановку
+        (по умолчанию placement.generate_layout)"""
+        ships = ships or game.BaseGame.default_ships
+        if generate is None:
+            return cls([placement.generate_layout(size, ships) for _ in range(count)], size=size)
+        return cls([generate() for _ in range(count)], size=size)
+
+    def __len__(self):
+        return len(self.ships_left)
+
+    def resolve(self, games, shots):
+        """Выстрелы shots[j] по клеткам полей партий games[j]; номера партий не повторяются.
+
+        Возвращает массив ответов MISS_REPLY, HIT_REPLY, KILL_REPLY. Повторный выстрел
+        по подбитой палубе, как и в BaseGame.handle_enemy_shot, снова дает hit или kill.
+        """
+        ship_ids = self.ship_ids[games, shots]
+        fresh = ~self.shot[games, shots]
+        self.shot[games, shots] = True
+
+        hit = ship_ids > 0
+        new_hit = hit & fresh
+        self.decks[games[new_hit], ship_ids[new_hit]] -= 1
+
+        dead = hit & (self.decks[games, ship_ids] == 0)
+        self.ships_left[games[dead & fresh]] -= 1
+
+        replies = np.full(len(games), MISS_REPLY, dtype=np.int8)
+        replies[hit] = HIT_REPLY
+        replies[dead] = KILL_REPLY
+        return replies
+
+
+def _create_players(game_cls, count, size, ships):
+    players = []
+    for _ in range(count):
+        player = game_cls()
+        # свое поле стрелку не нужно, его флот лежит в Boards
+        player.start_new_game(size=size, field=[game.EMPTY] * size ** 2, ships=ships)
+        players.append(player)
+    return players
+
+
+def _shoot(players, games):
+    shots = np.empty(len(games), dtype=np.intp)
+    for j, number in enumerate(games):
+        player = players[number]
+        player.do_shot()
+        shots[j] = player.calc_index(player.last_shot_position)
+    return shots
+
+
+def _reply(players, games, replies):
+    for number, reply in zip(games, replies):
+        players[number].handle_enemy_reply(REPLIES[reply])
+
+
+def _play_batch(game_classes, count, size, ships, max_shots, generate=None):
+    """Пачка из count партий; одна стратегия стреляет по случайным флотам, две -- играют друг с другом.
+
+    Возвращает победителя каждой партии (-1, если никто не успел за max_shots выстрелов)
+    и число выстрелов каждого игрока.
+    """
+    boards = [Boards.random(count, size, ships, generate) for _ in game_classes]
+    players = [_create_players(game_cls, count, size, ships) for game_cls in game_classes]
+
+    # в поединке первый ход по очереди достается каждому игроку
+    turn = np.arange(count) % len(game_classes)
+    winner = np.full(count, -1, dtype=np.int8)
+    shots = np.zeros((len(game_classes), count), dtype=np.int32)
+    active = np.ones(count, dtype=bool)
+
+    while active.any():
+        for player in range(len(game_classes)):
+            games = np.flatnonzero(active & (turn == player))
+            if not len(games):
+                continue
+
+            target = boards[-1 - player]
+            replies = target.resolve(games, _shoot(players[player], games))
+            _reply(players[player], games, replies)
+            shots[player, games] += 1
+
+            won = games[target.ships_left[games] == 0]
+            winner[won] = player
+            active[won] = False
+            if len(game_classes) > 1:
+                turn[games[replies == MISS_REPLY]] = 1 - player
+
+        active &= shots.max(axis=0) < max_shots
+
+    return winner, shots
+
+
+def _run(game_classes, games, batch_size, size, ships, max_shots, generate=None):
+    ships = ships or game.BaseGame.default_ships
+    max_shots = max_shots or 2 * size ** 2
+    # выбор выстрела не должен зависеть от времени, иначе партии не повторяются по зерну
+    game_classes = [game_cls.for_simulation() for game_cls in game_classes]
+
+    winners = []
+    shots = []
+    for start in range(0, games, batch_size):
+        batch_winner, batch_shots = _play_batch(
+            game_classes, min(batch_size, games - start), size, ships, max_shots, generate)
+        winners.append(batch_winner)
+        shots.append(batch_shots)
+    return np.concatenate(winners), np.concatenate(shots, axis=1)
+
+
+def summarize(values):
+    """Среднее, разброс и перцентили числа выстрелов"""
+    values = np.asarray(values)
+    summary = {
+        'games': len(values),
+        'mean': float(values.mean()) if len(values) else None,
+        'std': float(values.std()) if len(values) else None,
+    }
+    for percentile in PERCENTILES:
+        summary['p%s' % percentile] = float(np.percentile(values, percentile)) if len(values) else None
+    return summary
+
+
+def shots_to_win(game_cls, games=10000, batch_size=DEFAULT_BATCH_SIZE, size=10, ships=None, max_shots=None,
+                 generate=None):
+    """Сколько выстрелов нужно стратегии, чтобы потопить случайный флот; партии, не законченные
+    за max_shots выстрелов, в распределение не попадают и считаются в unfinished.
+
+    generate -- другой источник расстановок, как в Boards.random.
+    """
+    winner, shots = _run([game_cls], games, batch_size, size, ships, max_shots, generate)
+    summary = summarize(shots[0][winner == 0])
+    summary['unfinished'] = int((winner < 0).sum())
+    return summary
+
+
+def match(game_cls_1, game_cls_2, games=10000, batch_size=DEFAULT_BATCH_SIZE, size=10, ships=None, max_shots=None):
+    """Поединок двух стратегий: доля побед первой с 95% доверительным интервалом и выстрелы победителей"""
+    winner, shots = _run([game_cls_1, game_cls_2], games, batch_size, size, ships, max_shots)
+
+    finished = int((winner >= 0).sum())
+    win_rate = (winner == 0).sum() / float(finished) if finished else None
+    return {
+        'games': games,
+        'wins_1': int((winner == 0).sum()),
+        'wins_2': int((winner == 1).sum()),
+        'unfinished': games - finished,
+        'win_rate_1': win_rate,
+        'win_rate_1_error': 1.96 * (win_rate * (1 - win_rate) / finished) ** 0.5 if finished else None,
+        'shots_1': summarize(shots[0][winner == 0]),
+        'shots_2': summarize(shots[1][winner == 1]),
+    }
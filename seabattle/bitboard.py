@@ -0,0 +1,153 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+from seabattle import game
+
+
+# _byte_bits[k][b] -- индексы установленных битов байта b, стоящего k-м от младшего края маски;
+# поле не больше 10 x 10, поэтому хватает 13 байт
+_byte_bits = [[tuple(k * 8 + i for i in range(8) if b >> i & 1) for b in range(256)] for k in range(13)]
+
+
+def iter_bits(mask):
+    """Возвращает список индексов установленных битов маски по возрастанию"""
+    result = []
+    for table in _byte_bits:
+        if not mask:
+            break
+        byte = mask & 0xff
+        if byte:
+            result.extend(table[byte])
+        mask >>= 8
+    return result
+
+
+class BitField(object):
+    """Игровое поле в виде битовых масок, по одной на каждое состояние клетки.
+
+    Поддерживает тот же интерфейс, что и список клеток: индексацию по calc_index,
+    срезы, итерацию и сравнение со списком. Операции над множествами клеток
+    (соседи, все пустые клетки, проверка занятости) выполняются над масками целиком,
+    а для чтения отдельных клеток рядом с масками хранится обычный список.
+    """
+
+    states = (game.EMPTY, game.SHIP, game.BLOCKED, game.HIT, game.MISS)
+
+    def __init__(self, size, cells=None):
+        self.size = size
+        self.length = size ** 2
+        self.full_mask = (1 << self.length) - 1
+
+        self.masks = [0] * len(self.states)
+        self.masks[game.EMPTY] = self.full_mask
+        self._cells = [game.EMPTY] * self.length
+
+        # маски клеток, из которых можно сдвинуться вправо и влево, не перескочив на соседнюю строку
+        column_mask = sum(1 << (y * size) for y in range(size))
+        self._not_last_column = self.full_mask & ~(column_mask << (size - 1))
+        self._not_first_column = self.full_mask & ~column_mask
+
+        if cells is not None:
+            if len(cells) != self.length:
+                raise ValueError('Wrong number of cells: %s' % len(cells))
+            for index, value in enumerate(cells):
+                if value != game.EMPTY:
+                    self[index] = value
+
+    def __len__(self):
+        return self.length
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('Field index out of range: %s' % index)
+        return index
+
+    def __getitem__(self, index):
+        return self._cells[index]
+
+    def __setitem__(self, index, value):
+        index = self._check_index(index)
+        bit = 1 << index
+        self.masks[self._cells[index]] &= ~bit
+        self.masks[value] |= bit
+        self._cells[index] = value
+
+    def __iter__(self):
+        return iter(self._cells)
+
+    def __eq__(self, other):
+        if isinstance(other, BitField):
+            return self.size == other.size and self.masks == other.masks
+        return self._cells == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'BitField(%s, %r)' % (self.size, self._cells)
+
+    def mask(self, *states):
+        result = 0
+        for state in states:
+            result |= self.masks[state]
+        return result
+
+    def indexes(self, state):
+        return iter_bits(self.masks[state])
+
+    def count(self, state):
+        return bin(self.masks[state]).count('1')
+
+    def replace(self, old_state, new_state):
+        """Переводит все клетки из одного состояния в другое"""
+        for index in iter_bits(self.masks[old_state]):
+            self._cells[index] = new_state
+        self.masks[new_state] |= self.masks[old_state]
+        self.masks[old_state] = 0
+
+    def set_mask(self, mask, state):
+        """Переводит клетки mask в состояние state"""
+        for index in iter_bits(mask):
+            self._cells[index] = state
+        for other in range(len(self.masks)):
+            self.masks[other] &= ~mask
+        self.masks[state] |= mask
+
+    def shift_horizontal(self, mask):
+        """Маска клеток, соседних по горизонтали с клетками mask"""
+        return (((mask & self._not_last_column) << 1) | ((mask & self._not_first_column) >> 1))
+
+    def shift_vertical(self, mask):
+        """Маска клеток, соседних по вертикали с клетками mask"""
+        return ((mask << self.size) | (mask >> self.size)) & self.full_mask
+
+    def neighbourhood(self, mask):
+        """Маска клеток mask вместе со всеми соседями, включая диагональных"""
+        mask |= self.shift_horizontal(mask)
+        return mask | self.shift_vertical(mask)
+
+    def component(self, index, mask):
+        """Маска клеток mask, связанных с клеткой index по горизонтали и вертикали"""
+        component = 1 << index
+        while True:
+            grown = (component | self.shift_horizontal(component) | self.shift_vertical(component)) & mask
+            if grown == component:
+                return component
+            component = grown
+
+
+class Game(game.Game):
+    """Реализация игры на битовых масках вместо списков клеток"""
+
+    def _make_field(self, cells):
+        return BitField(self.size, cells)
+
+    def is_dead_ship(self, last_index):
+        ship = self.field.component(last_index, self.field.mask(game.SHIP, game.HIT))
+        return not ship & self.field.masks[game.SHIP]
+
+    def _empty_enemy_indexes(self):
+        return self.enemy_field.indexes(game.EMPTY)
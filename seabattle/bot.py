@@ -8,20 +8,27 @@ import os
 from telegram import ext as telegram_ext
 
 from seabattle import dialog_manager as dm
-from seabattle import session
+from seabattle import session, tracing
 
 
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
+    level=os.environ.get('SEABATTLE_LOG_LEVEL', 'INFO').upper()
 )
 logger = logging.getLogger(__name__)
 
 
 def bot_handler(bot, update):
-    session_obj = session.get(update.message.chat_id)
-    dm_obj = dm.DialogManager(session_obj)
-    dmresponse = dm_obj.handle_message(update.message.text)
+    tracing.start_trace('telegram')
+    try:
+        with tracing.span('session_get'):
+            session_obj = session.get(update.message.chat_id)
+        dm_obj = dm.DialogManager(session_obj, update.message.chat_id)
+        dmresponse = dm_obj.handle_message(update.message.text)
+        with tracing.span('session_put'):
+            session.put(update.message.chat_id, session_obj)
+    finally:
+        tracing.finish_trace()
     bot.send_message(chat_id=update.message.chat_id, text=dmresponse.text)
 
 
@@ -29,6 +36,8 @@ def error_handler(bot, update, error):
     logger.error('Update "{0}" caused error "{1}"', update, error)
 
 
+if dm.warm_up_enabled():
+    dm.warm_up()
 updater = telegram_ext.Updater(token=os.environ.get('TELEGRAM_TOKEN'))
 dispatcher = updater.dispatcher
 dispatcher.add_handler(telegram_ext.MessageHandler(telegram_ext.Filters.text, bot_handler))
@@ -0,0 +1,135 @@
+# coding: utf-8
+"""Разбор координат выстрела из реплики игрока: "5 7", "пять семь", "трень восьми".
+
+Словарь токенов собирается один раз: цифры, числительные с падежными формами, известные
+ошибки распознавания речи (BaseGame.letters_mapping) и буквы столбцов, в том числе латинские
+двойники кириллицы. Реплика разбирается за один проход без регулярных выражений, результат
+запоминается для всей строки.
+
+Навык играет в числовых координатах, поэтому по умолчанию обе координаты -- числа; буква
+столбца принимается только с letters=True.
+"""
+
+from __future__ import unicode_literals
+
+
+NUMBER = 'number'
+LETTER = 'letter'
+
+LETTERS = ['а', 'б', 'в', 'г', 'д', 'е', 'ж', 'з', 'и', 'к']
+
+# все формы числительного, которые встречаются в репликах; первая -- именительный падеж
+NUMBER_WORDS = [
+    ['один', 'одна', 'одно', 'одного', 'одной', 'одному', 'одним', 'одном', 'одну', 'раз'],
+    ['два', 'две', 'двух', 'двум', 'двумя'],
+    ['три', 'трех', 'трем', 'тремя'],
+    ['четыре', 'четырех', 'четырем', 'четырьмя'],
+    ['пять', 'пяти', 'пятью'],
+    ['шесть', 'шести', 'шестью'],
+    ['семь', 'семи', 'семью'],
+    ['восемь', 'восьми', 'восемью', 'восьмью'],
+    ['девять', 'девяти', 'девятью'],
+    ['десять', 'десяти', 'десятью'],
+]
+
+# латинские буквы, которые распознавание речи или игрок пишут вместо кириллических
+LATIN_LETTERS = {
+    'a': 'а', 'b': 'б', 'v': 'в', 'w': 'в', 'g': 'г', 'd': 'д', 'e': 'е',
+    'j': 'ж', 'z': 'з', 'i': 'и', 'k': 'к', 'c': 'к',
+}
+
+# ошибки распознавания речи; значение -- цифра или буква
+ASR_MAPPING = {
+    'the': 'з',
+    'за': 'з',
+    'уже': 'ж',
+    'трень': '3',
+}
+
+# сколько разобранных строк помнить; при переполнении память очищается целиком
+MEMO_SIZE = 4096
+
+
+def build_lexicon(number_words=NUMBER_WORDS, letters=LETTERS, latin=LATIN_LETTERS, asr=ASR_MAPPING):
+    """Словарь токен -> (NUMBER или LETTER, номер от 1)"""
+    lexicon = {}
+    for value, forms in enumerate(number_words, 1):
+        for form in forms:
+            lexicon[form] = (NUMBER, value)
+        lexicon['%s' % value] = (NUMBER, value)
+
+    for value, letter in enumerate(letters, 1):
+        lexicon[letter] = (LETTER, value)
+    for latin_letter, letter in latin.items():
+        lexicon[latin_letter] = lexicon[letter]
+
+    for token, target in asr.items():
+        lexicon[token] = (NUMBER, int(target)) if target.isdigit() else lexicon[target]
+    return lexicon
+
+
+def tokenize(text):
+    """Слова и числа реплики; число, приписанное к слову ("а1"), -- отдельный токен"""
+    tokens = []
+    for token in text.split():
+        if token[-1].isdigit() and not token[0].isdigit():
+            end = len(token) - 1
+            while token[end - 1].isdigit():
+                end -= 1
+            tokens.append(token[:end])
+            token = token[end:]
+        tokens.append(token)
+    return tokens
+
+
+class CoordinateParser(object):
+    def __init__(self, lexicon=None, letters=False, memo_size=MEMO_SIZE):
+        self.lexicon = lexicon if lexicon is not None else build_lexicon()
+        self.letters = letters
+        self.memo_size = memo_size
+        # строка -> позиция или текст ошибки
+        self._memo = {}
+
+    def is_number(self, token):
+        return token.isdigit() or self.lexicon.get(token, (None,))[0] == NUMBER
+
+    def _point(self, token, kinds):
+        kind, value = self.lexicon.get(token, (None, None))
+        if kind in kinds:
+            return value
+        if token.isdigit():
+            try:
+                return int(token)
+            except ValueError:
+                # цифры других систем письма: '²'.isdigit(), но int('²') не разбирается
+                pass
+        return None
+
+    def _parse(self, text):
+        tokens = tokenize(text.lower().replace('ё', 'е'))
+        if len(tokens) != 2:
+            return 'Can\'t parse entire position: %s' % text
+
+        x = self._point(tokens[0], (NUMBER, LETTER) if self.letters else (NUMBER,))
+        if x is None:
+            return 'Can\'t parse X point: %s' % tokens[0]
+        y = self._point(tokens[1], (NUMBER,))
+        if y is None:
+            return 'Can\'t parse Y point: %s' % tokens[1]
+        return x, y
+
+    def parse(self, text):
+        """Позиция (x, y) по тексту координат; ValueError, если текст не разбирается"""
+        result = self._memo.get(text)
+        if result is None:
+            result = self._parse(text)
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            self._memo[text] = result
+
+        if not isinstance(result, tuple):
+            raise ValueError(result)
+        return result
+
+
+parser = CoordinateParser()
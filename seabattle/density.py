@@ -0,0 +1,184 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import collections
+import logging
+import random
+import time
+
+from seabattle import game
+from seabattle.game import EMPTY, SHIP, MISS
+
+
+log = logging.getLogger(__name__)
+
+
+class Game(game.Game):
+    """Стрельба по карте плотности.
+
+    Каждая пустая клетка поля соперника оценивается числом расстановок оставшихся кораблей,
+    которые ее накрывают и не противоречат известным промахам и потопленным кораблям.
+    Счетчики расстановок обновляются после каждого ответа соперника, а не пересчитываются
+    заново. Пока подбитый корабль не потоплен, учитываются только расстановки, накрывающие
+    все его подбитые палубы.
+    """
+
+    # сколько может занимать выбор выстрела, прежде чем это попадет в лог
+    shot_time_budget = 0.005
+
+    def __init__(self):
+        super(Game, self).__init__()
+
+        self.target_hits = []
+        # по длине корабля: номера допустимых расстановок и число таких расстановок через каждую клетку
+        self.valid_placements = {}
+        self.placement_counts = {}
+        # сумма placement_counts по длинам с весом числа оставшихся кораблей этой длины
+        self.density = []
+
+    def start_new_game(self, size=10, field=None, ships=None, numbers=None):
+        super(Game, self).start_new_game(size=size, field=field, ships=ships, numbers=numbers)
+        self._rebuild_density()
+
+    def _read_state(self, data, offset):
+        offset = super(Game, self)._read_state(data, offset)
+        self._rebuild_density()
+        return offset
+
+    def _covering(self, length):
+        """Для каждой клетки -- номера расстановок корабля длины length, которые ее накрывают"""
+        key = ('covering', length)
+        covering = self.tables.cache.get(key)
+        if covering is None:
+            covering = [[] for _ in range(self.size ** 2)]
+            for number, (cells, _) in enumerate(self.tables.placements(length)):
+                for index in cells:
+                    covering[index].append(number)
+            self.tables.cache[key] = covering
+        return covering
+
+    def _rebuild_density(self):
+        """Восстанавливает счетчики по полю соперника с нуля"""
+        self.target_hits = []
+
+        blocked = set(i for i, v in enumerate(self.enemy_field) if v == MISS)
+        seen = set()
+        for index, value in enumerate(self.enemy_field):
+            if value != SHIP or index in seen:
+                continue
+            cells = self._enemy_ship_cells(index)
+            seen.update(cells)
+            # вокруг потопленного корабля все клетки отмечены промахами
+            if all(self.enemy_field[i] == MISS for i in self.tables.halo(cells)):
+                blocked.update(cells)
+            else:
+                self.target_hits.extend(sorted(cells))
+
+        self.valid_placements = {}
+        self.placement_counts = {}
+        self.density = [0] * self.size ** 2
+        for length, count in self.enemy_ships_left.items():
+            valid = set()
+            counts = [0] * self.size ** 2
+            for number, (cells, _) in enumerate(self.tables.placements(length)):
+                if not blocked.intersection(cells):
+                    valid.add(number)
+                    for index in cells:
+                        counts[index] += 1
+                        self.density[index] += count
+            self.valid_placements[length] = valid
+            self.placement_counts[length] = counts
+
+    def _block(self, indexes):
+        """Исключает расстановки, накрывающие клетки, где корабля быть не может"""
+        for length, valid in self.valid_placements.items():
+            placements = self.tables.placements(length)
+            covering = self._covering(length)
+            counts = self.placement_counts[length]
+            weight = self.enemy_ships_left[length]
+            for index in indexes:
+                for number in covering[index]:
+                    if number in valid:
+                        valid.remove(number)
+                        for cell in placements[number][0]:
+                            counts[cell] -= 1
+                            self.density[cell] -= weight
+
+    def _kill_enemy_ship(self, cells):
+        if not super(Game, self)._kill_enemy_ship(cells):
+            return False
+
+        length = len(cells)
+        counts = self.placement_counts[length]
+        for index, count in enumerate(counts):
+            self.density[index] -= count
+
+        if not self.enemy_ships_left[length]:
+            del self.valid_placements[length]
+            del self.placement_counts[length]
+        return True
+
+    def handle_enemy_reply(self, message):
+        if self.last_shot_position is None:
+            return
+
+        super(Game, self).handle_enemy_reply(message)
+        index = self.calc_index(self.last_shot_position)
+
+        if message == 'miss':
+            self._block([index])
+        elif message == 'hit':
+            if index not in self.target_hits:
+                self.target_hits = sorted(self.target_hits + [index])
+        elif message == 'kill':
+            cells = self._enemy_ship_cells(index)
+            halo = self.tables.halo(cells)
+            for i in halo:
+                self.enemy_field[i] = MISS
+
+            self._block(cells)
+            self._block(halo)
+            self.target_hits = []
+
+    def _target_scores(self):
+        """Оценки клеток вокруг подбитого, но не потопленного корабля"""
+        hits = set(self.target_hits)
+        scores = collections.Counter()
+        for length, valid in self.valid_placements.items():
+            if length < len(hits):
+                continue
+            placements = self.tables.placements(length)
+            weight = self.enemy_ships_left[length]
+            for number in self._covering(length)[self.target_hits[0]]:
+                if number not in valid:
+                    continue
+                cells = placements[number][0]
+                if hits.issubset(cells):
+                    for index in cells:
+                        if self.enemy_field[index] == EMPTY:
+                            scores[index] += weight
+        return scores
+
+    def choose_shot_index(self):
+        if self.target_hits:
+            scores = self._target_scores()
+        else:
+            scores = dict((i, self.density[i]) for i, v in enumerate(self.enemy_field) if v == EMPTY)
+
+        best_score = max(scores.values()) if scores else 0
+        if best_score <= 0:
+            # ответы соперника противоречат флоту, стреляем в любую свободную клетку
+            return random.choice(self._empty_enemy_indexes())
+
+        return random.choice([index for index, score in scores.items() if score == best_score])
+
+    def do_shot(self):
+        started = time.time()
+        self.do_specified_shot(self.calc_position(self.choose_shot_index()))
+
+        elapsed = time.time() - started
+        if elapsed > self.shot_time_budget:
+            log.warning('Shot selection took %.1f ms', elapsed * 1e3)
+
+        return self.convert_from_position(self.last_shot_position)
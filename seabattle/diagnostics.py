@@ -0,0 +1,94 @@
+# coding: utf-8
+"""Отладочный вывод, который ничего не стоит, пока его никто не читает.
+
+Поля и разбор NLU передаются в лог обертками Lazy и превращаются в строки, только если
+запись действительно выводится. Отдельные сессии можно отлаживать и при выключенном
+отладочном логе: их записи идут в логгер seabattle.debug, который всегда включен.
+Такие сессии задаются переменными окружения:
+- SEABATTLE_DEBUG_USERS -- user_id через запятую;
+- SEABATTLE_DEBUG_SAMPLE_RATE -- доля случайно выбранных сессий, от 0 до 1.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import sys
+import threading
+import zlib
+
+
+debug_log = logging.getLogger('seabattle.debug')
+debug_log.setLevel(logging.DEBUG)
+
+_debug_users = set(user_id.strip() for user_id in os.environ.get('SEABATTLE_DEBUG_USERS', '').split(',')
+                   if user_id.strip())
+_debug_sample_rate = float(os.environ.get('SEABATTLE_DEBUG_SAMPLE_RATE', 0))
+_debug_lock = threading.Lock()
+
+
+class Lazy(object):
+    """Строка, которая вычисляется вызовом func(*args, **kwargs) только при форматировании"""
+
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __unicode__(self):
+        return self.func(*self.args, **self.kwargs)
+
+    def __str__(self):
+        text = self.__unicode__()
+        if sys.version_info[0] == 2:
+            return text.encode('utf-8')
+        return text
+
+
+def _render_boards(game):
+    return 'My field:%s\nEnemy field:%s' % (game.render_field(), game.render_field(game.enemy_field))
+
+
+def boards(game):
+    """Оба поля игры для лога"""
+    return Lazy(_render_boards, game)
+
+
+def nlu_dump(response):
+    """Ответ NLU для лога"""
+    return Lazy(json.dumps, response, indent=2, ensure_ascii=False)
+
+
+def enable_session(user_id):
+    with _debug_lock:
+        _debug_users.add('%s' % user_id)
+
+
+def disable_session(user_id):
+    with _debug_lock:
+        _debug_users.discard('%s' % user_id)
+
+
+def set_sample_rate(rate):
+    global _debug_sample_rate
+    if not 0 <= rate <= 1:
+        raise ValueError('Sample rate must be between 0 and 1: %s' % rate)
+    _debug_sample_rate = rate
+
+
+def is_debug_session(user_id):
+    """Нужно ли подробно логировать сессию; выборка по хешу user_id одинакова во всех процессах"""
+    user_id = '%s' % user_id
+    if user_id in _debug_users:
+        return True
+    if not _debug_sample_rate:
+        return False
+    return (zlib.crc32(user_id.encode('utf-8')) & 0xffffffff) < _debug_sample_rate * 2 ** 32
+
+
+def get_logger(user_id, default):
+    """Логгер для записей сессии: seabattle.debug для отлаживаемых сессий, иначе default"""
+    return debug_log if is_debug_session(user_id) else default
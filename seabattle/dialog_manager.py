@@ -3,16 +3,19 @@
 from __future__ import unicode_literals
 
 import collections
+import importlib
 import json
 import logging
+import os
+import re
+import threading
+import time
 
-from rasa_nlu.data_router import DataRouter
-
-from seabattle import game
+from seabattle import coordinates, diagnostics, game, layouts, nlu, tracing
 
 
 log = logging.getLogger(__name__)
-router = DataRouter('mldata/')
+INTENTS_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'config', 'intents_config.json')
 MESSAGE_TEMPLATES = {
     'miss': 'Мимо. Я хожу %(shot)s',
     'hit': 'Ты попала',
@@ -32,6 +35,11 @@ TTS_TEMPLATES = {
 DMResponse = collections.namedtuple('DMResponse', ['key', 'text', 'tts', 'end_session'])
 
 
+def get_game_class():
+    """Стратегия игры -- модуль пакета seabattle с классом Game, задается SEABATTLE_STRATEGY"""
+    return importlib.import_module('seabattle.%s' % os.environ.get('SEABATTLE_STRATEGY', 'game')).Game
+
+
 def _get_entity(entities, entity_type):
     for e in entities:
         if e['entity'] == entity_type:
@@ -48,9 +56,181 @@ def _shot_to_tts(shot):
     return shot.replace(', ', ' - - - - ')
 
 
+def _shot_responses(keys=('miss', 'shot'), size=10):
+    """Готовые текст и TTS ответов с выстрелом навыка для каждой клетки, в цифрах и с буквой"""
+    shots = set()
+    for x in range(1, size + 1):
+        for y in range(1, size + 1):
+            shots.add('%s, %s' % (x, y))
+            shots.add('%s, %s' % (game.BaseGame.str_letters[x - 1], y))
+
+    responses = {}
+    for key in keys:
+        for shot in shots:
+            response_dict = {'shot': shot, 'tts_shot': _shot_to_tts(shot)}
+            responses[key, shot] = (MESSAGE_TEMPLATES[key] % response_dict, TTS_TEMPLATES[key] % response_dict)
+    return responses
+
+
+# (ключ, выстрел) -> (текст, tts)
+SHOT_RESPONSES = _shot_responses()
+
+
+_punctuation_re = re.compile(r'[^\w\s]+', re.UNICODE)
+# латинские буквы, которые встречаются в обучающих примерах вместо кириллических предлогов
+_latin_lookalikes = {'c': 'с'}
+
+
+def _normalize(message):
+    message = _punctuation_re.sub(' ', message.lower().replace('ё', 'е'))
+    return ' '.join(_latin_lookalikes.get(token, token) for token in message.split())
+
+
+class FastParser(object):
+    """Детерминированный разбор типовых реплик без обращения к rasa_nlu.
+
+    Строится по обучающим примерам из intents_config.json: реплики без сущностей
+    распознаются по точному совпадению, ход соперника -- по префиксу из примеров
+    интента miss и двум координатам, новая игра -- по префиксу и имени соперника.
+    Если реплика не подходит ни под один шаблон, parse возвращает None.
+    """
+
+    def __init__(self, examples, numbers):
+        self.phrases = {}
+        self.miss_prefixes = set()
+        self.opponent_prefixes = {}
+        self.opponent_values = {}
+        self.numbers = set(numbers)
+
+        for example in examples:
+            text = example['text']
+            entities = example['entities']
+            if not entities:
+                self.phrases[_normalize(text)] = example['intent']
+                continue
+
+            entity = entities[0]
+            if len(entities) > 1 or entity['end'] != len(text.rstrip()):
+                # шаблоны с сущностью не в конце реплики быстрым путем не разбираем
+                continue
+
+            prefix = _normalize(text[:entity['start']])
+            if entity['entity'] == 'hit_entity':
+                self.miss_prefixes.add(prefix)
+            else:
+                self.opponent_prefixes[prefix] = (example['intent'], entity['entity'])
+                self.opponent_values[_normalize(text[entity['start']:entity['end']])] = entity['value']
+
+        # "мимо я хожу" = "мимо" + "я хожу": первое слово такого префикса можно произносить отдельно
+        example_prefixes = frozenset(self.miss_prefixes)
+        for prefix in example_prefixes:
+            head, _, tail = prefix.partition(' ')
+            if tail in example_prefixes:
+                self.miss_prefixes.add(head)
+                self.miss_prefixes.update(
+                    '%s %s' % (head, p) for p in example_prefixes if p.partition(' ')[0] != head)
+
+    @classmethod
+    def from_config(cls, path=INTENTS_CONFIG_PATH):
+        with open(path) as f:
+            examples = json.load(f)['rasa_nlu_data']['common_examples']
+
+        numbers = [token for token, (kind, _) in coordinates.parser.lexicon.items() if kind == coordinates.NUMBER]
+        return cls(examples, numbers)
+
+    def _is_number(self, token):
+        return token.isdigit() or token in self.numbers
+
+    def parse(self, message):
+        text = _normalize(message)
+
+        intent_name = self.phrases.get(text)
+        if intent_name is not None:
+            return self._response(intent_name)
+
+        tokens = text.split(' ')
+        if len(tokens) > 2 and self._is_number(tokens[-1]) and self._is_number(tokens[-2]):
+            if ' '.join(tokens[:-2]) in self.miss_prefixes:
+                return self._response('miss', [('hit_entity', ' '.join(tokens[-2:]))])
+
+        for prefix, (intent_name, entity_type) in self.opponent_prefixes.items():
+            if text.startswith(prefix + ' '):
+                value = text[len(prefix) + 1:]
+                return self._response(intent_name, [(entity_type, self.opponent_values.get(value, value))])
+
+        return None
+
+    @staticmethod
+    def _response(intent_name, entities=()):
+        return {
+            'intent': {'name': intent_name, 'confidence': 1.0},
+            'entities': [{'entity': entity_type, 'value': value} for entity_type, value in entities],
+        }
+
+
+fast_parser = FastParser.from_config()
+nlu_cache = nlu.create_cache(_normalize)
+# модель NLU тянет за собой TensorFlow и spaCy, поэтому загружается при первом разборе или в warm_up;
+# до этого router и batch_parser -- None
+router = None
+batch_parser = None
+_nlu_lock = threading.Lock()
+# сколько реплик разобрано быстрым путем, сколько нашлось в кэше, а сколько ушло в rasa_nlu
+parse_stats = collections.Counter()
+
+# реплики для прогрева: на первом разборе модели NLU дозагружают и инициализируют свои части
+WARM_UP_MESSAGES = ['новая игра с васей', 'давай начнем', 'мимо е 5', 'ранил', 'убил', 'повтори']
+
+
+def get_router():
+    """DataRouter с моделью из mldata/, загружается при первом обращении"""
+    global router
+    if router is None:
+        with _nlu_lock:
+            if router is None:
+                from rasa_nlu.data_router import DataRouter
+
+                started = time.time()
+                loaded = DataRouter(nlu.MODEL_PATH)
+                log.info('NLU model loaded in %.1f s', time.time() - started)
+                router = loaded
+    return router
+
+
+def get_batch_parser():
+    """Пакетный разбор NLU или None, если он выключен (SEABATTLE_NLU_BATCH_SIZE)"""
+    global batch_parser
+    if batch_parser is None and nlu.batching_enabled():
+        with _nlu_lock:
+            if batch_parser is None:
+                batch_parser = nlu.create_batch_parser()
+    return batch_parser
+
+
+def warm_up_enabled():
+    """SEABATTLE_WARM_UP=0 -- не прогревать при старте, модель загрузится на первой реплике"""
+    return os.environ.get('SEABATTLE_WARM_UP', '1') != '0'
+
+
+def warm_up():
+    """Загружает и прогревает NLU, таблицы поля и пул расстановок, чтобы первая реплика игрока не ждала"""
+    started = time.time()
+    nlu_router = get_router()
+    nlu_batch_parser = get_batch_parser()
+    for message in WARM_UP_MESSAGES:
+        fast_parser.parse(message)
+        nlu_router.parse(nlu_router.extract({'q': message, 'project': nlu.PROJECT}))
+        if nlu_batch_parser is not None:
+            nlu_batch_parser.parse(message)
+    game.Game().start_new_game(numbers=True, field=layouts.get_pool().get())
+    log.info('Warmed up in %.1f s', time.time() - started)
+
+
 class DialogManager(object):
-    def __init__(self, session_obj):
+    def __init__(self, session_obj, user_id=None):
         self.session = session_obj
+        # отладочные записи отлаживаемых сессий пишутся при любом уровне лога
+        self.log = diagnostics.get_logger(user_id, log) if user_id is not None else log
         self.game = session_obj['game']
         self.opponent = session_obj['opponent']
         self.last = session_obj['last']
@@ -63,16 +243,14 @@ class DialogManager(object):
         return DMResponse(key, text, tts, end_session)
 
     def _get_shot_miss_dmresponse(self, key, shot, with_opponent=False):
-        response_dict = {
-            'shot': shot,
-            'tts_shot': _shot_to_tts(shot),
-        }
-        return self._get_dmresponse(
-            key,
-            MESSAGE_TEMPLATES[key] % response_dict,
-            TTS_TEMPLATES[key] % response_dict,
-            with_opponent=with_opponent
-        )
+        texts = SHOT_RESPONSES.get((key, shot))
+        if texts is None:
+            response_dict = {
+                'shot': shot,
+                'tts_shot': _shot_to_tts(shot),
+            }
+            texts = MESSAGE_TEMPLATES[key] % response_dict, TTS_TEMPLATES[key] % response_dict
+        return self._get_dmresponse(key, texts[0], texts[1], with_opponent=with_opponent)
 
     def _get_dmresponse_by_key(self, key, end_session=False, with_opponent=False):
         return self._get_dmresponse(
@@ -82,11 +260,16 @@ class DialogManager(object):
             with_opponent=with_opponent
         )
 
+    def _do_shot(self):
+        with tracing.span('do_shot'):
+            return self.game.do_shot()
+
     def _handle_newgame(self, message, entities):
-        self.game = game.Game()
+        self.game = get_game_class()()
         self.game.reset_last_shot()
         self.session['game'] = self.game
-        self.game.start_new_game(numbers=True)
+        # готовая расстановка из пула вместо генерации поля внутри запроса
+        self.game.start_new_game(numbers=True, field=layouts.get_pool().get())
         if entities:
             self.opponent = _get_entity(entities, 'opponent_entity')
         else:
@@ -104,7 +287,7 @@ class DialogManager(object):
         if self.game is None:
             return self._get_dmresponse_by_key('need_init')
         self.game.reset_last_shot()
-        shot = self.game.do_shot()
+        shot = self._do_shot()
         return self._get_shot_miss_dmresponse('shot', shot, with_opponent=True)
 
     def _handle_miss(self, message, entities):
@@ -122,7 +305,7 @@ class DialogManager(object):
         except ValueError:
             return self._get_dmresponse_by_key('dontunderstand')
         if answer == 'miss':
-            shot = self.game.do_shot()
+            shot = self._do_shot()
             return self._get_shot_miss_dmresponse('miss', shot)
         return self._get_dmresponse(
             answer,
@@ -134,7 +317,7 @@ class DialogManager(object):
             return self._get_dmresponse_by_key('need_init')
 
         self.game.handle_enemy_reply('hit')
-        shot = self.game.do_shot()
+        shot = self._do_shot()
         return self._get_shot_miss_dmresponse('shot', shot)
 
     def _handle_kill(self, message, entities):
@@ -142,7 +325,7 @@ class DialogManager(object):
             return self._get_dmresponse_by_key('need_init')
 
         self.game.handle_enemy_reply('kill')
-        shot = self.game.do_shot()
+        shot = self._do_shot()
         if self.game.is_victory():
             return self._get_dmresponse_by_key('victory')
         else:
@@ -169,26 +352,44 @@ class DialogManager(object):
         self.session['last'] = self.last = dmresponse
 
     def handle_message(self, message):
-        data = router.extract({'q': message})
-        router_response = router.parse(data)
-        log.info('Router response %s', json.dumps(router_response, indent=2))
-
-        if router_response['intent']['confidence'] < 0.8:
+        with tracing.span('nlu_fast'):
+            router_response = fast_parser.parse(message)
+        if router_response is not None:
+            parse_stats['fast'] += 1
+        else:
+            router_response = nlu_cache.get(message)
+            if router_response is not None:
+                parse_stats['cache'] += 1
+            else:
+                parse_stats['router'] += 1
+                nlu_batch_parser = get_batch_parser()
+                if nlu_batch_parser is not None:
+                    with tracing.span('nlu_batch'):
+                        router_response = nlu_batch_parser.parse(message)
+                else:
+                    nlu_router = get_router()
+                    with tracing.span('nlu_extract'):
+                        data = nlu_router.extract({'q': message, 'project': nlu.PROJECT})
+                    with tracing.span('nlu_parse'):
+                        router_response = nlu_router.parse(data)
+                nlu_cache.put(message, router_response)
+        self.log.debug('Router response %s', diagnostics.nlu_dump(router_response))
+
+        if router_response['intent']['confidence'] < nlu.CONFIDENCE_THRESHOLD:
             dmresponse = self._get_dmresponse_by_key('dontunderstand')
             return dmresponse
 
         intent_name = router_response['intent']['name']
         entities = router_response['entities']
         handler_method = getattr(self, '_handle_' + intent_name)
-        dmresponse = handler_method(message, entities)
+        tracing.annotate(intent=intent_name)
+        with tracing.span('handler'):
+            dmresponse = handler_method(message, entities)
         if dmresponse.key != 'dontunderstand':
             # сохраняем только последний осмысленный ответ в сессии не затыкались после нескольких повтори
             self._update_session(dmresponse)
 
         if self.session.get('game') is not None:
-            log.info('My field:')
-            self.session['game'].print_field()
-            log.info('Enemy field:')
-            self.session['game'].print_enemy_field()
+            self.log.debug('%s', diagnostics.boards(self.session['game']))
 
         return dmresponse
@@ -2,11 +2,12 @@
 
 from __future__ import unicode_literals
 
+import collections
 import random
-import re
 import logging
+import struct
 
-from transliterate import translit
+from seabattle import coordinates, opening, placement, tables as board_tables
 
 EMPTY = 0
 SHIP = 1
@@ -23,22 +24,55 @@ RIGHT = 3
 HORIZONTAL = 0
 VERTICAL = 1
 
+_directions = {VERTICAL: (UP, DOWN), HORIZONTAL: (LEFT, RIGHT)}
 
-class BaseGame(object):
-    position_patterns = [re.compile('^([a-zа-я]+)(\d+)$', re.UNICODE),  # a1
-                         re.compile('^([a-zа-я]+)\s+(\w+)$', re.UNICODE),  # a 1; a один
-                         re.compile('^(\w+)\s+(\w+)$', re.UNICODE),  # a 1; a один; 7 10
-                         ]
+# номер корабля для клеток без корабля в BaseGame.ship_ids
+NO_SHIP = -1
+
+# версия бинарного формата состояния игры (to_bytes/from_bytes); с версии 2 хранятся оставшиеся корабли соперника,
+# с версии 3 -- зерно и позиции очередей выстрелов Game вместо флагов использованных выстрелов
+STATE_FORMAT_VERSION = 3
+READABLE_STATE_VERSIONS = (1, 2, 3)
+
+# в упакованном состоянии на клетку приходится 2 бита, BLOCKED бывает только во время расстановки
+_cell_codes = {EMPTY: 0, SHIP: 1, HIT: 2, MISS: 3}
+_code_cells = [EMPTY, SHIP, HIT, MISS]
+
+
+def _pack_cells(cells):
+    data = bytearray((len(cells) + 3) // 4)
+    for i, value in enumerate(cells):
+        try:
+            code = _cell_codes[value]
+        except KeyError:
+            raise ValueError('Can\'t pack cell state: %s' % value)
+        data[i >> 2] |= code << ((i & 3) << 1)
+    return data
+
+
+def _unpack_cells(data, offset, count):
+    cells = [_code_cells[(data[offset + (i >> 2)] >> ((i & 3) << 1)) & 3] for i in range(count)]
+    return cells, offset + (count + 3) // 4
+
+
+def _pack_flags(flags):
+    data = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            data[i >> 3] |= 1 << (i & 7)
+    return data
 
-    str_letters = ['а', 'б', 'в', 'г', 'д', 'е', 'ж', 'з', 'и', 'к']
-    str_numbers = ['один', 'два', 'три', 'четыре', 'пять', 'шесть', 'семь', 'восемь', 'девять', 'десять']
 
-    letters_mapping = {
-        'the': 'з',
-        'за': 'з',
-        'уже': 'ж',
-        'трень': '3',
-    }
+def _unpack_flags(data, offset, count):
+    flags = [bool(data[offset + (i >> 3)] & (1 << (i & 7))) for i in range(count)]
+    return flags, offset + (count + 7) // 8
+
+
+class BaseGame(object):
+    str_letters = coordinates.LETTERS
+    str_numbers = [forms[0] for forms in coordinates.NUMBER_WORDS]
+
+    letters_mapping = coordinates.ASR_MAPPING
 
     default_ships = [4, 3, 3, 2, 2, 2, 1, 1, 1, 1]
 
@@ -48,8 +82,15 @@ class BaseGame(object):
         self.field = []
         self.enemy_field = []
 
+        # клетка -> номер корабля, клетки и число целых палуб каждого корабля; строятся по полю
+        self.ship_ids = []
+        self.ship_cells = []
+        self.ship_decks = []
+
         self.ships_count = 0
         self.enemy_ships_count = 0
+        # длины непотопленных кораблей соперника (длина -> сколько осталось)
+        self.enemy_ships_left = collections.Counter()
 
         self.last_shot_position = None
         self.last_enemy_shot_position = None
@@ -70,22 +111,169 @@ class BaseGame(object):
         if field is None:
             self.generate_field()
         else:
-            self.field = field
+            self.field = self._make_field(field)
+        self._index_ships()
 
-        self.enemy_field = [EMPTY] * self.size ** 2
+        self.enemy_field = self._make_field([EMPTY] * self.size ** 2)
 
         self.ships_count = self.enemy_ships_count = len(self.ships)
+        self.enemy_ships_left = collections.Counter(self.ships)
 
         self.last_shot_position = None
         self.last_enemy_shot_position = None
 
+    @property
+    def tables(self):
+        """Таблицы соседей, линий и расстановок для текущего размера поля"""
+        return board_tables.get(self.size)
+
     def generate_field(self):
         raise NotImplementedError()
 
-    def print_field(self, field=None):
+    @classmethod
+    def for_simulation(cls):
+        """Класс для турниров и пакетных симуляций. Стратегия, у которой выбор выстрела зависит
+        от времени, возвращает вариант с постоянным объемом работы, чтобы партии повторялись по зерну"""
+        return cls
+
+    def _make_field(self, cells):
+        """Создает поле из списка клеток; наследники могут хранить поле иначе"""
+        return cells
+
+    def _index_ships(self):
+        """Находит корабли своего поля: связные по сторонам группы целых и подбитых палуб"""
+        field = list(self.field)
+        neighbours = self.tables.neighbours_4
+        self.ship_ids = [NO_SHIP] * len(field)
+        self.ship_cells = []
+        self.ship_decks = []
+
+        for start, value in enumerate(field):
+            if value not in (SHIP, HIT) or self.ship_ids[start] != NO_SHIP:
+                continue
+            ship_id = len(self.ship_cells)
+            self.ship_ids[start] = ship_id
+            cells = [start]
+            for index in cells:
+                for neighbour in neighbours[index]:
+                    if self.ship_ids[neighbour] == NO_SHIP and field[neighbour] in (SHIP, HIT):
+                        self.ship_ids[neighbour] = ship_id
+                        cells.append(neighbour)
+            self.ship_cells.append(tuple(sorted(cells)))
+            self.ship_decks.append(sum(1 for index in cells if field[index] == SHIP))
+
+    def ship_halo(self, ship_id):
+        """Клетки вокруг корабля ship_id"""
+        return self.tables.halo(self.ship_cells[ship_id])
+
+    def to_bytes(self):
+        """Упаковывает состояние игры в компактную бинарную строку"""
+        data = bytearray([STATE_FORMAT_VERSION])
+        self._write_state(data)
+        return bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Восстанавливает игру из строки, полученной в to_bytes"""
+        data = bytearray(data)
+        if not data or data[0] not in READABLE_STATE_VERSIONS:
+            raise ValueError('Unsupported game state version: %s' % (data[0] if data else None))
+
+        game = cls()
+        try:
+            offset = game._read_state(data, 1)
+        except (IndexError, ValueError):
+            raise ValueError('Broken game state')
+        if offset != len(data):
+            raise ValueError('Unexpected trailing data in game state')
+        return game
+
+    def _pack_position(self, position):
+        return 0 if position is None else self.calc_index(position) + 1
+
+    def _unpack_position(self, value):
+        return None if value == 0 else self.calc_position(value - 1)
+
+    def _write_state(self, data):
+        ships = self.ships or []
+        data.extend([self.size, len(ships)])
+        data.extend(ships)
+        data.extend([
+            int(bool(self.numbers)),
+            self.ships_count,
+            self.enemy_ships_count,
+            self._pack_position(self.last_shot_position),
+            self._pack_position(self.last_enemy_shot_position),
+        ])
+        data.extend(_pack_cells(self.field))
+        data.extend(_pack_cells(self.enemy_field))
+
+        # по флагу на корабль флота: еще не потоплен
+        left = collections.Counter(self.enemy_ships_left)
+        alive = []
+        for length in ships:
+            alive.append(left[length] > 0)
+            left[length] -= 1
+        data.extend(_pack_flags(alive))
+
+    def _read_state(self, data, offset):
+        self.size = data[offset]
+        ships_length = data[offset + 1]
+        offset += 2
+        self.ships = list(data[offset:offset + ships_length]) if ships_length else None
+        offset += ships_length
+
+        numbers, self.ships_count, self.enemy_ships_count, last_shot, last_enemy_shot = data[offset:offset + 5]
+        offset += 5
+        self.numbers = bool(numbers)
+        self.last_shot_position = self._unpack_position(last_shot)
+        self.last_enemy_shot_position = self._unpack_position(last_enemy_shot)
+
+        field, offset = _unpack_cells(data, offset, self.size ** 2)
+        enemy_field, offset = _unpack_cells(data, offset, self.size ** 2)
+        self.field = self._make_field(field)
+        self.enemy_field = self._make_field(enemy_field)
+        self._index_ships()
+
+        ships = self.ships or []
+        # версия формата -- первый байт той же строки
+        if data[0] >= 2:
+            alive, offset = _unpack_flags(data, offset, len(ships))
+            self.enemy_ships_left = collections.Counter(length for length, is_alive in zip(ships, alive) if is_alive)
+        else:
+            self.enemy_ships_left = self._guess_enemy_ships_left()
+        return offset
+
+    def _guess_enemy_ships_left(self):
+        """Оставшиеся корабли соперника по полю, для состояний версии 1.
+
+        Потопленным считается корабль, вокруг которого все отмечено промахами, а если таких
+        меньше, чем потоплено, -- еще и корабль под последним выстрелом: ореол вокруг только
+        что потопленного корабля отмечается на следующем ходу.
+        """
+        killed = []
+        killed_cells = set()
+        seen = set()
+        for index, value in enumerate(self.enemy_field):
+            if value != SHIP or index in seen:
+                continue
+            cells = self._enemy_ship_cells(index)
+            seen.update(cells)
+            if all(self.enemy_field[i] == MISS for i in self.tables.halo(cells)):
+                killed.append(len(cells))
+                killed_cells.update(cells)
+
+        ships = self.ships or []
+        if len(killed) < len(ships) - self.enemy_ships_count and self.last_shot_position is not None:
+            index = self.calc_index(self.last_shot_position)
+            if self.enemy_field[index] == SHIP and index not in killed_cells:
+                killed.append(len(self._enemy_ship_cells(index)))
+        return collections.Counter(ships) - collections.Counter(killed)
+
+    def render_field(self, field=None):
+        """Поле в виде текста: рамка и по строке на каждый ряд клеток"""
         if not self.size:
-            log.info('Empty field')
-            return
+            return 'Empty field'
 
         if field is None:
             field = self.field
@@ -95,51 +283,44 @@ class BaseGame(object):
         lines = ['']
         lines.append('-' * (self.size + 2))
         for y in range(self.size):
-            lines.append('|%s|' % ''.join(str(mapping[x]) for x in field[y * self.size: (y + 1) * self.size]))
+            lines.append('|%s|' % ''.join(mapping[x] for x in field[y * self.size: (y + 1) * self.size]))
         lines.append('-' * (self.size + 2))
-        log.info('\n'.join(lines))
+        return '\n'.join(lines)
+
+    def print_field(self, field=None):
+        log.info(self.render_field(field))
 
     def print_enemy_field(self):
         self.print_field(self.enemy_field)
 
     def handle_enemy_shot(self, position):
         index = self.calc_index(position)
+        ship_id = self.ship_ids[index]
+        if ship_id == NO_SHIP:
+            return 'miss'
 
+        # повторный выстрел по подбитой палубе снова дает hit или kill
         if self.field[index] == SHIP:
             self.field[index] = HIT
-
-            if self.is_dead_ship(index):
+            self.ship_decks[ship_id] -= 1
+            if not self.ship_decks[ship_id]:
                 self.ships_count -= 1
                 return 'kill'
-            else:
-                return 'hit'
-        elif self.field[index] == HIT:
-            return 'kill' if self.is_dead_ship(index) else 'hit'
-        else:
-            return 'miss'
+        return 'hit' if self.ship_decks[ship_id] else 'kill'
 
     def is_dead_ship(self, last_index):
-        x, y = self.calc_position(last_index)
-        x -= 1
-        y -= 1
-
-        def _line_is_dead(line, index):
-            def _tail_is_dead(tail):
-                for i in tail:
-                    if i == HIT:
-                        continue
-                    elif i == SHIP:
-                        return False
-                    else:
-                        return True
-                return True
-
-            return _tail_is_dead(line[index:]) and _tail_is_dead(line[index::-1])
-
-        return (
-            _line_is_dead(self.field[x::self.size], y) and
-            _line_is_dead(self.field[y * self.size:(y + 1) * self.size], x)
-        )
+        if self.field[last_index] != HIT:
+            return self.field[last_index] != SHIP
+
+        # идем от клетки во все стороны, пока не кончатся подбитые палубы
+        for ray in self.tables.rays[last_index]:
+            for index in ray:
+                value = self.field[index]
+                if value == SHIP:
+                    return False
+                elif value != HIT:
+                    break
+        return True
 
     def is_end_game(self):
         return self.is_victory() or self.is_defeat()
@@ -170,10 +351,33 @@ class BaseGame(object):
 
             if message == 'kill':
                 self.enemy_ships_count -= 1
+                self._kill_enemy_ship(self._enemy_ship_cells(index))
 
         elif message == 'miss':
             self.enemy_field[index] = MISS
 
+    def _enemy_ship_cells(self, index):
+        """Подбитые клетки корабля соперника, лежащие на одной линии с клеткой index"""
+        cells = [index]
+        for ray in self.tables.rays[index]:
+            for neighbour_index in ray:
+                if self.enemy_field[neighbour_index] != SHIP:
+                    break
+                cells.append(neighbour_index)
+        return cells
+
+    def _kill_enemy_ship(self, cells):
+        """Вычеркивает потопленный корабль из оставшихся; False, если корабля такой длины не осталось"""
+        length = len(cells)
+        if not self.enemy_ships_left[length]:
+            log.warning('Unexpected killed ship of length %s, remaining ships: %s', length, dict(self.enemy_ships_left))
+            return False
+
+        self.enemy_ships_left[length] -= 1
+        if not self.enemy_ships_left[length]:
+            del self.enemy_ships_left[length]
+        return True
+
     def calc_index(self, position):
         x, y = position
 
@@ -189,54 +393,7 @@ class BaseGame(object):
         return x, y
 
     def convert_to_position(self, position):
-        position = position.lower()
-        for pattern in self.position_patterns:
-            match = pattern.match(position)
-
-            if match is not None:
-                break
-        else:
-            raise ValueError('Can\'t parse entire position: %s' % position)
-
-        bits = match.groups()
-
-        def _try_letter(bit):
-            # проверяем особые случаи неправильного распознования STT
-            bit = self.letters_mapping.get(bit, bit)
-
-            # преобразуем в кириллицу
-            bit = translit(bit, 'ru')
-
-            try:
-                return self.str_letters.index(bit) + 1
-            except ValueError:
-                raise
-
-        def _try_number(bit):
-            # проверяем особые случаи неправильного распознования STT
-            bit = self.letters_mapping.get(bit, bit)
-
-            if bit.isdigit():
-                return int(bit)
-            else:
-                try:
-                    return self.str_numbers.index(bit) + 1
-                except ValueError:
-                    raise
-
-        x = bits[0].strip()
-        try:
-            x = _try_number(x)
-        except ValueError:
-            raise ValueError('Can\'t parse X point: %s' % x)
-
-        y = bits[1].strip()
-        try:
-            y = _try_number(y)
-        except ValueError:
-            raise ValueError('Can\'t parse Y point: %s' % y)
-
-        return x, y
+        return coordinates.parser.parse(position)
 
     def convert_from_position(self, position, numbers=None):
         numbers = numbers if numbers is not None else self.numbers
@@ -256,81 +413,103 @@ class Game(BaseGame):
 
     def generate_field(self):
         """Метод генерации поля"""
-        self.field = [0] * self.size ** 2
+        field = [EMPTY] * self.size ** 2
+        for cells in placement.generate_layout(self.size, self.ships):
+            for index in cells:
+                field[index] = SHIP
 
-        for length in self.ships:
-            self.place_ship(length)
+        self.field = self._make_field(field)
 
-        for i in range(len(self.field)):
-            if self.field[i] == BLOCKED:
-                self.field[i] = EMPTY
+    def _shuffle_shot_queues(self):
+        """Симметрия поля и очереди выстрелов шаблонов с шагом 4 и 2, которые задает shot_queue_seed.
 
-    def place_ship(self, length):
-        def _try_to_place():
-            x = random.randint(1, self.size)
-            y = random.randint(1, self.size)
-            direction = random.choice([1, self.size])
+        Дебютная книга и шаблоны отражаются одной и той же симметрией, своей в каждой партии:
+        так первые выстрелы не повторяются от партии к партии, а узор книги и шаблонов сохраняется.
+        """
+        self.symmetry = self.shot_queue_seed & 7
+        if not self.size:
+            self.shot_queues = [[], []]
+            return
 
-            index = self.calc_index((x, y))
-            values = self.field[index:None if direction == self.size else index + self.size - index % self.size:direction][:length]
+        mapping = self.tables.symmetries[self.symmetry]
+        shuffle = random.Random(self.shot_queue_seed).shuffle
+        self.shot_queues = []
+        for step in (4, 2):
+            queue = [mapping[index] for index in self.predefined_indexes(step)]
+            shuffle(queue)
+            self.shot_queues.append(queue)
 
-            if len(values) < length or any(values):
-                return False
+    def _next_queued_shot(self, step_index):
+        """Следующая клетка очереди шаблона, в которую есть смысл стрелять, или None, если очередь кончилась.
 
-            for i in range(length):
-                current_index = index + direction * i
+        Клетки, ставшие бесполезными, пропускаются по ходу и больше не рассматриваются.
+        """
+        queue = self.shot_queues[step_index]
+        cursor = self.shot_queue_cursors[step_index]
+        shot = None
+        while cursor < len(queue):
+            index = queue[cursor]
+            cursor += 1
+            if self._is_useful_shot(index):
+                shot = index
+                break
+        self.shot_queue_cursors[step_index] = cursor
+        return shot
+
+    def _span(self, index, directions):
+        """Сколько клеток подряд, где может стоять корабль, проходит через index по направлениям directions"""
+        span = 1
+        for direction in directions:
+            for neighbour_index in self.tables.rays[index][direction]:
+                if self.enemy_field[neighbour_index] == MISS:
+                    break
+                span += 1
+        return span
+
+    def _fits_any_ship(self, index):
+        """Может ли на пустой клетке index стоять хоть один из оставшихся кораблей соперника.
+
+        Соседние потопленные корабли окружены промахами, так что клетке достаточно пустой
+        линии длиной с самый короткий оставшийся корабль.
+        """
+        shortest = min(self.enemy_ships_left) if self.enemy_ships_left else 1
+        if shortest <= 1:
+            return True
+        return any(self._span(index, directions) >= shortest for directions in ((UP, DOWN), (LEFT, RIGHT)))
 
-                for j in [0, 1, -1]:
-                    if (j != 0
-                            and current_index % self.size in (0, self.size - 1)
-                            and (current_index + j) % self.size in (0, self.size - 1)):
-                        continue
+    def _is_useful_shot(self, index):
+        return self.enemy_field[index] == EMPTY and self._fits_any_ship(index)
 
-                    for k in [0, self.size, -self.size]:
-                        neighbour_index = current_index + k + j
+    def _random_empty_index(self):
+        cells_count = self.size ** 2
+        # пока пустых клеток много, случайная клетка почти сразу оказывается пустой
+        for _ in range(cells_count):
+            index = int(random.random() * cells_count)
+            if self._is_useful_shot(index):
+                return index
 
-                        if (neighbour_index < 0
-                                or neighbour_index >= len(self.field)
-                                or self.field[neighbour_index] == SHIP):
-                            continue
+        empty = self._empty_enemy_indexes()
+        # если ответы соперника противоречат флоту, стреляем в любую пустую клетку
+        return random.choice([index for index in empty if self._fits_any_ship(index)] or empty)
 
-                        self.field[neighbour_index] = BLOCKED
+    def get_next_regular_shot_position(self):
+        # дебютная книга: готовые первые выстрелы, пока по ее клеткам не стреляли
+        mapping = self.tables.symmetries[self.symmetry]
+        for index in opening.get_book(self.size, self.ships):
+            index = mapping[index]
+            if self._is_useful_shot(index):
+                return self.calc_position(index)
 
-                self.field[current_index] = SHIP
+        # клетки, где не помещается ни один оставшийся корабль, так и остаются бесполезными
+        for step_index in (0, 1):
+            index = self._next_queued_shot(step_index)
+            if index is not None:
+                return self.calc_position(index)
 
-            return True
+        return self.calc_position(self._random_empty_index())
 
-        while not _try_to_place():
-            pass
-
-    def get_next_regular_shot_position(self):
-        def get_next_position():
-            not_used_predefined_shots_by_step_4 = [
-                (idx, position) for idx, position in enumerate(self.predefined_shots_by_step_4)
-                if position is not None]
-            if not_used_predefined_shots_by_step_4:
-                idx, position = random.choice(not_used_predefined_shots_by_step_4)
-                # отмечаем, что использовали выстрел
-                self.predefined_shots_by_step_4[idx] = None
-                return position
-
-            not_used_predefined_shots_by_step_2 = [
-                (idx, position) for idx, position in enumerate(self.predefined_shots_by_step_2)
-                if position is not None]
-            if not_used_predefined_shots_by_step_2:
-                idx, position = random.choice(not_used_predefined_shots_by_step_2)
-                # отмечаем, что использовали выстрел
-                self.predefined_shots_by_step_2[idx] = None
-                return position
-
-            index = random.choice([i for i, v in enumerate(self.enemy_field) if v == EMPTY])
-            return self.calc_position(index)
-
-        next_position = get_next_position()
-        while self.get_enemy_position_status(position=next_position) != EMPTY:
-            next_position = get_next_position()
-
-        return next_position
+    def _empty_enemy_indexes(self):
+        return [i for i, v in enumerate(self.enemy_field) if v == EMPTY]
 
     def mark_enemy_position(self, position, status):
         x, y = position
@@ -342,107 +521,79 @@ class Game(BaseGame):
         if (1 <= x <= self.size) and (1 <= y <= self.size):
             return self.enemy_field[self.calc_index(position=position)]
 
-    def mark_positions_around_ship_as_missed(self, position, direction=None):
-        x, y = position
-        # север-восток
-        self.mark_enemy_position((x + 1, y - 1), MISS)
-        # юго-восток
-        self.mark_enemy_position((x + 1, y + 1), MISS)
-        # северо-запад
-        self.mark_enemy_position((x - 1, y - 1), MISS)
-        # юго-запад
-        self.mark_enemy_position((x - 1, y + 1), MISS)
-
-        # проверяем клетку сверху
-        if direction in (None, UP):
-            north_position = (x, y - 1)
-            if self.get_enemy_position_status(position=north_position) == SHIP:
-                self.mark_positions_around_ship_as_missed(position=north_position, direction=UP)
-            else:
-                self.mark_enemy_position(north_position, MISS)
-
-        # проверяем клетку справа
-        if direction in (None, RIGHT):
-            east_position = (x + 1, y)
-            if self.get_enemy_position_status(position=east_position) == SHIP:
-                self.mark_positions_around_ship_as_missed(position=east_position, direction=RIGHT)
-            else:
-                self.mark_enemy_position(east_position, MISS)
-
-        # проверяем клетку снизу
-        if direction in (None, DOWN):
-            south_position = (x, y + 1)
-            if self.get_enemy_position_status(position=south_position) == SHIP:
-                self.mark_positions_around_ship_as_missed(position=south_position, direction=DOWN)
-            else:
-                self.mark_enemy_position(south_position, MISS)
-
-        # проверяем клетку слева
-        if direction in (None, LEFT):
-            west_position = (x - 1, y)
-            if self.get_enemy_position_status(position=west_position) == SHIP:
-                self.mark_positions_around_ship_as_missed(position=west_position, direction=LEFT)
-            else:
-                self.mark_enemy_position(west_position, MISS)
+    def mark_positions_around_ship_as_missed(self, position):
+        for index in self.tables.halo(self._enemy_ship_cells(self.calc_index(position))):
+            self.enemy_field[index] = MISS
 
     def do_specified_shot(self, position):
         self.last_shot_position = position
         self.last_shot_enemy_ships_count = self.enemy_ships_count
 
-    def get_next_possible_shots(self, position, direction=None):
-        start_x, start_y = position
+    def _ship_fits(self, index, orientation, hits):
+        """Помещается ли через hits подбитых палуб у клетки index по orientation корабль длиннее их из оставшихся"""
+        span = self._span(index, (UP, DOWN) if orientation == VERTICAL else (LEFT, RIGHT))
+        return any(hits < length <= span for length in self.enemy_ships_left)
+
+    def _walk_frontier(self, index):
+        """Для каждого направления от клетки index -- сколько подбитых палуб подряд лежит на луче"""
+        frontier = []
+        for ray in self.tables.rays[index]:
+            hits = 0
+            for ray_index in ray:
+                if self.enemy_field[ray_index] != SHIP:
+                    break
+                hits += 1
+            frontier.append(hits)
+        return frontier
+
+    def _set_first_ship_hit(self, position):
+        self.first_ship_hit_position = position
+        self.frontier = self._walk_frontier(self.calc_index(position)) if position is not None else None
+
+    def _advance_frontier(self, index):
+        """Сдвигает край недобитого корабля после попадания в клетку index"""
+        rays = self.tables.rays[self.calc_index(self.first_ship_hit_position)]
+        for direction, ray in enumerate(rays):
+            hits = self.frontier[direction]
+            if hits < len(ray) and ray[hits] == index:
+                while hits < len(ray) and self.enemy_field[ray[hits]] == SHIP:
+                    hits += 1
+                self.frontier[direction] = hits
+                return
+        # попали не в край корабля (например, ответ пришел повторно) -- проходим лучи заново
+        self._set_first_ship_hit(self.first_ship_hit_position)
+
+    def handle_enemy_reply(self, message):
+        super(Game, self).handle_enemy_reply(message)
+        if message in ('hit', 'kill') and self.frontier is not None and self.last_shot_position is not None:
+            self._advance_frontier(self.calc_index(self.last_shot_position))
+
+    def get_next_possible_shots(self, position):
+        index = self.calc_index(position)
+        rays = self.tables.rays[index]
+        if position == self.first_ship_hit_position and self.frontier is not None:
+            frontier = self.frontier
+        else:
+            frontier = self._walk_frontier(index)
 
         ship_orientation = None
-        vertical_possible_shots = []
-
-        # проверяем клетку сверху
-        if direction in (None, UP):
-            north_position = (start_x, start_y - 1)
-            enemy_position_status = self.get_enemy_position_status(position=north_position)
-            if enemy_position_status == SHIP:
-                ship_orientation = VERTICAL
-                vertical_possible_shots += self.get_next_possible_shots(position=north_position, direction=UP)
-            elif enemy_position_status == EMPTY:
-                vertical_possible_shots.append(north_position)
-
-        # проверяем клетку снизу
-        if direction in (None, DOWN):
-            south_position = (start_x, start_y + 1)
-            enemy_position_status = self.get_enemy_position_status(position=south_position)
-            if enemy_position_status == SHIP:
-                ship_orientation = VERTICAL
-                vertical_possible_shots += self.get_next_possible_shots(position=south_position, direction=DOWN)
-            elif enemy_position_status == EMPTY:
-                vertical_possible_shots.append(south_position)
-
-        horisontal_possible_shots = []
-
-        # проверяем клетку справа
-        if direction in (None, RIGHT):
-            east_position = (start_x + 1, start_y)
-            enemy_position_status = self.get_enemy_position_status(position=east_position)
-            if enemy_position_status == SHIP:
-                ship_orientation = HORIZONTAL
-                horisontal_possible_shots += self.get_next_possible_shots(position=east_position, direction=RIGHT)
-            elif enemy_position_status == EMPTY:
-                horisontal_possible_shots.append(east_position)
-
-        # проверяем клетку слева
-        if direction in (None, LEFT):
-            west_position = (start_x - 1, start_y)
-            enemy_position_status = self.get_enemy_position_status(position=west_position)
-            if enemy_position_status == SHIP:
-                ship_orientation = HORIZONTAL
-                horisontal_possible_shots += self.get_next_possible_shots(position=west_position, direction=LEFT)
-            elif enemy_position_status == EMPTY:
-                horisontal_possible_shots.append(west_position)
-
-        if ship_orientation == VERTICAL:
-            return vertical_possible_shots
-        elif ship_orientation == HORIZONTAL:
-            return horisontal_possible_shots
-
-        return vertical_possible_shots + horisontal_possible_shots
+        possible_shots = {VERTICAL: [], HORIZONTAL: []}
+
+        # за подбитыми палубами на каждом луче берем первую клетку, если она пустая
+        for direction, orientation in ((UP, VERTICAL), (DOWN, VERTICAL), (RIGHT, HORIZONTAL), (LEFT, HORIZONTAL)):
+            ray = rays[direction]
+            hits = frontier[direction]
+            if hits:
+                ship_orientation = orientation
+            if hits < len(ray) and self.enemy_field[ray[hits]] == EMPTY:
+                possible_shots[orientation].append(self.calc_position(ray[hits]))
+
+        orientations = [ship_orientation] if ship_orientation is not None else [VERTICAL, HORIZONTAL]
+        # направления, где недобитый корабль не помещается ни одной длиной из оставшихся, отбрасываем;
+        # если не помещается нигде, ответы соперника противоречат флоту и стреляем по всем вариантам
+        fitting = [orientation for orientation in orientations
+                   if self._ship_fits(index, orientation, 1 + sum(frontier[d] for d in _directions[orientation]))]
+        return sum((possible_shots[orientation] for orientation in fitting or orientations), [])
 
     def do_shot(self):
         """Метод выбора координаты выстрела.
@@ -467,7 +618,7 @@ class Game(BaseGame):
                 else:
                     # только что обнаружили корабль
                     self.found_ship = True
-                    self.first_ship_hit_position = self.last_shot_position
+                    self._set_first_ship_hit(self.last_shot_position)
 
                     next_possible_shots = self.get_next_possible_shots(self.first_ship_hit_position)
                     self.do_specified_shot(random.choice(next_possible_shots))
@@ -477,7 +628,7 @@ class Game(BaseGame):
 
                 # сбрасываем вспомогательные данные о найденном корабле
                 self.found_ship = False
-                self.first_ship_hit_position = None
+                self._set_first_ship_hit(None)
 
                 # делаем обычный выстрел
                 self.do_specified_shot(self.get_next_regular_shot_position())
@@ -495,25 +646,82 @@ class Game(BaseGame):
     def __init__(self):
         super(Game, self).__init__()
 
-        self.predefined_shots_by_step_4 = None
-        self.predefined_shots_by_step_2 = None
+        # выстрелы шаблонов идут в случайном порядке: очереди перемешиваются по зерну, а в
+        # состоянии хранятся только зерно и сколько клеток каждой очереди уже пройдено
+        self.shot_queue_seed = 0
+        self.symmetry = 0
+        self.shot_queues = [[], []]
+        self.shot_queue_cursors = [0, 0]
 
         self.last_shot_enemy_ships_count = 0
         self.last_shot_direction = None
         self.first_ship_hit_position = None
+        # для каждого направления от первого попадания -- сколько подбитых палуб лежит на луче
+        self.frontier = None
         self.found_ship = False
 
     def start_new_game(self, size=10, field=None, ships=None, numbers=None):
         super(Game, self).start_new_game(size=size, field=field, ships=ships, numbers=numbers)
 
-        self.predefined_shots_by_step_4 = [position for position in self.diagonal_shots(step=4)]
-        self.predefined_shots_by_step_2 = [position for position in self.diagonal_shots(step=2)]
+        self.shot_queue_seed = random.getrandbits(32)
+        self._shuffle_shot_queues()
+        self.shot_queue_cursors = [0, 0]
 
         self.last_shot_enemy_ships_count = self.enemy_ships_count
         self.last_shot_direction = None
-        self.first_ship_hit_position = None
+        self._set_first_ship_hit(None)
         self.found_ship = False
 
+    def _write_state(self, data):
+        super(Game, self)._write_state(data)
+        data.extend([
+            self.last_shot_enemy_ships_count,
+            int(self.found_ship),
+            self._pack_position(self.first_ship_hit_position),
+        ])
+        # очереди выстрелов однозначно задаются размером поля и зерном
+        data.extend(struct.pack(b'<I', self.shot_queue_seed))
+        data.extend(self.shot_queue_cursors)
+
+    def _read_state(self, data, offset):
+        offset = super(Game, self)._read_state(data, offset)
+        self.last_shot_enemy_ships_count, found_ship, first_ship_hit = data[offset:offset + 3]
+        offset += 3
+        self.found_ship = bool(found_ship)
+        self._set_first_ship_hit(self._unpack_position(first_ship_hit))
+
+        if data[0] >= 3:
+            if len(data) < offset + 6:
+                raise ValueError('Broken shot queues')
+            self.shot_queue_seed, = struct.unpack(b'<I', bytes(data[offset:offset + 4]))
+            self.shot_queue_cursors = list(data[offset + 4:offset + 6])
+            offset += 6
+        else:
+            # до версии 3 хранились флаги использованных выстрелов; использованные клетки уже
+            # обстреляны или бесполезны, так что очереди можно пройти заново с начала
+            for _ in (4, 2):
+                _, offset = _unpack_flags(data, offset + 1, data[offset])
+            self.shot_queue_seed = 0
+            self.shot_queue_cursors = [0, 0]
+        self._shuffle_shot_queues()
+        return offset
+
+    def predefined_shots(self, step):
+        """Новый список выстрелов по диагоналям с шагом step; сами диагонали считаются один раз на размер поля"""
+        key = ('diagonal_shots', step)
+        shots = self.tables.cache.get(key)
+        if shots is None:
+            shots = self.tables.cache[key] = tuple(self.diagonal_shots(step=step))
+        return list(shots)
+
+    def predefined_indexes(self, step):
+        """Номера клеток выстрелов по диагоналям с шагом step, в том же порядке"""
+        key = ('diagonal_indexes', step)
+        indexes = self.tables.cache.get(key)
+        if indexes is None:
+            indexes = self.tables.cache[key] = tuple(self.calc_index(position) for position in self.predefined_shots(step))
+        return indexes
+
     def diagonal_positions(self, field_size):
         for i in range(field_size):
             yield field_size - i, i + 1
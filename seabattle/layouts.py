@@ -0,0 +1,285 @@
+# coding: utf-8
+"""Пул заранее сгенерированных расстановок кораблей для быстрого начала новой игры.
+
+Построить файл с расстановками:
+    python -m seabattle.layouts build mldata/layouts.bin --count 100000
+Проверить равномерность расстановок из файла:
+    python -m seabattle.layouts check mldata/layouts.bin
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import atexit
+import collections
+import logging
+import mmap
+import os
+import random
+import struct
+import threading
+import weakref
+
+from seabattle import game, placement
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 256
+
+FILE_MAGIC = b'SBLP'
+FILE_VERSION = 1
+# magic, версия, размер поля, длина записи в байтах, число записей
+_file_header = struct.Struct(str('<4sBBHI'))
+
+# пулы с фоновым пополнением; при выходе их потоки останавливаются до разбора модулей
+_pools = weakref.WeakSet()
+
+
+def generate_field(size=10, ships=None):
+    """Новое поле с расстановкой флота ships в виде кортежа клеток"""
+    field = [game.EMPTY] * size ** 2
+    for cells in placement.generate_layout(size, ships or game.BaseGame.default_ships):
+        for index in cells:
+            field[index] = game.SHIP
+    return tuple(field)
+
+
+class LayoutPool(object):
+    """Кольцевой буфер готовых расстановок для одного размера поля и одного флота.
+
+    Стратегии пополнения:
+    - background -- фоновый поток доливает буфер, как только в нем остается меньше low_watermark;
+    - inline -- опустевший буфер заполняется пачкой прямо в get, стоимость размазывается по запросам.
+    Если буфер пуст, get генерирует поле сам, так что ответ есть всегда.
+    """
+
+    def __init__(self, size=10, ships=None, capacity=DEFAULT_CAPACITY, low_watermark=None, refill='background'):
+        if refill not in ('background', 'inline'):
+            raise ValueError('Unknown refill strategy: %s' % refill)
+
+        self.size = size
+        self.ships = list(ships or game.BaseGame.default_ships)
+        self.capacity = capacity
+        self.low_watermark = low_watermark if low_watermark is not None else capacity // 2
+        self.refill = refill
+        self.stats = collections.Counter()
+
+        self._layouts = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        _pools.add(self)
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def _ensure_thread(self):
+        # после fork потоки родителя не переживают, поэтому у каждого процесса свой поток
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='layout-pool')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wanted.wait()
+            self._wanted.clear()
+            self.fill()
+
+    def stop(self):
+        """Останавливает фоновое пополнение; get после этого генерирует поля сам"""
+        self._stopped.set()
+        self._wanted.set()
+
+    def fill(self, count=None):
+        """Доливает буфер до count расстановок, по умолчанию до полного"""
+        count = self.capacity if count is None else min(count, self.capacity)
+        while len(self._layouts) < count and not self._stopped.is_set():
+            self._layouts.append(generate_field(self.size, self.ships))
+            self.stats['generated'] += 1
+
+    def get(self):
+        """Поле для новой игры: список клеток, который можно менять"""
+        try:
+            field = self._layouts.popleft()
+            self.stats['hits'] += 1
+        except IndexError:
+            field = None
+            self.stats['misses'] += 1
+
+        if self.refill == 'background' and not self._stopped.is_set():
+            self._ensure_thread()
+            if len(self._layouts) < self.low_watermark:
+                self._wanted.set()
+        elif field is None:
+            with self._lock:
+                self.fill()
+
+        if field is None:
+            field = generate_field(self.size, self.ships)
+        return list(field)
+
+
+@atexit.register
+def _stop_pools():
+    pools = list(_pools)
+    for pool in pools:
+        pool.stop()
+    # поток может дорисовывать поле: ждем его, пока модули еще на месте
+    for pool in pools:
+        if pool._thread is not None and pool._thread.is_alive():
+            pool._thread.join(1)
+
+
+class LayoutFile(object):
+    """Файл заранее посчитанных расстановок, отображенный в память.
+
+    Каждая запись -- битовая маска клеток с кораблями, get выбирает случайную запись за O(1).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.size, self.record_length, self.count = _file_header.unpack_from(self._mmap, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError('Unsupported layouts file: %s' % path)
+        if not self.count or len(self._mmap) != _file_header.size + self.record_length * self.count:
+            raise ValueError('Broken layouts file: %s' % path)
+
+        self.stats = collections.Counter()
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def write(path, fields, size):
+        """Записывает расстановки из итератора fields, не держа их все в памяти"""
+        record_length = (size ** 2 + 7) // 8
+        count = 0
+        with open(path, 'wb') as f:
+            f.seek(_file_header.size)
+            for field in fields:
+                record = bytearray(record_length)
+                for index, value in enumerate(field):
+                    if value == game.SHIP:
+                        record[index >> 3] |= 1 << (index & 7)
+                f.write(bytes(record))
+                count += 1
+
+            f.seek(0)
+            f.write(_file_header.pack(FILE_MAGIC, FILE_VERSION, size, record_length, count))
+        return count
+
+    def read(self, number):
+        offset = _file_header.size + number * self.record_length
+        record = bytearray(self._mmap[offset:offset + self.record_length])
+        return [game.SHIP if record[index >> 3] & (1 << (index & 7)) else game.EMPTY
+                for index in range(self.size ** 2)]
+
+    def get(self):
+        self.stats['hits'] += 1
+        return self.read(random.randrange(self.count))
+
+    def __iter__(self):
+        for number in range(self.count):
+            yield self.read(number)
+
+
+def cell_frequencies(fields):
+    """Доля расстановок, в которых клетка занята кораблем, для каждой клетки"""
+    counts = None
+    total = 0
+    for field in fields:
+        if counts is None:
+            counts = [0] * len(field)
+        for index, value in enumerate(field):
+            if value == game.SHIP:
+                counts[index] += 1
+        total += 1
+    return [count / float(total) for count in counts]
+
+
+def uniformity_report(fields, reference_count=2000, size=10, ships=None):
+    """Сравнивает частоты занятости клеток в fields со свежими расстановками генератора.
+
+    Возвращает максимальное отклонение частоты по клетке и статистику хи-квадрат: сумму
+    квадратов z-оценок разности долей по клеткам с учетом шума обеих выборок. Клетки
+    не независимы, так что число степеней свободы (число клеток) -- ориентир, а не точная величина.
+    """
+    fields = list(fields)
+    observed = cell_frequencies(fields)
+    expected = cell_frequencies(generate_field(size, ships) for _ in range(reference_count))
+
+    chi_square = 0.0
+    for observed_frequency, expected_frequency in zip(observed, expected):
+        if 0 < expected_frequency < 1:
+            variance = expected_frequency * (1 - expected_frequency) * (1.0 / len(fields) + 1.0 / reference_count)
+            chi_square += (observed_frequency - expected_frequency) ** 2 / variance
+
+    return {
+        'layouts': len(fields),
+        'max_deviation': max(abs(o - e) for o, e in zip(observed, expected)),
+        'chi_square': chi_square,
+        'degrees_of_freedom': len(observed),
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def create_pool():
+    """Создает источник расстановок по переменным окружения"""
+    path = os.environ.get('SEABATTLE_LAYOUTS_FILE')
+    if path:
+        return LayoutFile(path)
+
+    return LayoutPool(
+        capacity=int(os.environ.get('SEABATTLE_LAYOUT_POOL_SIZE', DEFAULT_CAPACITY)),
+        refill=os.environ.get('SEABATTLE_LAYOUT_POOL_REFILL', 'background'),
+    )
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = create_pool()
+    return _pool
+
+
+def main():
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Заранее посчитанные расстановки кораблей')
+    subparsers = parser.add_subparsers(dest='command')
+    build = subparsers.add_parser('build', help='сгенерировать файл расстановок')
+    build.add_argument('path')
+    build.add_argument('--count', type=int, default=100000)
+    build.add_argument('--seed', type=int, default=None)
+    check = subparsers.add_parser('check', help='проверить равномерность расстановок из файла')
+    check.add_argument('path')
+    check.add_argument('--reference', type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        random.seed(args.seed)
+        LayoutFile.write(args.path, (generate_field() for _ in range(args.count)), size=10)
+        log.info('Written %s layouts to %s', args.count, args.path)
+    else:
+        layouts = LayoutFile(args.path)
+        report = uniformity_report(layouts, reference_count=args.reference, size=layouts.size)
+        for key in ('layouts', 'max_deviation', 'chi_square', 'degrees_of_freedom'):
+            print('%s: %s' % (key, report[key]))
+
+
+if __name__ == '__main__':
+    main()
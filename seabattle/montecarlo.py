@@ -0,0 +1,276 @@
+# coding: utf-8
+"""Стрельба по выборке расстановок флота соперника (метод Монте-Карло) с бюджетом времени.
+
+Вместо независимых счетчиков по каждой длине, как в density, выбираются целые расстановки
+оставшихся кораблей, согласованные с полем соперника: корабли не стоят на промахах и не
+касаются друг друга, а подбитые палубы накрыты одним кораблем. Стреляем в пустую клетку,
+которую накрывает больше всего расстановок выборки.
+
+Выборка пополняется, пока не кончится бюджет на выстрел (SEABATTLE_MC_BUDGET_MS, по умолчанию
+20 мс), так что ответ навыка не выходит за срок. С бюджетом времени выбор выстрела зависит от
+скорости процессора, поэтому в турнирах и пакетных симуляциях (Game.for_simulation), а также
+при заданной SEABATTLE_MC_SAMPLES делается постоянное число попыток выбрать расстановку.
+Между выстрелами выборка хранится в памяти процесса по состоянию поля: после ответа соперника
+из нее убираются расстановки, которые ответу противоречат, а оставшиеся переходят к следующему
+выстрелу.
+
+Выигрыша в числе выстрелов у density.Game пока не измерено (benchmarks/bench_montecarlo.py),
+а выстрел обходится в десятки раз дороже.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import logging
+import os
+import random
+import threading
+import time
+
+from seabattle import density
+from seabattle.game import EMPTY, SHIP, MISS
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_MS = 20
+# попыток выбрать расстановку на выстрел в турнирах и пакетных симуляциях: 5-10 мс на выстрел
+SIMULATION_SAMPLES = 1000
+# больше расстановок на выстрел не нужно: оценки клеток уже не меняются
+MAX_SAMPLES = 4000
+# сколько партий помнить выборку; старые вытесняются
+CACHE_SIZE = 1024
+# сколько раз пробовать поставить корабль, прежде чем начать расстановку заново
+PLACE_ATTEMPTS = 20
+# сверх бюджета на выборку: разбор поля и выбор лучшей клетки
+SHOT_OVERHEAD = 0.005
+
+
+class Samples(object):
+    """Выборка расстановок и сколько раз каждая клетка накрыта кораблем в ней.
+
+    Расстановка -- пара (маска всех клеток, кортеж расстановок кораблей из placement_masks).
+    Пока есть подбитые палубы (маска hits), считаются только клетки корабля, который их
+    накрывает: добить корабль выгоднее, чем стрелять туда, где чуть чаще стоят другие.
+    """
+
+    def __init__(self, cells_count, hits=0):
+        self.hits = hits
+        self.layouts = []
+        self.counts = [0] * cells_count
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def _count(self, layout, delta):
+        counts = self.counts
+        hits = self.hits
+        for option in layout[1]:
+            if option[0] & hits == hits:
+                for index in option[2]:
+                    counts[index] += delta
+
+    def add(self, layout):
+        self.layouts.append(layout)
+        self._count(layout, 1)
+
+    def discard(self, bit):
+        """Убирает расстановки, где корабль стоит на клетке с маской bit"""
+        kept = []
+        for layout in self.layouts:
+            if layout[0] & bit:
+                self._count(layout, -1)
+            else:
+                kept.append(layout)
+        self.layouts = kept
+
+
+class SampleCache(object):
+    """Выборки расстановок по состоянию поля соперника; вытесняются самые давние"""
+
+    def __init__(self, capacity=CACHE_SIZE):
+        self.capacity = capacity
+        self._samples = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def pop(self, key):
+        with self._lock:
+            return self._samples.pop(key, None)
+
+    def put(self, key, samples):
+        with self._lock:
+            self._samples.pop(key, None)
+            self._samples[key] = samples
+            while len(self._samples) > self.capacity:
+                self._samples.popitem(last=False)
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class Stats(object):
+    """Сколько расстановок выбрано и сколько времени на это ушло в этом процессе"""
+
+    def __init__(self):
+        self.samples = 0
+        self.reused = 0
+        self.seconds = 0.0
+
+    def info(self):
+        return {
+            'samples': self.samples,
+            'reused': self.reused,
+            'seconds': self.seconds,
+            'samples_per_second': self.samples / self.seconds if self.seconds else 0.0,
+        }
+
+
+cache = SampleCache()
+stats = Stats()
+
+
+class Game(density.Game):
+    """Выстрел в клетку, которую чаще всего накрывают выбранные наугад расстановки флота.
+
+    Если за бюджет не набралось ни одной расстановки (или ответы соперника противоречат флоту),
+    выстрел выбирается по карте плотности density.Game.
+    """
+
+    budget = float(os.environ.get('SEABATTLE_MC_BUDGET_MS', DEFAULT_BUDGET_MS)) / 1e3
+    # если не 0 -- столько попыток выбрать расстановку на выстрел вместо бюджета времени
+    samples_per_shot = int(os.environ.get('SEABATTLE_MC_SAMPLES', 0))
+    max_samples = MAX_SAMPLES
+
+    @classmethod
+    def for_simulation(cls):
+        if cls.samples_per_shot:
+            return cls
+        return type(str(cls.__name__), (cls,), {'samples_per_shot': SIMULATION_SAMPLES, '__module__': cls.__module__})
+
+    @property
+    def shot_time_budget(self):
+        if self.samples_per_shot:
+            # объем работы постоянный, а время зависит от машины: предупреждать не о чем
+            return float('inf')
+        return self.budget + SHOT_OVERHEAD
+
+    def _cache_key(self):
+        return self.size, tuple(self.ships), bytes(bytearray(self.enemy_field))
+
+    def _masks(self):
+        """Маски клеток, где корабля быть не может, и подбитых палуб недобитого корабля"""
+        blocked = 0
+        hits = 0
+        for index, value in enumerate(self.enemy_field):
+            if value == MISS:
+                blocked |= 1 << index
+            elif value == SHIP:
+                if index in self.target_hits:
+                    hits |= 1 << index
+                else:
+                    blocked |= 1 << index
+        return blocked, hits
+
+    def _sampler(self):
+        """Функция, которая пробует выбрать одну расстановку флота и возвращает ее или None.
+
+        Сначала ставится корабль через подбитые палубы, затем остальные от длинных к коротким.
+        """
+        blocked, hits = self._masks()
+        options = dict((length, [option for option in self.tables.placement_masks(length)
+                                 if not option[0] & blocked])
+                       for length in self.enemy_ships_left)
+
+        # каждая подходящая расстановка каждого оставшегося корабля -- равновероятно
+        covering = []
+        if hits:
+            for length, count in self.enemy_ships_left.items():
+                covering.extend((length, option) for option in options[length]
+                                if option[0] & hits == hits for _ in range(count))
+            if not covering:
+                return None
+
+        fleet = sorted(self.enemy_ships_left.elements(), reverse=True)
+        rand = random.random
+
+        def sample():
+            placed = []
+            busy = 0
+            ships = fleet
+            if covering:
+                length, option = covering[int(rand() * len(covering))]
+                placed.append(option)
+                busy = option[1]
+                ships = list(fleet)
+                ships.remove(length)
+
+            for length in ships:
+                length_options = options[length]
+                if not length_options:
+                    return None
+                for _ in range(PLACE_ATTEMPTS):
+                    option = length_options[int(rand() * len(length_options))]
+                    if not option[0] & busy:
+                        break
+                else:
+                    return None
+                placed.append(option)
+                busy |= option[1]
+
+            mask = 0
+            for option in placed:
+                mask |= option[0]
+            return mask, tuple(placed)
+
+        return sample
+
+    def draw_samples(self, samples, deadline=None):
+        """Пополняет выборку до max_samples или до deadline по time.time();
+        без deadline делает samples_per_shot попыток"""
+        started = time.time()
+        sampler = self._sampler() if self.enemy_ships_left else None
+        drawn = 0
+        attempts = 0
+        if sampler is not None:
+            while len(samples) < self.max_samples:
+                if deadline is None:
+                    if attempts >= self.samples_per_shot:
+                        break
+                    attempts += 1
+                elif time.time() >= deadline:
+                    break
+                layout = sampler()
+                if layout is not None:
+                    samples.add(layout)
+                    drawn += 1
+
+        stats.samples += drawn
+        stats.seconds += time.time() - started
+        return samples
+
+    def choose_shot_index(self):
+        deadline = None if self.samples_per_shot else time.time() + self.budget
+        key = self._cache_key()
+        samples = cache.pop(key) or Samples(self.size ** 2, self._masks()[1])
+        stats.reused += len(samples)
+        self.draw_samples(samples, deadline)
+        cache.put(key, samples)
+
+        counts = samples.counts
+        best_score = max(counts[i] for i, v in enumerate(self.enemy_field) if v == EMPTY) if samples else 0
+        if best_score <= 0:
+            log.debug('No consistent layouts sampled, using density map')
+            return super(Game, self).choose_shot_index()
+        return random.choice([i for i, v in enumerate(self.enemy_field) if v == EMPTY and counts[i] == best_score])
+
+    def handle_enemy_reply(self, message):
+        if self.last_shot_position is None:
+            return
+
+        samples = cache.pop(self._cache_key())
+        super(Game, self).handle_enemy_reply(message)
+        # после попадания согласованы лишь часть расстановок и считать нужно другие клетки,
+        # так что выборка переживает только промах
+        if samples and message == 'miss':
+            samples.discard(1 << self.calc_index(self.last_shot_position))
+            cache.put(self._cache_key(), samples)
@@ -0,0 +1,301 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import collections
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+log = logging.getLogger(__name__)
+
+MODEL_PATH = 'mldata/'
+# проект в mldata/: разные профили конвейера обучаются в разные проекты
+PROJECT = os.environ.get('SEABATTLE_NLU_PROJECT', 'default')
+# реплики, разобранные с меньшей уверенностью, навык переспрашивает
+CONFIDENCE_THRESHOLD = 0.8
+DEFAULT_CACHE_SIZE = 10000
+# как часто проверять, не поменялась ли модель в mldata/, в секундах
+FINGERPRINT_INTERVAL = 5
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_BATCH_WAIT = 0.005
+
+
+def model_fingerprint(path=MODEL_PATH):
+    """Хеш путей, размеров и времени изменения всех файлов модели"""
+    digest = hashlib.md5()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            digest.update(('%s:%s:%s\n' % (file_path, stat.st_size, stat.st_mtime)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class NLUCache(object):
+    """LRU-кэш ответов NLU по нормализованной реплике.
+
+    Хранит намерение, уверенность и сущности. Значение и позиция сущности относятся к тексту
+    реплики, поэтому ответ с сущностями хранится по точному тексту, а по нормализованному --
+    только ответы без сущностей. Кэш очищается сам, когда меняются файлы
+    модели: отпечаток mldata/ проверяется не чаще раза в FINGERPRINT_INTERVAL секунд.
+    Объем памяти оценивается по длине ответов в JSON.
+    """
+
+    def __init__(self, normalize, capacity=DEFAULT_CACHE_SIZE, path=MODEL_PATH,
+                 fingerprint=model_fingerprint, interval=FINGERPRINT_INTERVAL, clock=time.time):
+        self.normalize = normalize
+        self.capacity = capacity
+        self.path = path
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.clock = clock
+        self.stats = collections.Counter()
+
+        # нормализованная реплика или кортеж (точный текст,) -> (ответ, оценка размера в байтах)
+        self._items = collections.OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+        self._model = fingerprint(path)
+        self._checked_at = clock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _check_model(self):
+        now = self.clock()
+        if now - self._checked_at < self.interval:
+            return
+        self._checked_at = now
+
+        model = self.fingerprint(self.path)
+        if model != self._model:
+            log.info('NLU model in %s changed, clearing cache', self.path)
+            self._model = model
+            self._items.clear()
+            self._memory = 0
+            self.stats['invalidations'] += 1
+
+    def get(self, message):
+        """Копия ответа NLU для реплики или None; поле text -- сама реплика"""
+        with self._lock:
+            self._check_model()
+            key = (message,)
+            item = self._items.pop(key, None)
+            if item is None:
+                key = self.normalize(message)
+                item = self._items.pop(key, None)
+            if item is None:
+                self.stats['misses'] += 1
+                return None
+            self._items[key] = item
+            self.stats['hits'] += 1
+
+        response = copy.deepcopy(item[0])
+        response['text'] = message
+        return response
+
+    def put(self, message, response):
+        if not self.capacity:
+            return
+
+        value = {
+            'intent': response.get('intent'),
+            'entities': response.get('entities', []),
+        }
+        key = (message,) if value['entities'] else self.normalize(message)
+        size = len(message) + len(json.dumps(value))
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._memory -= old[1]
+            self._items[key] = (copy.deepcopy(value), size)
+            self._memory += size
+
+            while len(self._items) > self.capacity:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._memory -= evicted_size
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._memory = 0
+
+    def info(self):
+        requests = self.stats['hits'] + self.stats['misses']
+        info = dict(self.stats)
+        info.update({
+            'entries': len(self._items),
+            'memory_bytes': self._memory,
+            'hit_ratio': self.stats['hits'] / float(requests) if requests else None,
+        })
+        return info
+
+
+def create_cache(normalize):
+    return NLUCache(normalize, capacity=int(os.environ.get('SEABATTLE_NLU_CACHE_SIZE', DEFAULT_CACHE_SIZE)))
+
+
+class BatchParser(object):
+    """Собирает одновременные запросы разбора в пачки для parse_batch.
+
+    Фоновый поток берет первую реплику из очереди и ждет остальные не дольше max_wait
+    секунд или пока пачка не наберет max_batch_size реплик; если в пачке уже все ждущие
+    вызовы, ждать нечего и она уходит сразу. parse_batch получает список
+    реплик и возвращает список ответов в том же порядке. parse блокирует вызывающий поток
+    до ответа; если parse_batch упал, исключение получает каждый вызов из пачки.
+    """
+
+    def __init__(self, parse_batch, max_batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_BATCH_WAIT,
+                 clock=time.time):
+        self.parse_batch = parse_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.clock = clock
+        self.stats = collections.Counter()
+
+        self._requests = queue.Queue()
+        # сколько вызовов parse ждут ответа
+        self._pending = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # после fork поток родителя в дочернем процессе не работает
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._thread = threading.Thread(target=self._run, name='nlu-batch')
+                self._thread.daemon = True
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def parse(self, text):
+        self._ensure_thread()
+        request = [text, threading.Event(), None, None]
+        with self._lock:
+            self._pending += 1
+        self._requests.put(request)
+        request[1].wait()
+        with self._lock:
+            self._pending -= 1
+        if request[3] is not None:
+            raise request[3]
+        return request[2]
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        deadline = self.clock() + self.max_wait
+        while len(batch) < min(self.max_batch_size, self._pending):
+            timeout = deadline - self.clock()
+            try:
+                batch.append(self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.stats['batches'] += 1
+            self.stats['messages'] += len(batch)
+            try:
+                results = self.parse_batch([request[0] for request in batch])
+                for request, result in zip(batch, results):
+                    request[2] = result
+            except Exception as e:
+                log.exception('Batch parse failed')
+                for request in batch:
+                    request[3] = e
+            for request in batch:
+                request[1].set()
+
+    def info(self):
+        info = dict(self.stats)
+        if self.stats['batches']:
+            info['mean_batch_size'] = self.stats['messages'] / float(self.stats['batches'])
+        return info
+
+
+def latest_model_dir(path=MODEL_PATH, project=PROJECT):
+    """Каталог самой свежей модели проекта, как ее выбирает DataRouter"""
+    project_path = os.path.join(path, project)
+    models = sorted(name for name in os.listdir(project_path) if name.startswith('model_'))
+    if not models:
+        raise ValueError('No trained models in %s' % project_path)
+    return os.path.join(project_path, models[-1])
+
+
+class InterpreterBatch(object):
+    """Разбор пачки реплик моделью rasa_nlu.
+
+    Самый дорогой этап, spaCy, обрабатывает всю пачку одним вызовом nlp.pipe; остальные
+    компоненты конвейера, как и в Interpreter.parse, вызываются для каждой реплики.
+    """
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        pipeline = interpreter.pipeline
+        self.spacy = pipeline[0] if pipeline and getattr(pipeline[0], 'name', None) == 'nlp_spacy' else None
+        self.components = pipeline[1:] if self.spacy is not None else pipeline
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, project=PROJECT):
+        from rasa_nlu.model import Interpreter
+
+        return cls(Interpreter.load(latest_model_dir(path, project)))
+
+    def _spacy_docs(self, texts):
+        if not self.spacy.component_config.get('case_sensitive'):
+            texts = [text.lower() for text in texts]
+        return self.spacy.nlp.pipe(texts)
+
+    def parse_batch(self, texts):
+        from rasa_nlu.training_data import Message
+
+        interpreter = self.interpreter
+        messages = [Message(text, interpreter.default_output_attributes()) for text in texts]
+        if self.spacy is not None:
+            for message, doc in zip(messages, self._spacy_docs(texts)):
+                message.set('spacy_doc', doc)
+
+        results = []
+        for message in messages:
+            for component in self.components:
+                component.process(message, **interpreter.context)
+            output = interpreter.default_output_attributes()
+            output.update(message.as_dict(only_output_properties=True))
+            results.append(output)
+        return results
+
+
+def batching_enabled():
+    return int(os.environ.get('SEABATTLE_NLU_BATCH_SIZE', 0)) > 1
+
+
+def create_batch_parser():
+    """Пакетный разбор NLU, если SEABATTLE_NLU_BATCH_SIZE больше единицы, иначе None"""
+    if not batching_enabled():
+        return None
+    max_batch_size = int(os.environ['SEABATTLE_NLU_BATCH_SIZE'])
+
+    max_wait = float(os.environ.get('SEABATTLE_NLU_BATCH_WAIT_MS', DEFAULT_BATCH_WAIT * 1e3)) / 1e3
+    log.info('NLU micro-batching: up to %s messages, wait %.1f ms', max_batch_size, max_wait * 1e3)
+    return BatchParser(InterpreterBatch.load().parse_batch, max_batch_size=max_batch_size, max_wait=max_wait)
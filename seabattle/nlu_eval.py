@@ -0,0 +1,205 @@
+# coding: utf-8
+"""Обучение и сравнение профилей конвейера rasa_nlu: точность намерений против задержки.
+
+Обучение с отчетом о времени каждого компонента:
+    python -m seabattle.nlu_eval train --config config/nlu_config_fast.yml --project fast
+Сравнение профилей на примерах из intents_config.json (k-кратная перекрестная проверка):
+    python -m seabattle.nlu_eval evaluate --config config/nlu_config.yml --config config/nlu_config_fast.yml
+
+Для каждого профиля печатается доля верно угаданных намерений, доля верных с уверенностью
+не ниже порога навыка (nlu.CONFIDENCE_THRESHOLD, иначе навык переспросит), перцентили
+времени разбора одной реплики и среднее время каждого компонента. С --folds 1 модель
+проверяется на тех же примерах, на которых обучалась, и точность получается завышенной.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import collections
+import contextlib
+import logging
+import random
+import time
+
+from seabattle import nlu
+
+
+log = logging.getLogger(__name__)
+
+DATA_PATH = 'config/intents_config.json'
+CONFIGS = ['config/nlu_config.yml', 'config/nlu_config_fast.yml']
+DEFAULT_FOLDS = 5
+
+Prediction = collections.namedtuple('Prediction', 'expected intent confidence duration')
+
+
+class ComponentTimer(object):
+    """Время вызовов одного метода (train, process) у каждого компонента конвейера"""
+
+    def __init__(self):
+        self.durations = collections.OrderedDict()
+
+    def _timed(self, name, func):
+        durations = self.durations.setdefault(name, [])
+
+        def timed(*args, **kwargs):
+            started = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                durations.append(time.time() - started)
+        return timed
+
+    @contextlib.contextmanager
+    def timing(self, components, method):
+        # обертка ставится на экземпляр и снимается до сохранения модели: компоненты
+        # сохраняются через pickle
+        for component in components:
+            setattr(component, method, self._timed(component.name, getattr(component, method)))
+        try:
+            yield self
+        finally:
+            for component in components:
+                delattr(component, method)
+
+    def report(self):
+        """[(компонент, число вызовов, всего секунд, в среднем секунд)]"""
+        return [(name, len(durations), sum(durations), sum(durations) / len(durations) if durations else 0.0)
+                for name, durations in self.durations.items()]
+
+
+def split_folds(examples, folds, seed=0):
+    """Пары (обучающие, проверочные) для k-кратной проверки; при folds=1 обе части -- все примеры"""
+    if folds <= 1:
+        return [(list(examples), list(examples))]
+
+    examples = list(examples)
+    random.Random(seed).shuffle(examples)
+    parts = [examples[i::folds] for i in range(folds)]
+    return [(sum(parts[:i] + parts[i + 1:], []), parts[i]) for i in range(folds)]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(predictions, threshold=nlu.CONFIDENCE_THRESHOLD):
+    total = len(predictions)
+    correct = [p for p in predictions if p.intent == p.expected]
+    durations = [p.duration for p in predictions]
+    return {
+        'examples': total,
+        'accuracy': len(correct) / float(total),
+        'confident': sum(1 for p in correct if p.confidence >= threshold) / float(total),
+        'below_threshold': sum(1 for p in predictions if p.confidence < threshold) / float(total),
+        'p50_ms': percentile(durations, 0.5) * 1e3,
+        'p99_ms': percentile(durations, 0.99) * 1e3,
+    }
+
+
+def _predict(interpreter, examples):
+    predictions = []
+    for example in examples:
+        started = time.time()
+        response = interpreter.parse(example.text)
+        duration = time.time() - started
+        intent = response.get('intent') or {}
+        predictions.append(Prediction(example.get('intent'), intent.get('name'), intent.get('confidence', 0.0),
+                                      duration))
+    return predictions
+
+
+def train(config_path, data_path=DATA_PATH, path=nlu.MODEL_PATH, project=nlu.PROJECT):
+    """Обучает и сохраняет модель, печатает время обучения и разбора по компонентам"""
+    from rasa_nlu import config, training_data
+    from rasa_nlu.model import Trainer
+
+    data = training_data.load_data(data_path)
+    trainer = Trainer(config.load(config_path))
+    train_timer = ComponentTimer()
+    with train_timer.timing(trainer.pipeline, 'train'):
+        interpreter = trainer.train(data)
+    model_dir = trainer.persist(path, project_name=project)
+    log.info('Model saved to %s', model_dir)
+
+    process_timer = ComponentTimer()
+    with process_timer.timing(interpreter.pipeline, 'process'):
+        predictions = _predict(interpreter, data.training_examples)
+
+    print_components(train_timer, process_timer)
+    print_summary(config_path, summarize(predictions))
+    return model_dir
+
+
+def evaluate(config_path, data_path=DATA_PATH, folds=DEFAULT_FOLDS, seed=0):
+    from rasa_nlu import config, training_data
+    from rasa_nlu.model import Trainer
+
+    data = training_data.load_data(data_path)
+    predictions = []
+    train_timer = ComponentTimer()
+    process_timer = ComponentTimer()
+    for train_examples, test_examples in split_folds(data.training_examples, folds, seed):
+        trainer = Trainer(config.load(config_path))
+        fold_data = training_data.TrainingData(
+            training_examples=train_examples,
+            entity_synonyms=data.entity_synonyms,
+            regex_features=data.regex_features,
+        )
+        with train_timer.timing(trainer.pipeline, 'train'):
+            interpreter = trainer.train(fold_data)
+        with process_timer.timing(interpreter.pipeline, 'process'):
+            predictions.extend(_predict(interpreter, test_examples))
+
+    print_components(train_timer, process_timer)
+    summary = summarize(predictions)
+    print_summary(config_path, summary)
+    return summary
+
+
+def print_components(train_timer, process_timer):
+    process = {name: mean for name, _, _, mean in process_timer.report()}
+    print('%-40s %10s %12s' % ('component', 'train s', 'process ms'))
+    for name, _, total, _ in train_timer.report():
+        print('%-40s %10.2f %12.3f' % (name, total, process.get(name, 0.0) * 1e3))
+
+
+def print_summary(config_path, summary):
+    print('%s: %d examples, accuracy %.1f%%, confident %.1f%%, below threshold %.1f%%, '
+          'parse p50 %.2f ms, p99 %.2f ms' % (
+              config_path, summary['examples'], summary['accuracy'] * 100, summary['confident'] * 100,
+              summary['below_threshold'] * 100, summary['p50_ms'], summary['p99_ms']))
+
+
+def main():
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Обучение и сравнение профилей конвейера NLU')
+    parser.add_argument('--data', default=DATA_PATH)
+    commands = parser.add_subparsers(dest='command')
+
+    train_parser = commands.add_parser('train', help='обучить модель с отчетом о времени компонентов')
+    train_parser.add_argument('--config', default=CONFIGS[0])
+    train_parser.add_argument('--path', default=nlu.MODEL_PATH)
+    train_parser.add_argument('--project', default=nlu.PROJECT)
+
+    evaluate_parser = commands.add_parser('evaluate', help='сравнить точность и задержку профилей')
+    evaluate_parser.add_argument('--config', action='append', help='профиль; можно указать несколько раз')
+    evaluate_parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    evaluate_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train(args.config, args.data, args.path, args.project)
+        return
+
+    summaries = [(config_path, evaluate(config_path, args.data, args.folds, args.seed))
+                 for config_path in args.config or CONFIGS]
+    print()
+    for config_path, summary in sorted(summaries, key=lambda item: item[1]['p50_ms']):
+        print_summary(config_path, summary)
+
+
+if __name__ == '__main__':
+    main()
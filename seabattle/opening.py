@@ -0,0 +1,171 @@
+# coding: utf-8
+"""Дебютная книга: первые выстрелы партии, посчитанные заранее по множеству расстановок.
+
+Пока соперник отвечает "мимо", выбор выстрела не зависит от игры: это всегда клетка, где
+корабль вероятнее всего при условии, что все прошлые выстрелы книги промахнулись. Книга
+строится жадно по расстановкам, равномерно распределенным по всем допустимым (у них корабли
+чаще стоят у края поля), а проверяется по умолчанию на расстановках генератора навыка, и
+сохраняется в config/opening_book.json. Клетки книги берутся из того же узора с
+шагом 4, которым Game и так прочесывает поле: книга только упорядочивает его так, чтобы
+раньше стрелять туда, где корабли стоят чаще. Game.do_shot берет из нее обычные
+выстрелы, пока в книге есть клетки, по которым еще не стреляли; книга и узор отражаются
+случайной симметрией поля, своей в каждой партии.
+
+Построить книгу и сравнить число выстрелов до победы с книгой и без нее:
+    python -m seabattle.opening build --layouts 50000 --length 24 --source uniform
+    python -m seabattle.opening evaluate --games 20000 --source skill
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+
+
+log = logging.getLogger(__name__)
+
+BOOK_PATH = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'config', 'opening_book.json'))
+DEFAULT_LENGTH = 24
+DEFAULT_LAYOUTS = 50000
+# источники расстановок: генератор навыка и равномерное распределение по всем расстановкам
+SOURCES = ('skill', 'uniform')
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def build_book(layouts, cells_count, length=DEFAULT_LENGTH, candidates=None):
+    """Жадная книга: на каждом шаге клетка, занятая в наибольшем числе расстановок,
+    в которых все прошлые выстрелы книги -- промахи.
+
+    layouts -- наборы занятых клеток, candidates -- клетки, из которых выбирать (по умолчанию все).
+    """
+    candidates = list(range(cells_count)) if candidates is None else list(candidates)
+    remaining = list(layouts)
+    book = []
+    for _ in range(length):
+        counts = [0] * cells_count
+        for cells in remaining:
+            for index in cells:
+                counts[index] += 1
+        # при равенстве -- клетка с меньшим индексом, чтобы книга не зависела от порядка расстановок
+        best = max((index for index in candidates if index not in book), key=lambda index: (counts[index], -index))
+        book.append(best)
+        remaining = [cells for cells in remaining if best not in cells]
+        if not remaining:
+            break
+    return book
+
+
+def write_book(path, book, size, ships, layouts_count, source=None):
+    with open(path, 'w') as f:
+        json.dump({
+            'size': size,
+            'ships': list(ships),
+            'layouts': layouts_count,
+            'source': source,
+            'shots': book,
+        }, f, sort_keys=True)
+
+
+def read_book(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data['size'], tuple(data['ships']), tuple(data['shots'])
+
+
+def load(path=None):
+    """Книги из файла по (размер поля, флот); пустой словарь, если файла нет или книга отключена"""
+    if path is None:
+        path = os.environ.get('SEABATTLE_OPENING_BOOK', BOOK_PATH)
+    if not path:
+        return {}
+
+    try:
+        size, ships, shots = read_book(path)
+    except (IOError, OSError):
+        log.warning('No opening book in %s', path)
+        return {}
+    except (ValueError, KeyError, TypeError):
+        # битый файл не должен ломать выбор выстрела: играем без книги
+        log.warning('Broken opening book in %s', path, exc_info=True)
+        return {}
+    return {(size, ships): shots}
+
+
+def use_books(books):
+    """Заменяет загруженные книги; пустой словарь -- играть без книги"""
+    with _books_lock:
+        _books.clear()
+        _books.update(books or {None: ()})
+
+
+def get_book(size, ships):
+    """Выстрелы книги (индексы клеток) для поля size и флота ships или пустой кортеж"""
+    if not _books:
+        with _books_lock:
+            if not _books:
+                _books.update(load() or {None: ()})
+    return _books.get((size, tuple(ships)), ())
+
+
+def layout_source(name, size, ships):
+    """Функция без аргументов, возвращающая случайную расстановку флота из источника name"""
+    from seabattle import placement
+
+    if name == 'uniform':
+        return placement.LayoutWalk(size, ships)
+    return lambda: placement.generate_layout(size, ships)
+
+
+def main():
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Дебютная книга выстрелов')
+    subparsers = parser.add_subparsers(dest='command')
+    build = subparsers.add_parser('build', help='построить книгу по случайным расстановкам')
+    build.add_argument('--path', default=BOOK_PATH)
+    build.add_argument('--layouts', type=int, default=DEFAULT_LAYOUTS)
+    build.add_argument('--length', type=int, default=DEFAULT_LENGTH)
+    build.add_argument('--seed', type=int, default=0)
+    build.add_argument('--source', choices=SOURCES, default='uniform')
+    evaluate = subparsers.add_parser('evaluate', help='выстрелы до победы с книгой и без')
+    evaluate.add_argument('--path', default=BOOK_PATH)
+    evaluate.add_argument('--games', type=int, default=20000)
+    evaluate.add_argument('--seed', type=int, default=1)
+    evaluate.add_argument('--source', choices=SOURCES, default='skill')
+    args = parser.parse_args()
+
+    from seabattle import batch, game
+
+    if args.command == 'build':
+        player = game.Game()
+        player.start_new_game()
+        size, ships = player.size, player.ships
+        candidates = [player.calc_index(position) for position in player.predefined_shots(step=4)]
+        random.seed(args.seed)
+        generate = layout_source(args.source, size, ships)
+        layouts = [frozenset(index for cells in generate() for index in cells) for _ in range(args.layouts)]
+        book = build_book(layouts, size ** 2, args.length, candidates)
+        write_book(args.path, book, size, ships, len(layouts), args.source)
+        log.info('Written opening book of %s shots to %s: %s', len(book), args.path, book)
+        return
+
+    # при запуске через -m этот модуль -- __main__, а Game читает книгу из seabattle.opening
+    from seabattle import opening
+
+    for name, books in (('without book', {}), ('with book', load(args.path))):
+        opening.use_books(books)
+        random.seed(args.seed)
+        generate = layout_source(args.source, 10, game.BaseGame.default_ships)
+        summary = batch.shots_to_win(game.Game, games=args.games, generate=generate)
+        print('%-14s mean %.2f, p50 %.0f, p90 %.0f' % (name, summary['mean'], summary['p50'], summary['p90']))
+
+
+if __name__ == '__main__':
+    main()
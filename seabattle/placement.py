@@ -0,0 +1,124 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import random
+
+from seabattle import tables as board_tables
+
+
+# сколько раз всего можно выбрать расстановку корабля, прежде чем признать флот нерасставляемым
+DEFAULT_MAX_STEPS = 20000
+# после стольких выборов в одной попытке поиск начинается заново: откаты в глубине дерева
+# на тесных полях почти никогда не выбираются из тупика, а новая попытка находит расстановку быстро
+RESTART_STEPS = 200
+# сколько шагов LayoutWalk делает между расстановками и до первой из них
+DEFAULT_WALK_MOVES = 100
+WALK_BURN_IN = 20
+
+
+def generate_layout(size, ships, max_steps=DEFAULT_MAX_STEPS):
+    """Случайная расстановка флота на поле size x size без перебора наугад.
+
+    Для каждого корабля выбирается равновероятно одна из расстановок, допустимых при уже
+    поставленных кораблях. Списки допустимых расстановок сужаются по мере расстановки,
+    если очередной корабль поставить некуда, последний выбор откатывается, а затянувшаяся
+    попытка начинается заново. Возвращает список клеток каждого корабля в порядке ships;
+    если флот расставить нельзя или не удалось за max_steps выборов, бросает ValueError.
+    """
+    tables = board_tables.get(size)
+
+    for length in ships:
+        if not 1 <= length <= size:
+            raise ValueError('Ship of length %s doesn\'t fit %sx%s field' % (length, size, size))
+
+    # корабль длины l вместе с правой и нижней частью ореола занимает (l + 1) x 2 клетки
+    # на поле (size + 1) x (size + 1), так что флот с большей суммарной площадью не поместится
+    if sum((length + 1) * 2 for length in ships) > (size + 1) ** 2:
+        raise ValueError('Fleet %s can\'t be placed on %sx%s field' % (list(ships), size, size))
+
+    # длинные корабли ставим первыми: так тупиков и откатов почти не бывает
+    order = sorted(range(len(ships)), key=lambda i: ships[i], reverse=True)
+    layout = [None] * len(ships)
+    steps = [0, 0]
+
+    def place(depth, busy, candidates):
+        if depth == len(order):
+            return True
+
+        ship_id = order[depth]
+        length = ships[ship_id]
+        options = [option for option in candidates if not option[0] & busy]
+
+        while options and steps[1] < RESTART_STEPS:
+            steps[1] += 1
+            i = random.randrange(len(options))
+            cells_mask, zone_mask, cells = options[i]
+
+            # одинаковые корабли идут подряд, и следующему достаточно отфильтровать варианты текущего
+            if depth + 1 < len(order) and ships[order[depth + 1]] != length:
+                next_candidates = tables.placement_masks(ships[order[depth + 1]])
+            else:
+                next_candidates = options
+
+            if place(depth + 1, busy | zone_mask, next_candidates):
+                layout[ship_id] = cells
+                return True
+            options = options[:i] + options[i + 1:]
+
+        return False
+
+    if not ships:
+        return layout
+
+    while steps[0] < max_steps:
+        steps[1] = 0
+        if place(0, 0, tables.placement_masks(ships[order[0]])):
+            return layout
+        if steps[1] < RESTART_STEPS:
+            # перебор закончился раньше лимита попытки, значит вариантов нет вовсе
+            raise ValueError('Fleet %s can\'t be placed on %sx%s field' % (list(ships), size, size))
+        steps[0] += steps[1]
+
+    raise ValueError('Can\'t place fleet %s on %sx%s field in %s steps' % (list(ships), size, size, max_steps))
+
+
+class LayoutWalk(object):
+    """Расстановки флота, равномерно распределенные по всем допустимым расстановкам.
+
+    generate_layout ставит корабли по очереди, от длинных к коротким, и у него свое
+    распределение: длинный корабль стоит в любом месте поля одинаково часто. Здесь же флот
+    блуждает: на каждом шаге случайный корабль переносится в случайную расстановку своей
+    длины, если она не задевает остальные. Переход туда и обратно равновероятен, так что
+    после достаточного числа шагов все расстановки флота встречаются одинаково часто.
+    Нужен, чтобы проверять стратегии на расстановках не того генератора, которым они настроены.
+    """
+
+    def __init__(self, size, ships, moves=DEFAULT_WALK_MOVES):
+        self.tables = board_tables.get(size)
+        self.ships = list(ships)
+        self.moves = moves
+
+        options = {}
+        for length in set(self.ships):
+            options.update((option[2], option) for option in self.tables.placement_masks(length))
+        self._placed = [options[tuple(cells)] for cells in generate_layout(size, self.ships)]
+        for _ in range(moves * WALK_BURN_IN):
+            self._move()
+
+    def _move(self):
+        ship_id = int(random.random() * len(self._placed))
+        options = self.tables.placement_masks(self.ships[ship_id])
+        option = options[int(random.random() * len(options))]
+        busy = 0
+        for other_id, other in enumerate(self._placed):
+            if other_id != ship_id:
+                busy |= other[1]
+        if not option[0] & busy:
+            self._placed[ship_id] = option
+
+    def __call__(self):
+        """Следующая расстановка в том же виде, что у generate_layout"""
+        for _ in range(self.moves):
+            self._move()
+        return [option[2] for option in self._placed]
@@ -0,0 +1,234 @@
+# coding: utf-8
+"""Несколько процессов-обработчиков с одной загруженной моделью NLU.
+
+Главный процесс загружает модель NLU и прогревает ее, открывает слушающий сокет и только
+потом запускает обработчики через fork: страницы памяти с моделью остаются общими,
+пока их никто не меняет. Упавший обработчик перезапускается. По SIGTERM главный процесс
+передает сигнал обработчикам и ждет, пока они доработают принятые реплики.
+
+Запуск:
+    python -m seabattle.prefork --port 5000 --processes 4
+Если процессов больше одного, сессии по умолчанию хранятся в SQLite (SEABATTLE_SESSION_BACKEND),
+иначе игрок, попавший в другой процесс, потеряет партию. SEABATTLE_PREFORK_PRELOAD=0 отключает
+загрузку модели в главном процессе: каждый обработчик загрузит ее сам.
+По SIGUSR1 главный процесс пишет в лог отчет о памяти обработчиков.
+"""
+
+from __future__ import unicode_literals
+
+import argparse
+import errno
+import logging
+import os
+import select
+import signal
+import socket
+import time
+
+from seabattle import server, tracing
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PROCESSES = 2
+# не перезапускать обработчик чаще, чем раз в столько секунд
+RESTART_DELAY = 1
+
+
+def read_memory(pid):
+    """Память процесса по /proc/<pid>/smaps в килобайтах: rss, pss, shared и private"""
+    totals = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    fields = {
+        'Rss': 'rss',
+        'Pss': 'pss',
+        'Shared_Clean': 'shared',
+        'Shared_Dirty': 'shared',
+        'Private_Clean': 'private',
+        'Private_Dirty': 'private',
+    }
+    path = '/proc/%s/smaps_rollup' % pid
+    if not os.path.exists(path):
+        path = '/proc/%s/smaps' % pid
+
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                key = fields.get(parts[0].rstrip(':'))
+                if key is not None:
+                    totals[key] += int(parts[1])
+    return totals
+
+
+def memory_report(pids):
+    """Память каждого процесса и доля общих с другими процессами страниц"""
+    report = {}
+    for pid in pids:
+        try:
+            memory = read_memory(pid)
+        except (IOError, OSError):
+            continue
+        memory['shared_fraction'] = memory['shared'] / float(memory['rss']) if memory['rss'] else 0.0
+        report[pid] = memory
+    return report
+
+
+def log_memory_report(master_pid, pids):
+    report = memory_report([master_pid] + sorted(pids))
+    for pid, memory in sorted(report.items()):
+        log.info('%s %s: rss %s kB, pss %s kB, shared %s kB (%.0f%%), private %s kB',
+                 'master' if pid == master_pid else 'worker', pid, memory['rss'], memory['pss'],
+                 memory['shared'], memory['shared_fraction'] * 100, memory['private'])
+    return report
+
+
+def _flush_logs():
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+
+class Master(object):
+    def __init__(self, host='0.0.0.0', port=5000, processes=DEFAULT_PROCESSES, preload=True, **options):
+        self.processes = processes
+        self.preload = preload
+        self.options = server.get_options(**options)
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen(server.WebhookServer.request_queue_size)
+
+        self.workers = {}
+        self.ready = set()
+        self.stopping = False
+        self._ready_read, self._ready_write = os.pipe()
+
+    def _worker(self):
+        """Тело процесса-обработчика; из него не возвращаются"""
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+            signal.signal(signum, signal.SIG_DFL)
+        os.close(self._ready_read)
+        try:
+            webhook_server = server.WebhookServer(
+                self.listener.getsockname(), bind_and_activate=False, **self.options)
+            webhook_server.socket.close()
+            webhook_server.socket = self.listener
+
+            pid = os.getpid()
+            server.warm_up(webhook_server, callback=lambda: os.write(self._ready_write, ('%s\n' % pid).encode()))
+            server.run(webhook_server)
+        except Exception:
+            log.exception('Worker failed')
+            os._exit(1)
+        _flush_logs()
+        os._exit(0)
+
+    def spawn(self):
+        # очередь лога не должна остаться занятой фоновым потоком в момент fork
+        _flush_logs()
+        pid = os.fork()
+        if pid == 0:
+            self._worker()
+        self.workers[pid] = time.time()
+        log.info('Started worker %s', pid)
+        return pid
+
+    def stop(self, signum, frame):
+        log.info('Got signal %s, stopping workers', signum)
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def report(self, signum=None, frame=None):
+        return log_memory_report(os.getpid(), self.workers)
+
+    def _read_ready(self):
+        try:
+            readable, _, _ = select.select([self._ready_read], [], [], 0.5)
+        except (select.error, OSError) as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return
+        if not readable:
+            return
+
+        for line in os.read(self._ready_read, 4096).decode().split():
+            self.ready.add(int(line))
+            if self.ready >= set(self.workers):
+                log.info('All %s workers are ready', len(self.workers))
+                self.report()
+
+    def _reap(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                if e.errno == errno.ECHILD:
+                    self.workers.clear()
+                return
+            if not pid:
+                return
+
+            started = self.workers.pop(pid, None)
+            self.ready.discard(pid)
+            if self.stopping or started is None:
+                continue
+            log.warning('Worker %s exited with status %s, restarting', pid, status)
+            if time.time() - started < RESTART_DELAY:
+                time.sleep(RESTART_DELAY)
+            self.spawn()
+
+    def run(self):
+        if self.processes > 1:
+            os.environ.setdefault('SEABATTLE_SESSION_BACKEND', 'sqlite')
+
+        if self.preload:
+            from seabattle import dialog_manager
+
+            started = time.time()
+            dialog_manager.warm_up()
+            log.info('NLU loaded and warmed up in %.1f s', time.time() - started)
+
+        for _ in range(self.processes):
+            self.spawn()
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.report)
+
+        while self.workers:
+            self._read_ready()
+            self._reap()
+
+        self.listener.close()
+        log.info('All workers stopped')
+
+
+def main():
+    handler = tracing.setup_logging(level=os.environ.get('SEABATTLE_LOG_LEVEL', 'INFO').upper())
+
+    parser = argparse.ArgumentParser(description='Сервер навыка из нескольких процессов')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--processes', type=int, default=int(os.environ.get('SEABATTLE_PROCESSES', DEFAULT_PROCESSES)))
+    parser.add_argument('--workers', type=int, default=None, help='потоков обработки в каждом процессе')
+    parser.add_argument('--queue-size', type=int, default=None)
+    parser.add_argument('--deadline', type=float, default=None)
+    args = parser.parse_args()
+
+    master = Master(
+        args.host, args.port, processes=args.processes,
+        preload=os.environ.get('SEABATTLE_PREFORK_PRELOAD', '1') != '0',
+        workers=args.workers, queue_size=args.queue_size, deadline=args.deadline,
+    )
+    master.run()
+    handler.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# coding: utf-8
+"""Протокол навыка Алисы, общий для всех серверов: разбор запроса, ответ, метрики."""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+from json.encoder import encode_basestring_ascii
+
+from seabattle import dialog_manager as dm
+from seabattle import layouts, session, tracing
+
+
+log = logging.getLogger(__name__)
+
+# ответ, когда навык не успевает или перегружен: игрок повторит реплику, и ход не потеряется
+RETRY_TEXT = 'Секунду, не расслышала. Повтори, пожалуйста'
+
+
+# сколько закодированных ответов помнить; при переполнении память очищается целиком
+RESPONSE_CACHE_SIZE = 4096
+# (text, tts, end_session) -> JSON поля response; тексты ответов повторяются, их незачем кодировать заново
+_response_fragments = {}
+# в запросе Алисы нет циклических ссылок, проверять их незачем
+_encode = json.JSONEncoder(check_circular=False).encode
+
+
+def _envelope(json_body):
+    return {
+        'version': json_body['version'],
+        'session': json_body['session'],
+    }
+
+
+def _response(dmresponse):
+    response = {
+        'text': dmresponse.text,
+        'end_session': dmresponse.end_session,
+    }
+    if dmresponse.tts is not None:
+        response['tts'] = dmresponse.tts
+    return response
+
+
+def _dialog(json_body):
+    """Ответ DialogManager на разобранный запрос, сессия сохраняется"""
+    log.debug('Request: %r', json_body)
+    user_id = json_body['session']['user_id']
+    with tracing.span('session_get'):
+        session_obj = session.get(user_id)
+    dm_obj = dm.DialogManager(session_obj, user_id)
+
+    message = json_body['request']['command'].strip()
+    if not message:
+        message = json_body['request']['original_utterance']
+
+    dmresponse = dm_obj.handle_message(message)
+    with tracing.span('session_put'):
+        session.put(user_id, session_obj)
+    return dmresponse
+
+
+def handle_request(json_body):
+    """Ответ навыка на разобранный запрос Алисы"""
+    response = _envelope(json_body)
+    response['response'] = _response(_dialog(json_body))
+    return response
+
+
+def encode_response(json_body, dmresponse):
+    """JSON ответа Алисе: поле response берется готовым из кэша, заново кодируются только session и version"""
+    fragment_key = (dmresponse.text, dmresponse.tts, dmresponse.end_session)
+    fragment = _response_fragments.get(fragment_key)
+    if fragment is None:
+        fragment = json.dumps(_response(dmresponse))
+        if len(_response_fragments) >= RESPONSE_CACHE_SIZE:
+            _response_fragments.clear()
+        _response_fragments[fragment_key] = fragment
+
+    version = json_body['version']
+    version = encode_basestring_ascii(version) if isinstance(version, type('')) else _encode(version)
+    return '{"response": %s, "session": %s, "version": %s}' % (fragment, _encode(json_body['session']), version)
+
+
+def handle_webhook(data):
+    """Полный цикл запроса: JSON в теле запроса -- JSON ответа, с трассой всех этапов"""
+    tracing.start_trace('webhook')
+    try:
+        with tracing.span('parse'):
+            json_body = json.loads(data)
+        dmresponse = _dialog(json_body)
+        with tracing.span('serialize'):
+            body = encode_response(json_body, dmresponse)
+        log.debug('Response: %s', body)
+        return body
+    finally:
+        tracing.finish_trace()
+
+
+def retry_response(data):
+    """Ответ с просьбой повторить; session и version берутся из запроса, если он разбирается"""
+    try:
+        response = _envelope(json.loads(data))
+    except (ValueError, KeyError, TypeError):
+        response = {}
+    response['response'] = {
+        'text': RETRY_TEXT,
+        'end_session': False,
+    }
+    return json.dumps(response)
+
+
+def replace_envelope(body, json_body):
+    """Готовый JSON ответа с session и version другого запроса: ответ на повтор реплики"""
+    response = json.loads(body)
+    response.update(_envelope(json_body))
+    return json.dumps(response)
+
+
+def metrics(**extra):
+    """Внутренняя статистика: перцентили этапов запроса в миллисекундах и счетчики кэшей"""
+    result = {
+        'spans': tracing.metrics(),
+        'parser': dict(dm.parse_stats),
+        'nlu_cache': dm.nlu_cache.info(),
+        'nlu_batch': dm.batch_parser.info() if dm.batch_parser is not None else None,
+        'sessions': dict(session.get_store().stats),
+        'layouts': dict(layouts.get_pool().stats),
+    }
+    result.update(extra)
+    return json.dumps(result, sort_keys=True)
@@ -0,0 +1,376 @@
+# coding: utf-8
+"""Многопоточный сервер навыка с ограниченным пулом обработчиков.
+
+Соединения принимаются отдельными потоками, а реплики обрабатывает пул из фиксированного
+числа потоков с ограниченной очередью. Если очередь полна или ответ не готов к сроку,
+игрок сразу получает просьбу повторить реплику, а не ошибку по таймауту. Реплики одного
+игрока обрабатываются по очереди. Реплика, которая не успела к сроку, но уже начала
+выполняться, доделывается, и ее ответ получает повтор игрока: ход не делается дважды.
+
+Запуск:
+    python -m seabattle.server --port 5000 --workers 4
+Параметры по умолчанию берутся из переменных окружения SEABATTLE_WORKERS,
+SEABATTLE_QUEUE_SIZE и SEABATTLE_DEADLINE (в секундах).
+"""
+
+from __future__ import unicode_literals
+
+import argparse
+import collections
+import json
+import logging
+import os
+import signal
+import threading
+import zlib
+
+try:
+    import queue
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    import Queue as queue
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from seabattle import protocol, tracing
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_DEADLINE = 2.5
+# сколько ждать обработки уже принятых реплик при остановке
+SHUTDOWN_TIMEOUT = 10
+USER_LOCKS = 256
+# скольких игроков помнить с опоздавшей репликой; самые давние вытесняются
+LATE_REPLIES = 1024
+
+
+class Overloaded(Exception):
+    pass
+
+
+class Task(object):
+    """Задача пула; пока она не начала выполняться, ее можно отменить.
+
+    Если задан lock, задача выполняется под ним и считается начатой только после того, как его
+    получит: реплика, ждущая предыдущую реплику того же игрока, еще отменяется.
+    """
+
+    def __init__(self, func, args, lock=None):
+        self.func = func
+        self.args = args
+        self.lock = lock
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.started = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def run(self):
+        if self.lock is not None:
+            self.lock.acquire()
+        try:
+            with self._lock:
+                if self.cancelled:
+                    return
+                self.started = True
+            try:
+                self.result = self.func(*self.args)
+            except Exception as e:
+                log.exception('Task failed')
+                self.error = e
+            finally:
+                self._done.set()
+        finally:
+            if self.lock is not None:
+                self.lock.release()
+
+    def cancel(self):
+        """Отменяет задачу, если она еще не начала выполняться"""
+        with self._lock:
+            if not self.started:
+                self.cancelled = True
+            return self.cancelled
+
+    def wait(self, timeout):
+        return self._done.wait(timeout)
+
+
+class LateReplies(object):
+    """Опоздавшие реплики по (user_id, session_id): задача, ее message_id и команда.
+
+    Повтором считается реплика с тем же message_id (Алиса повторила запрос) или со следующим
+    и той же командой (игрок повторил после просьбы).
+    """
+
+    def __init__(self, capacity=LATE_REPLIES):
+        self.capacity = capacity
+        self._replies = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, message_id, command, task):
+        with self._lock:
+            self._replies.pop(key, None)
+            self._replies[key] = message_id, command, task
+            while len(self._replies) > self.capacity:
+                self._replies.popitem(last=False)
+
+    def pop(self, key, message_id, command):
+        """Задача опоздавшей реплики, которую повторяет эта, или None; запись в любом случае забывается"""
+        with self._lock:
+            reply = self._replies.pop(key, None)
+        if reply is None:
+            return None
+        late_message_id, late_command, task = reply
+        if message_id == late_message_id or (message_id == late_message_id + 1 and command == late_command):
+            return task
+        return None
+
+    def __len__(self):
+        return len(self._replies)
+
+
+def _parse(data):
+    try:
+        json_body = json.loads(data)
+    except ValueError:
+        return None
+    return json_body if isinstance(json_body, dict) else None
+
+
+def _reply_id(json_body):
+    """(ключ игрока и сессии, message_id, команда) или None, если повтор реплики не распознать"""
+    try:
+        session = json_body['session']
+        key = '%s' % session['user_id'], '%s' % session['session_id']
+        return key, int(session['message_id']), json_body['request']['command']
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class WorkerPool(object):
+    """Фиксированное число потоков и ограниченная очередь задач"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE):
+        self._tasks = queue.Queue(queue_size)
+        self._closed = False
+        self._threads = []
+        for number in range(workers):
+            thread = threading.Thread(target=self._run, name='worker-%s' % number)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит задачу в очередь; если очередь полна, бросает Overloaded.
+
+        Необязательный lock -- блокировка, под которой задача выполняется (см. Task).
+        """
+        task = Task(func, args, kwargs.get('lock'))
+        try:
+            self._tasks.put_nowait(task)
+        except queue.Full:
+            raise Overloaded()
+        return task
+
+    def _run(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            task.run()
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        """Дожидается задач, уже стоящих в очереди, и останавливает потоки"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+class WebhookServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # при всплеске соединений короткая очередь listen отбрасывает SYN, и клиент ждет повтора секунду
+    request_queue_size = 128
+
+    def __init__(self, address, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, deadline=DEFAULT_DEADLINE,
+                 bind_and_activate=True):
+        HTTPServer.__init__(self, address, WebhookHandler, bind_and_activate)
+        self.deadline = deadline
+        # готов ли сервер принимать игроков: выставляется после прогрева
+        self.ready = False
+        self.pool = WorkerPool(workers, queue_size)
+        self.stats = collections.Counter()
+        self.closing = False
+        self.late_replies = LateReplies()
+        self._user_locks = [threading.Lock() for _ in range(USER_LOCKS)]
+
+    def _user_lock(self, json_body):
+        try:
+            user_id = '%s' % json_body['session']['user_id']
+        except (KeyError, TypeError):
+            user_id = ''
+        return self._user_locks[(zlib.crc32(user_id.encode('utf-8')) & 0xffffffff) % USER_LOCKS]
+
+    def _process(self, data):
+        return protocol.handle_webhook(data)
+
+    def dispatch(self, data):
+        """Ответ на запрос Алисы; при перегрузке, ошибке или по истечении срока -- просьба повторить"""
+        self.stats['requests'] += 1
+        if self.closing:
+            self.stats['rejected'] += 1
+            return protocol.retry_response(data)
+
+        json_body = _parse(data)
+        reply_id = _reply_id(json_body)
+        # повтор опоздавшей реплики ждет ее ответа, а не делает ход заново
+        task = self.late_replies.pop(*reply_id) if reply_id is not None else None
+        repeated = task is not None
+        if repeated:
+            self.stats['repeated'] += 1
+        else:
+            try:
+                task = self.pool.submit(self._process, data, lock=self._user_lock(json_body))
+            except Overloaded:
+                self.stats['overloaded'] += 1
+                return protocol.retry_response(data)
+
+        if not task.wait(self.deadline):
+            # не начатую реплику отменяем, чтобы повтор игрока не сделал ход дважды
+            if task.cancel():
+                self.stats['expired'] += 1
+            else:
+                self.stats['late'] += 1
+                if reply_id is not None:
+                    self.late_replies.put(reply_id[0], reply_id[1], reply_id[2], task)
+            return protocol.retry_response(data)
+
+        if task.error is not None:
+            self.stats['errors'] += 1
+            return protocol.retry_response(data)
+        if repeated:
+            return protocol.replace_envelope(task.result, json_body)
+        return task.result
+
+    def shutdown_gracefully(self):
+        """Перестает принимать соединения и дожидается уже принятых реплик"""
+        self.closing = True
+        self.shutdown()
+        self.pool.close()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # заголовки и тело уходят одним пакетом, иначе на keep-alive соединении ответ ждет отложенного ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _send(self, code, body):
+        body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length).decode('utf-8')
+        if self.path != '/':
+            self._send(404, '{}')
+            return
+        self._send(200, self.server.dispatch(data))
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._send(200, protocol.metrics(server=dict(self.server.stats)))
+        elif self.path == '/ready':
+            self._send(200 if self.server.ready else 503, json.dumps({'ready': self.server.ready}))
+        else:
+            self._send(404, '{}')
+
+    def log_message(self, format, *args):
+        log.debug('%s - %s', self.address_string(), format % args)
+
+
+def warm_up(server, callback=None):
+    """Прогревает навык в фоне и после этого объявляет сервер готовым"""
+    def run():
+        from seabattle import dialog_manager
+
+        if dialog_manager.warm_up_enabled():
+            dialog_manager.warm_up()
+        server.ready = True
+        log.info('Ready')
+        if callback is not None:
+            callback()
+
+    thread = threading.Thread(target=run, name='warm-up')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def run(server):
+    """Обслуживает запросы до SIGTERM или SIGINT, затем дорабатывает принятые реплики"""
+    def stop(signum, frame):
+        log.info('Got signal %s, shutting down', signum)
+        # shutdown ждет выхода из serve_forever, поэтому вызывается не из главного потока
+        thread = threading.Thread(target=server.shutdown_gracefully, name='shutdown')
+        thread.start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    server.serve_forever()
+    server.pool.close()
+    server.server_close()
+    log.info('Stopped, stats: %s', dict(server.stats))
+
+
+def get_options(workers=None, queue_size=None, deadline=None):
+    """Параметры пула, недостающие берутся из переменных окружения"""
+    return {
+        'workers': workers or int(os.environ.get('SEABATTLE_WORKERS', DEFAULT_WORKERS)),
+        'queue_size': queue_size or int(os.environ.get('SEABATTLE_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)),
+        'deadline': deadline or float(os.environ.get('SEABATTLE_DEADLINE', DEFAULT_DEADLINE)),
+    }
+
+
+def serve(host='0.0.0.0', port=5000, workers=None, queue_size=None, deadline=None):
+    options = get_options(workers, queue_size, deadline)
+    server = WebhookServer((host, port), **options)
+    warm_up(server)
+
+    log.info('Serving on %s:%s, %s workers, queue %s, deadline %ss',
+             host, port, options['workers'], options['queue_size'], options['deadline'])
+    run(server)
+
+
+def main():
+    handler = tracing.setup_logging(level=os.environ.get('SEABATTLE_LOG_LEVEL', 'INFO').upper())
+
+    parser = argparse.ArgumentParser(description='Сервер навыка')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--queue-size', type=int, default=None)
+    parser.add_argument('--deadline', type=float, default=None)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers, args.queue_size, args.deadline)
+    handler.flush()
+
+
+if __name__ == '__main__':
+    main()
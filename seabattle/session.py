@@ -2,17 +2,247 @@
 
 from __future__ import unicode_literals
 
+import collections
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
 
-_sessions = {}
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 10000
+DEFAULT_TTL = 60 * 60
+
+
+def _new_session():
+    return {
+        'game': None,
+        'last': None,
+        'opponent': None,
+    }
+
+
+class MemoryStore(object):
+    """Хранилище сессий в памяти процесса: LRU с ограничением по размеру и времени жизни"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, ttl=DEFAULT_TTL, clock=time.time):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = collections.Counter()
+
+        # user_id -> (время истечения, сессия); порядок ключей -- от давно использованных к недавним
+        self._sessions = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._sessions.pop(user_id, None)
+            if item is None:
+                self.stats['misses'] += 1
+                return None
+
+            expires_at, session_obj = item
+            if expires_at <= self.clock():
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['hits'] += 1
+            self._sessions[user_id] = (self.clock() + self.ttl, session_obj)
+            return session_obj
+
+    def put(self, user_id, session_obj):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+            self._sessions[user_id] = (self.clock() + self.ttl, session_obj)
+
+            while len(self._sessions) > self.capacity:
+                self._sessions.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def touch(self, user_id):
+        with self._lock:
+            item = self._sessions.pop(user_id, None)
+            if item is not None:
+                self._sessions[user_id] = (self.clock() + self.ttl, item[1])
+            return item is not None
+
+    def expire(self, user_id=None):
+        """Удаляет сессию пользователя, а без user_id -- все просроченные сессии"""
+        with self._lock:
+            if user_id is not None:
+                return int(self._sessions.pop(user_id, None) is not None)
+
+            now = self.clock()
+            expired = [key for key, (expires_at, _) in self._sessions.items() if expires_at <= now]
+            for key in expired:
+                del self._sessions[key]
+            self.stats['expirations'] += len(expired)
+            return len(expired)
+
+
+class SQLiteStore(object):
+    """Хранилище сессий в SQLite-файле, общее для всех процессов на хосте"""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, ttl=DEFAULT_TTL, clock=time.time):
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = collections.Counter()
+
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'user_id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data BLOB NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)')
+
+    def _connection(self):
+        # sqlite3-соединение нельзя использовать из разных потоков
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _key(user_id):
+        return '%s' % user_id
+
+    @staticmethod
+    def dumps(session_obj):
+        # игра хранится в компактном формате Game.to_bytes, остальная сессия -- через pickle
+        state = dict(session_obj)
+        game_obj = state.get('game')
+        if game_obj is not None:
+            state['game'] = (type(game_obj), game_obj.to_bytes())
+        return sqlite3.Binary(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def loads(data):
+        state = pickle.loads(bytes(data))
+        if state.get('game') is not None:
+            game_cls, game_state = state['game']
+            state['game'] = game_cls.from_bytes(game_state)
+        return state
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def get(self, user_id):
+        now = self.clock()
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT expires_at, data FROM sessions WHERE user_id = ?', (self._key(user_id),)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            expires_at, data = row
+            if expires_at <= now:
+                connection.execute('DELETE FROM sessions WHERE user_id = ?', (self._key(user_id),))
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            connection.execute(
+                'UPDATE sessions SET expires_at = ? WHERE user_id = ?', (now + self.ttl, self._key(user_id)))
+
+        self.stats['hits'] += 1
+        return self.loads(data)
+
+    def put(self, user_id, session_obj):
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO sessions (user_id, expires_at, data) VALUES (?, ?, ?)',
+                (self._key(user_id), self.clock() + self.ttl, self.dumps(session_obj)))
+
+            # время истечения продлевается при каждом обращении, поэтому самые старые сессии -- самые давние
+            evicted = connection.execute(
+                'DELETE FROM sessions WHERE user_id IN ('
+                'SELECT user_id FROM sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                (self.capacity,)).rowcount
+        self.stats['evictions'] += max(evicted, 0)
+
+    def touch(self, user_id):
+        with self._connection() as connection:
+            return connection.execute(
+                'UPDATE sessions SET expires_at = ? WHERE user_id = ? AND expires_at > ?',
+                (self.clock() + self.ttl, self._key(user_id), self.clock())).rowcount > 0
+
+    def expire(self, user_id=None):
+        """Удаляет сессию пользователя, а без user_id -- все просроченные сессии"""
+        with self._connection() as connection:
+            if user_id is not None:
+                return connection.execute(
+                    'DELETE FROM sessions WHERE user_id = ?', (self._key(user_id),)).rowcount
+
+            expired = connection.execute('DELETE FROM sessions WHERE expires_at <= ?', (self.clock(),)).rowcount
+        self.stats['expirations'] += expired
+        return expired
+
+
+def create_store(backend=None, capacity=None, ttl=None, path=None):
+    """Создает хранилище по параметрам, недостающие берутся из переменных окружения"""
+    backend = backend or os.environ.get('SEABATTLE_SESSION_BACKEND', 'memory')
+    capacity = capacity or int(os.environ.get('SEABATTLE_SESSION_CAPACITY', DEFAULT_CAPACITY))
+    ttl = ttl or float(os.environ.get('SEABATTLE_SESSION_TTL', DEFAULT_TTL))
+
+    log.info('Session backend: %s, capacity %s, ttl %ss', backend, capacity, ttl)
+    if backend == 'memory':
+        return MemoryStore(capacity=capacity, ttl=ttl)
+    elif backend == 'sqlite':
+        path = path or os.environ.get('SEABATTLE_SESSION_PATH', 'sessions.db')
+        return SQLiteStore(path, capacity=capacity, ttl=ttl)
+
+    raise ValueError('Unknown session backend: %s' % backend)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+def configure(**kwargs):
+    global _store
+    _store = create_store(**kwargs)
+    return _store
 
 
 def get(user_id):
-    session_obj = _sessions.get(user_id)
+    store = get_store()
+    session_obj = store.get(user_id)
     if not session_obj:
-        session_obj = {
-            'game': None,
-            'last': None,
-            'opponent': None,
-        }
-        _sessions[user_id] = session_obj
+        session_obj = _new_session()
+        store.put(user_id, session_obj)
     return session_obj
+
+
+def put(user_id, session_obj):
+    """Сохраняет сессию после обработки реплики; для общего хранилища это обязательно"""
+    get_store().put(user_id, session_obj)
+
+
+def touch(user_id):
+    return get_store().touch(user_id)
+
+
+def expire(user_id=None):
+    return get_store().expire(user_id)
@@ -1,82 +1,252 @@
 # coding: utf-8
-import sys
-import importlib
-import logging
-
-
-logging.basicConfig(format='%(message)s', level=logging.INFO)
+"""Игра двух стратегий друг с другом.
 
+Одна партия с выводом всех ходов:
+    python -m seabattle.simulate seabattle.game seabattle.density
+Пачка партий со статистикой выстрелов и долей побед:
+    python -m seabattle.simulate seabattle.game seabattle.density --games 10000
+Турнир нескольких стратегий каждая с каждой на всех ядрах:
+    python -m seabattle.simulate seabattle.game seabattle.density seabattle.bitboard --tournament --games 1000
+"""
 
-player_1 = importlib.import_module(sys.argv[1])
-player_2 = importlib.import_module(sys.argv[2])
+from __future__ import print_function, unicode_literals
 
-game_1 = player_1.Game()
-game_2 = player_2.Game()
-
-game_1.start_new_game()
-game_2.start_new_game()
+import argparse
+import importlib
+import itertools
+import logging
+import math
+import multiprocessing
+import random
 
-print 'Player 1 field:'
-game_1.print_field()
-print 'Player 2 field:'
-game_2.print_field()
+# сколько партий одной пары отдается процессу за раз: мелкие задачи ровнее делятся между ядрами
+TOURNAMENT_CHUNK_SIZE = 50
+ELO_BASE = 1500
 
 
-def get_name(game):
-    if game is game_1:
-        return 'Player 1'
-    else:
-        return 'Player 2'
+def load_strategy(name):
+    """Класс Game из модуля name в варианте для симуляций (см. BaseGame.for_simulation)"""
+    return importlib.import_module(name).Game.for_simulation()
 
 
 def prepare_text_coords(coords):
     return coords.replace(',', '')
 
 
-active = game_1
-passive = game_2
-
-
-# MAIN LOOP
-while True:
-    coords = active.convert_to_position(prepare_text_coords(active.do_shot()))
-    print '{}: MOVE {}-{}'.format(get_name(active), coords[0], coords[1])
-    result = passive.handle_enemy_shot(coords)
-    print '{}: {}'.format(get_name(passive), result.upper())
-    active.handle_enemy_reply(result)
-
-    if result == 'miss':
-        active, passive = passive, active
-
-    should_exit = False
-
-    if game_1.is_victory():
-        print 'Player 1: VICTORY'
-        should_exit = True
-    elif game_1.is_defeat():
-        print 'Player 1: DEFEAT'
-        should_exit = True
-
-    if game_2.is_victory():
-        print 'Player 2: VICTORY'
-        should_exit = True
-    elif game_2.is_defeat():
-        print 'Player 2: DEFEAT'
-        should_exit = True
-
-    if should_exit:
-        break
+def play(game_1, game_2, verbose=True):
+    """Партия двух подготовленных игр, game_1 ходит первой; возвращает номер победителя"""
+    names = {id(game_1): 'Player 1', id(game_2): 'Player 2'}
+
+    def report(text, *args):
+        if verbose:
+            print(text.format(*args))
+
+    active = game_1
+    passive = game_2
+
+    while True:
+        coords = active.convert_to_position(prepare_text_coords(active.do_shot()))
+        report('{}: MOVE {}-{}', names[id(active)], coords[0], coords[1])
+        result = passive.handle_enemy_shot(coords)
+        report('{}: {}', names[id(passive)], result.upper())
+        active.handle_enemy_reply(result)
+
+        if result == 'miss':
+            active, passive = passive, active
 
+        if game_1.is_victory() or game_2.is_defeat():
+            report('Player 1: VICTORY')
+            report('Player 2: DEFEAT')
+            return 1
+        if game_2.is_victory() or game_1.is_defeat():
+            report('Player 1: DEFEAT')
+            report('Player 2: VICTORY')
+            return 2
+
+
+def print_game(game_cls_1, game_cls_2):
+    game_1 = game_cls_1()
+    game_2 = game_cls_2()
+
+    # ходы передаются текстом, а convert_to_position понимает только числовые координаты
+    game_1.start_new_game(numbers=True)
+    game_2.start_new_game(numbers=True)
+
+    print('Player 1 field:')
+    game_1.print_field()
+    print('Player 2 field:')
+    game_2.print_field()
+
+    play(game_1, game_2)
+
+    print('=' * 50)
+    print('Player 1 field:')
+    print('His POV:')
+    game_1.print_field()
+    print('Opponents POV:')
+    game_2.print_enemy_field()
+
+    print('Player 2 field:')
+    print('His POV:')
+    game_2.print_field()
+    print('Opponents POV:')
+    game_1.print_enemy_field()
+
+
+def _init_worker():
+    # на симуляции предупреждения о задержке выстрела только шумят: процессы делят ядра
+    logging.disable(logging.WARNING)
+
+
+def _play_chunk(task):
+    """Партии number из range(start, stop) пары стратегий; возвращает число побед каждой.
+
+    Перед каждой партией генератор случайных чисел получает зерно из seed, пары и номера партии,
+    так что результат не зависит ни от числа процессов, ни от того, какому процессу досталась задача.
+    """
+    name_1, name_2, seed, start, stop = task
+    game_cls_1 = load_strategy(name_1)
+    game_cls_2 = load_strategy(name_2)
+
+    wins = [0, 0]
+    for number in range(start, stop):
+        random.seed('%s:%s:%s:%s' % (seed, name_1, name_2, number))
+        game_1 = game_cls_1()
+        game_2 = game_cls_2()
+        game_1.start_new_game(numbers=True)
+        game_2.start_new_game(numbers=True)
+
+        # первый ход достается игрокам по очереди
+        if number % 2:
+            wins[2 - play(game_2, game_1, verbose=False)] += 1
+        else:
+            wins[play(game_1, game_2, verbose=False) - 1] += 1
+    return name_1, name_2, wins
+
+
+def elo_ratings(names, wins):
+    """Рейтинги в шкале Эло по матрице побед wins[i][j] (победы i над j).
+
+    Модель Брэдли -- Терри подбирается итерациями MM-алгоритма, поэтому рейтинги не зависят
+    от порядка партий. К каждой паре добавлена одна ничья, чтобы у непобедимой стратегии
+    рейтинг оставался конечным.
+    """
+    count = len(names)
+    won = [[wins[i][j] + (0.5 if i != j else 0) for j in range(count)] for i in range(count)]
+    strength = [1.0] * count
+
+    for _ in range(1000):
+        updated = []
+        for i in range(count):
+            games = sum((won[i][j] + won[j][i]) / (strength[i] + strength[j]) for j in range(count) if j != i)
+            updated.append(sum(won[i]) / games if games else 1.0)
+
+        scale = math.exp(sum(math.log(s) for s in updated) / count)
+        updated = [s / scale for s in updated]
+        converged = max(abs(a - b) for a, b in zip(updated, strength)) < 1e-9
+        strength = updated
+        if converged:
+            break
+
+    return dict((name, ELO_BASE + 400 * math.log10(s)) for name, s in zip(names, strength))
+
+
+def tournament(names, games=100, seed=0, processes=None, chunk_size=TOURNAMENT_CHUNK_SIZE):
+    """Турнир каждая стратегия с каждой по games партий на пару в пуле процессов.
+
+    Возвращает матрицу побед wins[i][j] и рейтинги Эло по именам стратегий.
+    """
+    index = dict((name, i) for i, name in enumerate(names))
+    tasks = [
+        (name_1, name_2, seed, start, min(start + chunk_size, games))
+        for name_1, name_2 in itertools.combinations(names, 2)
+        for start in range(0, games, chunk_size)
+    ]
+
+    wins = [[0] * len(names) for _ in names]
+    pool = multiprocessing.Pool(processes, initializer=_init_worker)
+    try:
+        for name_1, name_2, (wins_1, wins_2) in pool.imap_unordered(_play_chunk, tasks):
+            wins[index[name_1]][index[name_2]] += wins_1
+            wins[index[name_2]][index[name_1]] += wins_2
+    finally:
+        pool.close()
+        pool.join()
+
+    return wins, elo_ratings(names, wins)
+
+
+def print_tournament(names, games, seed, processes):
+    wins, ratings = tournament(names, games=games, seed=seed, processes=processes)
+
+    width = max(len(name) for name in names)
+    print(' ' * width + ''.join(' %*d' % (max(width, 6), i + 1) for i in range(len(names))) + '    elo')
+    for i, name in enumerate(names):
+        cells = []
+        for j in range(len(names)):
+            total = wins[i][j] + wins[j][i]
+            # пара, не сыгравшая ни одной партии, как и диагональ, остается без процента
+            share = '-' if i == j or not total else '{:.1%}'.format(wins[i][j] / float(total))
+            cells.append(' %*s' % (max(width, 6), share))
+        print('%-*s%s %6.0f' % (width, name, ''.join(cells), ratings[name]))
+
+
+def _format_shots(summary):
+    if not summary['games']:
+        return 'no games'
+    return 'mean {mean:.2f} std {std:.2f} p10 {p10:.0f} p50 {p50:.0f} p90 {p90:.0f} p99 {p99:.0f}'.format(**summary)
+
+
+def print_batch(name_1, name_2, games, batch_size):
+    # numpy нужен только для пакетной симуляции
+    from seabattle import batch
+
+    game_cls_1 = load_strategy(name_1)
+    game_cls_2 = load_strategy(name_2)
+
+    for name, game_cls in ((name_1, game_cls_1), (name_2, game_cls_2)):
+        summary = batch.shots_to_win(game_cls, games=games, batch_size=batch_size)
+        print('{} shots to win: {} (unfinished {})'.format(name, _format_shots(summary), summary['unfinished']))
+
+    result = batch.match(game_cls_1, game_cls_2, games=games, batch_size=batch_size)
+    print('{} wins {} of {} games: {:.1%} +- {:.1%} (unfinished {})'.format(
+        name_1, result['wins_1'], games, result['win_rate_1'] or 0, result['win_rate_1_error'] or 0,
+        result['unfinished']))
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('expected a positive number, got %s' % value)
+    return number
+
+
+def main():
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Игра стратегий друг с другом')
+    parser.add_argument('players', nargs='+', help='модули со стратегиями игроков, например seabattle.game')
+    parser.add_argument('--games', type=_positive_int, default=None,
+                        help='сыграть пачку партий и вывести статистику; в турнире -- партий на пару')
+    parser.add_argument('--batch-size', type=int, default=1000, help='сколько партий идет одновременно')
+    parser.add_argument('--tournament', action='store_true', help='турнир каждая стратегия с каждой')
+    parser.add_argument('--processes', type=int, default=None, help='число процессов турнира, по умолчанию по числу ядер')
+    parser.add_argument('--seed', type=int, default=0, help='зерно случайных чисел турнира')
+    args = parser.parse_args()
+
+    if args.tournament:
+        if len(args.players) < 2:
+            parser.error('tournament needs at least two players')
+        print_tournament(args.players, args.games or 100, args.seed, args.processes)
+        return
+
+    if len(args.players) != 2:
+        parser.error('exactly two players expected')
+    if args.games:
+        print_batch(args.players[0], args.players[1], args.games, args.batch_size)
+    else:
+        print_game(load_strategy(args.players[0]), load_strategy(args.players[1]))
 
-print '=' * 50
-print 'Player 1 field:'
-print 'His POV:'
-game_1.print_field()
-print 'Opponents POV:'
-game_2.print_enemy_field()
 
-print 'Player 2 field:'
-print 'His POV:'
-game_2.print_field()
-print 'Opponents POV:'
-game_1.print_enemy_field()
+if __name__ == '__main__':
+    main()
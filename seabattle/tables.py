@@ -0,0 +1,113 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+import threading
+
+
+class BoardTables(object):
+    """Заранее посчитанные таблицы индексов для поля size x size.
+
+    Все таблицы работают с индексами клеток в терминах BaseGame.calc_index:
+    - neighbours_4[i], neighbours_8[i] -- соседи клетки по сторонам и с диагоналями;
+    - rays[i][direction] -- клетки от i до края поля по направлениям game.UP/DOWN/LEFT/RIGHT, не включая i;
+    - rows[y], columns[x] -- индексы строки и столбца (с нуля);
+    - placements(length) -- все расстановки корабля длины length в виде (клетки, ореол);
+    - placement_masks(length) -- те же расстановки в виде битовых масок;
+    - symmetries[n] -- куда переходит каждая клетка при n-й из 8 симметрий квадрата: бит 0 --
+      отражение относительно главной диагонали, бит 1 -- по горизонтали, бит 2 -- по вертикали;
+      symmetries[0] -- тождественная.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.cells_count = size ** 2
+
+        self.rows = tuple(tuple(range(y * size, (y + 1) * size)) for y in range(size))
+        self.columns = tuple(tuple(range(x, self.cells_count, size)) for x in range(size))
+
+        rays = []
+        neighbours_4 = []
+        neighbours_8 = []
+        for index in range(self.cells_count):
+            y, x = divmod(index, size)
+            rays.append((
+                tuple(reversed(self.columns[x][:y])),
+                self.columns[x][y + 1:],
+                tuple(reversed(self.rows[y][:x])),
+                self.rows[y][x + 1:],
+            ))
+            neighbours_4.append(tuple(ray[0] for ray in rays[-1] if ray))
+            neighbours_8.append(tuple(
+                (y + dy) * size + x + dx
+                for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                if (dx or dy) and 0 <= x + dx < size and 0 <= y + dy < size
+            ))
+
+        self.rays = tuple(rays)
+        self.neighbours_4 = tuple(neighbours_4)
+        self.neighbours_8 = tuple(neighbours_8)
+
+        symmetries = []
+        for number in range(8):
+            mapping = []
+            for index in range(self.cells_count):
+                y, x = divmod(index, size)
+                if number & 1:
+                    x, y = y, x
+                if number & 2:
+                    x = size - 1 - x
+                if number & 4:
+                    y = size - 1 - y
+                mapping.append(y * size + x)
+            symmetries.append(tuple(mapping))
+        self.symmetries = tuple(symmetries)
+
+        self._placements = {}
+        self._placement_masks = {}
+        # производные таблицы других модулей, которые тоже достаточно посчитать один раз на размер поля
+        self.cache = {}
+
+    def halo(self, cells):
+        """Клетки вокруг корабля, на которых не может стоять другой корабль"""
+        cells_set = set(cells)
+        return tuple(sorted(set(n for i in cells for n in self.neighbours_8[i]) - cells_set))
+
+    def placements(self, length):
+        """Все расстановки корабля длины length: список пар (клетки, ореол)"""
+        placements = self._placements.get(length)
+        if placements is None:
+            placements = []
+            for lines in (self.rows, self.columns if length > 1 else ()):
+                for line in lines:
+                    for start in range(self.size - length + 1):
+                        cells = line[start:start + length]
+                        placements.append((cells, self.halo(cells)))
+            self._placements[length] = placements
+        return placements
+
+    def placement_masks(self, length):
+        """Расстановки корабля длины length: список (маска клеток, маска клеток с ореолом, клетки)"""
+        masks = self._placement_masks.get(length)
+        if masks is None:
+            masks = []
+            for cells, halo in self.placements(length):
+                cells_mask = sum(1 << index for index in cells)
+                masks.append((cells_mask, cells_mask | sum(1 << index for index in halo), cells))
+            self._placement_masks[length] = masks
+        return masks
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get(size):
+    """Таблицы для поля size x size; строятся при первом обращении и кэшируются"""
+    tables = _tables.get(size)
+    if tables is None:
+        with _tables_lock:
+            tables = _tables.get(size)
+            if tables is None:
+                tables = _tables[size] = BoardTables(size)
+    return tables
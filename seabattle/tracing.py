@@ -0,0 +1,235 @@
+# coding: utf-8
+"""Трассировка запросов: сколько времени уходит на каждый этап обработки реплики.
+
+Запрос открывает трассу start_trace, этапы внутри него измеряются span. Закрытая трасса
+пишется одной компактной JSON-записью в логгер seabattle.trace, а длительности этапов
+попадают в гистограммы, по которым metrics() считает перцентили. Вне трассы span ничего
+не делает, так что этапы можно размечать в любом коде.
+"""
+
+from __future__ import unicode_literals
+
+import bisect
+import contextlib
+import itertools
+import json
+import logging
+import os
+import threading
+import timeit
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+trace_log = logging.getLogger('seabattle.trace')
+
+# верхние границы корзин гистограммы в миллисекундах, шаг около 25%
+BUCKETS = tuple(round(0.01 * 1.25 ** i, 4) for i in range(60))
+DEFAULT_QUEUE_SIZE = 10000
+
+_local = threading.local()
+_trace_ids = itertools.count(1)
+
+
+class Histogram(object):
+    """Потокобезопасная гистограмма длительностей с корзинами BUCKETS"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        bucket = bisect.bisect_left(BUCKETS, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, percent):
+        """Верхняя граница корзины, в которую попадает перцентиль; для последней корзины -- максимум"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = self.count * percent / 100.0
+            seen = 0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    return min(BUCKETS[bucket], self.max) if bucket < len(BUCKETS) else self.max
+            return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+def observe(name, milliseconds):
+    _histogram(name).add(milliseconds)
+
+
+def metrics():
+    """Перцентили длительностей по этапам в миллисекундах"""
+    return dict((name, histogram.summary()) for name, histogram in list(_histograms.items()))
+
+
+def reset_metrics():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class Trace(object):
+    def __init__(self, name):
+        self.id = next(_trace_ids)
+        self.name = name
+        self.started = timeit.default_timer()
+        self.spans = []
+        self.attributes = {}
+
+    def record(self):
+        return {
+            'trace': self.id,
+            'name': self.name,
+            'total_ms': round((timeit.default_timer() - self.started) * 1e3, 3),
+            'spans': [[name, round(duration, 3)] for name, duration in self.spans],
+            'attributes': self.attributes,
+        }
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def start_trace(name):
+    _local.trace = Trace(name)
+    return _local.trace
+
+
+def finish_trace():
+    """Закрывает трассу текущего потока, учитывает ее в гистограммах и пишет в лог"""
+    trace = current_trace()
+    if trace is None:
+        return None
+    _local.trace = None
+
+    record = trace.record()
+    observe(trace.name, record['total_ms'])
+    for name, duration in trace.spans:
+        observe(name, duration)
+
+    if trace_log.isEnabledFor(logging.INFO):
+        trace_log.info(json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=repr))
+    return record
+
+
+def annotate(**attributes):
+    """Добавляет к текущей трассе атрибуты, например намерение реплики"""
+    trace = current_trace()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+@contextlib.contextmanager
+def span(name):
+    trace = current_trace()
+    if trace is None:
+        yield
+        return
+
+    started = timeit.default_timer()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, (timeit.default_timer() - started) * 1e3))
+
+
+class QueueHandler(logging.Handler):
+    """Обработчик, который только кладет запись в очередь; выводит их фоновый поток.
+
+    Запрос не ждет ни диска, ни сети. Если очередь переполнена, запись отбрасывается
+    и учитывается в dropped.
+    """
+
+    def __init__(self, handlers, maxsize=DEFAULT_QUEUE_SIZE):
+        logging.Handler.__init__(self)
+        self.handlers = list(handlers)
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._pid = None
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        # после fork поток родителя в дочернем процессе не работает
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        thread = threading.Thread(target=self._run, name='log-queue')
+        thread.daemon = True
+        thread.start()
+
+    def emit(self, record):
+        self._ensure_thread()
+        # форматируем сразу: аргументы записи могут измениться, пока она лежит в очереди
+        try:
+            record.msg = self.format(record)
+            record.args = None
+            record.exc_info = None
+            record.exc_text = None
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            try:
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Ждет, пока фоновый поток выведет все записи из очереди"""
+        self.queue.join()
+        for handler in self.handlers:
+            handler.flush()
+
+
+def setup_logging(level=logging.INFO, fmt='%(asctime)s %(name)s %(levelname)s %(message)s'):
+    """Настраивает корневой логгер так, чтобы вывод шел через очередь в stderr"""
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(fmt))
+
+    handler = QueueHandler([stream_handler])
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+    return handler
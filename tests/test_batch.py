@@ -0,0 +1,51 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import batch, game, placement
+
+import numpy as np
+
+
+def test_resolve():
+    # партия 0: корабль из клеток 0 и 1 и одиночный корабль в клетке 5; партия 1: одиночный корабль в клетке 8
+    boards = batch.Boards([[(0, 1), (5,)], [(8,)]], size=3)
+    assert list(boards.ships_left) == [2, 1]
+
+    replies = boards.resolve(np.array([0, 1]), np.array([0, 7]))
+    assert list(replies) == [batch.HIT_REPLY, batch.MISS_REPLY]
+
+    # повторный выстрел по подбитой палубе снова дает hit
+    replies = boards.resolve(np.array([0]), np.array([0]))
+    assert list(replies) == [batch.HIT_REPLY]
+
+    replies = boards.resolve(np.array([0]), np.array([1]))
+    assert list(replies) == [batch.KILL_REPLY]
+    assert list(boards.ships_left) == [1, 1]
+
+    replies = boards.resolve(np.array([1, 0]), np.array([7, 1]))
+    assert list(replies) == [batch.MISS_REPLY, batch.KILL_REPLY]
+    assert list(boards.ships_left) == [1, 1]
+
+
+def test_shots_to_win():
+    summary = batch.shots_to_win(game.Game, games=30, batch_size=7)
+
+    assert summary['games'] == 30
+    assert summary['unfinished'] == 0
+    assert sum(game.BaseGame.default_ships) <= summary['p10'] <= summary['p50'] <= summary['p90'] <= 100
+
+
+def test_match():
+    result = batch.match(game.Game, game.Game, games=20, batch_size=8)
+
+    assert result['wins_1'] + result['wins_2'] == 20
+    assert result['unfinished'] == 0
+    assert 0 <= result['win_rate_1'] <= 1
+    assert result['shots_1']['games'] == result['wins_1']
+
+
+def test_shots_to_win_other_layouts():
+    generate = placement.LayoutWalk(10, game.BaseGame.default_ships)
+    summary = batch.shots_to_win(game.Game, games=10, batch_size=4, generate=generate)
+
+    assert summary['games'] == 10
+    assert summary['unfinished'] == 0
@@ -0,0 +1,97 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import bitboard
+from seabattle.game import EMPTY, SHIP, BLOCKED, HIT, MISS
+
+import pytest
+
+
+FIELD = [0, 0, 0, 0, 0, 0, 1, 0, 0, 1,
+         1, 1, 1, 0, 0, 0, 0, 0, 0, 1,
+         0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+         0, 0, 0, 1, 0, 1, 0, 1, 0, 0,
+         1, 1, 0, 1, 0, 0, 0, 0, 0, 0,
+         0, 0, 0, 1, 0, 0, 0, 0, 0, 0,
+         0, 1, 0, 1, 0, 1, 1, 1, 0, 0,
+         0, 1, 0, 0, 0, 0, 0, 0, 0, 0,
+         0, 0, 0, 0, 0, 1, 0, 0, 0, 0,
+         1, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+
+
+@pytest.fixture
+def game_with_field():
+    g = bitboard.Game()
+    g.start_new_game(field=list(FIELD))
+
+    return g
+
+
+def test_bit_field_is_list_like():
+    field = bitboard.BitField(10, FIELD)
+
+    assert field == FIELD
+    assert len(field) == 100
+    assert field[6] == SHIP
+    assert field[-1] == EMPTY
+    assert field[10:13] == [SHIP, SHIP, SHIP]
+    assert field[9::10] == FIELD[9::10]
+
+    field[6] = HIT
+    assert field[6] == HIT
+    assert field.indexes(HIT) == [6]
+    assert field.count(SHIP) == sum(FIELD) - 1
+
+    with pytest.raises(IndexError):
+        field[100] = MISS
+
+
+def test_bit_field_mask_operations():
+    field = bitboard.BitField(3)
+
+    # клетка в углу и ее соседи не должны переноситься через край строки
+    assert list(bitboard.iter_bits(field.neighbourhood(1 << 2))) == [1, 2, 4, 5]
+    assert list(bitboard.iter_bits(field.neighbourhood(1 << 4))) == list(range(9))
+
+    field.set_mask(0b000000111, SHIP)
+    assert field == [SHIP, SHIP, SHIP, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY]
+    assert field.component(0, field.mask(SHIP)) == 0b111
+
+    field.set_mask(0b000111000, BLOCKED)
+    field.replace(BLOCKED, EMPTY)
+    assert field.indexes(EMPTY) == [3, 4, 5, 6, 7, 8]
+
+
+def test_generate_field():
+    g = bitboard.Game()
+    for _ in range(20):
+        g.start_new_game()
+        assert g.field.count(SHIP) == sum(g.default_ships)
+        assert g.field.count(BLOCKED) == 0
+
+        ship_cells = g.field.mask(SHIP)
+        ships = set()
+        for index in g.field.indexes(SHIP):
+            ships.add(g.field.component(index, ship_cells))
+        assert sorted(bin(ship).count('1') for ship in ships) == sorted(g.default_ships)
+
+
+def test_shot(game_with_field):
+    assert game_with_field.handle_enemy_shot((10, 1)) == 'hit'
+    assert game_with_field.handle_enemy_shot((10, 1)) == 'hit'
+    assert game_with_field.handle_enemy_shot((10, 2)) == 'kill'
+    assert game_with_field.handle_enemy_shot((1, 10)) == 'kill'
+    assert game_with_field.handle_enemy_shot((4, 2)) == 'miss'
+
+    assert game_with_field.handle_enemy_shot((1, 2)) == 'hit'
+    assert game_with_field.handle_enemy_shot((2, 2)) == 'hit'
+    assert game_with_field.handle_enemy_shot((3, 2)) == 'kill'
+
+
+def test_state_round_trip(game_with_field):
+    game_with_field.handle_enemy_shot((10, 1))
+    game_with_field.do_shot()
+    game_with_field.handle_enemy_reply('miss')
+
+    restored = bitboard.Game.from_bytes(game_with_field.to_bytes())
+    assert isinstance(restored.field, bitboard.BitField)
+    assert vars(restored) == vars(game_with_field)
@@ -0,0 +1,93 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import coordinates
+
+import pytest
+
+
+# что присылает распознавание речи -> позиция; None -- реплику нужно переспросить
+ASR_CORPUS = [
+    ('5 7', (5, 7)),
+    ('10 10', (10, 10)),
+    ('  1   10 ', (1, 10)),
+    ('пять семь', (5, 7)),
+    ('Восемь Четыре', (8, 4)),
+    ('пять 10', (5, 10)),
+    ('пять10', (5, 10)),
+    ('трень 5', (3, 5)),
+    ('трех пяти', (3, 5)),
+    ('трём двум', (3, 2)),
+    ('две восьми', (2, 8)),
+    ('одну десяти', (1, 10)),
+    ('раз два', (1, 2)),
+    ('четырьмя шестью', (4, 6)),
+    ('девяти семи', (9, 7)),
+    # буквы столбцов в числовых координатах не принимаются
+    ('а 1', None),
+    ('a1', None),
+    ('the 4', None),
+    ('уже 4', None),
+    ('1', None),
+    ('1 2 3', None),
+    ('1а 2', None),
+    ('пятнадцать 1', None),
+    ('+5 1', None),
+    ('', None),
+]
+
+# то же с буквой столбца
+LETTER_CORPUS = [
+    ('а 1', (1, 1)),
+    ('a1', (1, 1)),
+    ('к 10', (10, 10)),
+    ('k два', (10, 2)),
+    ('д пять', (5, 5)),
+    ('d 7', (5, 7)),
+    ('уже 4', (7, 4)),
+    ('the 4', (8, 4)),
+    ('за 4', (8, 4)),
+    ('5 7', (5, 7)),
+    ('т шесть', None),
+    ('д пятнадцать', None),
+    ('5 а', None),
+]
+
+
+@pytest.mark.parametrize('text, position', ASR_CORPUS)
+def test_numbers(text, position):
+    parser = coordinates.CoordinateParser()
+    if position is None:
+        with pytest.raises(ValueError):
+            parser.parse(text)
+    else:
+        assert parser.parse(text) == position
+
+
+@pytest.mark.parametrize('text, position', LETTER_CORPUS)
+def test_letters(text, position):
+    parser = coordinates.CoordinateParser(letters=True)
+    if position is None:
+        with pytest.raises(ValueError):
+            parser.parse(text)
+    else:
+        assert parser.parse(text) == position
+
+
+def test_memo():
+    parser = coordinates.CoordinateParser(memo_size=2)
+    assert parser.parse('пять семь') == (5, 7)
+    assert parser.parse('пять семь') == (5, 7)
+    for _ in range(2):
+        with pytest.raises(ValueError) as e:
+            parser.parse('т 1')
+        assert 'X point: т' in '%s' % e.value
+    assert len(parser._memo) == 2
+
+    parser.parse('1 2')
+    assert len(parser._memo) == 1
+
+
+def test_tokenize():
+    assert coordinates.tokenize(' а1  пять ') == ['а', '1', 'пять']
+    assert coordinates.tokenize('1а') == ['1а']
+    assert coordinates.tokenize('') == []
@@ -0,0 +1,63 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import density, game, layouts
+from seabattle.game import EMPTY, SHIP, MISS
+
+import random
+
+
+def _fresh_density(g):
+    fresh = density.Game.from_bytes(g.to_bytes())
+    return fresh.density, dict(fresh.enemy_ships_left), fresh.target_hits
+
+
+def test_initial_density():
+    g = density.Game()
+    g.start_new_game()
+
+    assert dict(g.enemy_ships_left) == {4: 1, 3: 2, 2: 3, 1: 4}
+    # в углу помещается меньше всего расстановок, в центре -- больше всего
+    assert g.density[0] == min(g.density)
+    assert g.density[44] == max(g.density)
+    assert g.density[0] == 1 * 2 + 2 * 2 + 3 * 2 + 4 * 1
+
+
+def test_target_mode():
+    g = density.Game()
+    g.start_new_game()
+
+    g.do_specified_shot((5, 5))
+    g.handle_enemy_reply('hit')
+    g.do_specified_shot((5, 6))
+    g.handle_enemy_reply('hit')
+    assert g.target_hits == [g.calc_index((5, 5)), g.calc_index((5, 6))]
+
+    # корабль стоит вертикально, значит стреляем в продолжение линии
+    for _ in range(10):
+        g.do_shot()
+        assert g.last_shot_position in [(5, 4), (5, 7)]
+
+    g.do_specified_shot((5, 7))
+    g.handle_enemy_reply('kill')
+    assert g.target_hits == []
+    assert dict(g.enemy_ships_left) == {4: 1, 3: 1, 2: 3, 1: 4}
+    assert g.enemy_field[g.calc_index((5, 4))] == MISS
+    assert g.enemy_field[g.calc_index((4, 6))] == MISS
+
+
+def test_incremental_updates_match_rebuild():
+    random.seed(0)
+    target = game.Game()
+    target.start_new_game(field=list(layouts.generate_field()))
+
+    g = density.Game()
+    g.start_new_game()
+    while not target.is_defeat():
+        g.do_shot()
+        assert g.enemy_field[g.calc_index(g.last_shot_position)] == EMPTY
+        g.handle_enemy_reply(target.handle_enemy_shot(g.last_shot_position))
+
+        assert _fresh_density(g) == (g.density, dict(g.enemy_ships_left), g.target_hits)
+
+    assert g.enemy_field.count(SHIP) == sum(g.default_ships)
+    assert not g.enemy_ships_left
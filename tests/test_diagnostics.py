@@ -0,0 +1,51 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import diagnostics
+from seabattle.game import Game
+
+import logging
+
+import mock
+
+
+def test_lazy_is_rendered_only_when_logged():
+    render = mock.Mock(return_value='поле')
+    logger = logging.getLogger('seabattle.tests.lazy')
+    logger.setLevel(logging.INFO)
+
+    logger.debug('%s', diagnostics.Lazy(render))
+    assert not render.called
+
+    assert '%s' % diagnostics.Lazy(render, 1, key=2) == 'поле'
+    render.assert_called_once_with(1, key=2)
+
+
+def test_boards():
+    g = Game()
+    g.start_new_game(size=3, field=[1, 0, 0, 0, 0, 0, 0, 0, 1], ships=[1, 1])
+    g.handle_enemy_shot((1, 1))
+
+    text = '%s' % diagnostics.boards(g)
+    assert text == 'My field:\n-----\n|X..|\n|...|\n|..1|\n-----\nEnemy field:\n-----\n|...|\n|...|\n|...|\n-----'
+    assert 'намерение' in '%s' % diagnostics.nlu_dump({'intent': 'намерение'})
+
+
+def test_debug_sessions():
+    assert not diagnostics.is_debug_session('user')
+    assert diagnostics.get_logger('user', None) is None
+
+    diagnostics.enable_session('user')
+    try:
+        assert diagnostics.is_debug_session('user')
+        assert diagnostics.get_logger('user', None) is diagnostics.debug_log
+    finally:
+        diagnostics.disable_session('user')
+    assert not diagnostics.is_debug_session('user')
+
+    diagnostics.set_sample_rate(0.5)
+    try:
+        sampled = [diagnostics.is_debug_session(i) for i in range(1000)]
+        assert 400 < sum(sampled) < 600
+        assert sampled == [diagnostics.is_debug_session(i) for i in range(1000)]
+    finally:
+        diagnostics.set_sample_rate(0)
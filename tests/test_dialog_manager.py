@@ -2,6 +2,8 @@
 
 from __future__ import unicode_literals
 
+import json
+
 from seabattle import dialog_manager as dm, game as gm
 from seabattle import session
 
@@ -74,3 +76,38 @@ def test_game_1():
     assert say('корабль утонул') == shot(shots[4])
     assert say('мимо. я хожу 1 2') == kill()
     assert say('ура победа') == defeat()
+
+
+def test_fast_parser():
+    def parse(message):
+        response = dm.fast_parser.parse(message)
+        if response is None:
+            return None
+        entities = dict((e['entity'], e['value']) for e in response['entities'])
+        return response['intent']['name'], entities
+
+    assert parse('ранил') == ('hit', {})
+    assert parse('Убил!') == ('kill', {})
+    assert parse('новая игра') == ('newgame', {})
+    assert parse('Новая игра с Алисой') == ('newgame', {'opponent_entity': 'алиса'})
+    assert parse('новая игра соперник яндекс') == ('newgame', {'opponent_entity': 'яндекс'})
+
+    assert parse('мимо 5 7') == ('miss', {'hit_entity': '5 7'})
+    assert parse('Мимо. Я хожу 2 10') == ('miss', {'hit_entity': '2 10'})
+    assert parse('я ухожу семь четыре') == ('miss', {'hit_entity': 'семь четыре'})
+    assert parse('я хожу трень трень') == ('miss', {'hit_entity': 'трень трень'})
+
+    # все, что не подходит под шаблоны, уходит в rasa_nlu
+    assert parse('мимо') is None
+    assert parse('я хожу 1') is None
+    assert parse('Инициализирована новая игра c яндекс') is None
+
+
+def test_fast_parser_covers_examples():
+    parser = dm.FastParser.from_config()
+    with open(dm.INTENTS_CONFIG_PATH) as f:
+        examples = json.load(f)['rasa_nlu_data']['common_examples']
+
+    for example in examples:
+        if not example['entities']:
+            assert parser.parse(example['text'])['intent']['name'] == example['intent']
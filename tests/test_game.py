@@ -1,7 +1,10 @@
 # coding: utf-8
 from __future__ import unicode_literals
-from seabattle.game import Game, MISS
+from seabattle import placement, tables
+from seabattle.game import Game, EMPTY, HIT, MISS, SHIP, _pack_flags
 
+import collections
+import random
 import pytest
 
 
@@ -249,3 +252,244 @@ def test_mark_positions_around_ship_as_missed(game_with_field):
     ]
     for miss_position in positions_to_be_marked_as_miss:
         assert game_with_field.enemy_field[game_with_field.calc_index(miss_position)] == MISS
+
+
+def test_state_round_trip():
+    random.seed(42)
+    players = [Game(), Game()]
+    for player in players:
+        player.start_new_game(numbers=True)
+
+    def round_trip(player):
+        data = player.to_bytes()
+        restored = Game.from_bytes(data)
+        assert vars(restored) == vars(player)
+        assert restored.to_bytes() == data
+        return restored
+
+    active, passive = 0, 1
+    moves = 0
+    while not any(player.is_end_game() for player in players):
+        # каждый ход играем восстановленными копиями, как если бы игра жила во внешнем хранилище
+        players = [round_trip(player) for player in players]
+
+        position = players[active].convert_to_position(players[active].do_shot().replace(',', ''))
+        result = players[passive].handle_enemy_shot(position)
+        players[active].handle_enemy_reply(result)
+        if result == 'miss':
+            active, passive = passive, active
+
+        moves += 1
+        assert moves < 400
+
+    for player in players:
+        assert len(round_trip(player).to_bytes()) < 100
+
+
+def test_state_format_errors(game):
+    data = game.to_bytes()
+
+    with pytest.raises(ValueError):
+        Game.from_bytes(b'\xff' + data[1:])
+
+    with pytest.raises(ValueError):
+        Game.from_bytes(data[:-3])
+
+    with pytest.raises(ValueError):
+        Game.from_bytes(data + b'\x00')
+
+
+@pytest.mark.parametrize('size, ships', [
+    (10, Game.default_ships),
+    (10, [4, 4, 3, 3, 3, 2, 2, 2, 2, 1, 1, 1, 1, 1]),
+    (3, [2, 1, 1]),
+])
+def test_generate_field(size, ships):
+    g = Game()
+    for _ in range(20):
+        g.start_new_game(size=size, ships=ships)
+        board = tables.get(size)
+
+        ship_cells = set(i for i, v in enumerate(g.field) if v == SHIP)
+        found = []
+        while ship_cells:
+            # собираем корабль по соседям и проверяем, что вокруг него пусто
+            ship = set([ship_cells.pop()])
+            stack = list(ship)
+            while stack:
+                for neighbour in board.neighbours_4[stack.pop()]:
+                    if neighbour in ship_cells:
+                        ship_cells.remove(neighbour)
+                        ship.add(neighbour)
+                        stack.append(neighbour)
+            assert all(g.field[i] != SHIP for i in board.halo(sorted(ship)))
+            found.append(len(ship))
+
+        assert sorted(found) == sorted(ships)
+
+
+@pytest.mark.parametrize('size, ships', [
+    (10, [4] * 12),
+    (10, [11]),
+    (3, [2, 2, 1]),
+])
+def test_generate_field_infeasible(size, ships):
+    with pytest.raises(ValueError):
+        Game().start_new_game(size=size, ships=ships)
+
+
+def test_layout_walk():
+    random.seed(4)
+    board = tables.get(10)
+    walk = placement.LayoutWalk(10, Game.default_ships, moves=10)
+    for _ in range(50):
+        layout = walk()
+        assert [len(cells) for cells in layout] == Game.default_ships
+        for ship_id, cells in enumerate(layout):
+            # корабли не касаются друг друга
+            others = set(index for other_id, other in enumerate(layout) if other_id != ship_id for index in other)
+            assert not others & (set(cells) | set(board.halo(cells)))
+
+
+def test_ship_index(game_with_field):
+    g = game_with_field
+    four_deck = g.ship_ids[g.calc_index((4, 4))]
+    assert g.ship_cells[four_deck] == tuple(g.calc_index((4, y)) for y in range(4, 8))
+    assert g.ship_decks[four_deck] == 4
+    assert g.calc_index((3, 3)) in g.ship_halo(four_deck)
+    assert len(g.ship_cells) == 11
+
+    g.handle_enemy_shot((4, 5))
+    assert g.ship_decks[four_deck] == 3
+
+    # индекс кораблей выводится из поля и после восстановления из состояния
+    restored = Game.from_bytes(g.to_bytes())
+    assert restored.ship_decks == g.ship_decks
+    assert restored.ship_ids == g.ship_ids
+
+
+def test_handle_shot_matches_is_dead_ship():
+    random.seed(5)
+    for _ in range(20):
+        g = Game()
+        g.start_new_game()
+        indexes = list(range(100)) * 2
+        random.shuffle(indexes)
+        for index in indexes:
+            was_ship = g.field[index] in (SHIP, HIT)
+            result = g.handle_enemy_shot(g.calc_position(index))
+            if was_ship:
+                assert result == ('kill' if g.is_dead_ship(index) else 'hit')
+            else:
+                assert result == 'miss'
+        assert g.ships_count == 0
+
+
+def test_regular_shots_cover_field():
+    random.seed(3)
+    g = Game()
+    g.start_new_game(field=[0] * 100)
+    # шаблон отражен симметрией партии
+    mapping = g.tables.symmetries[g.symmetry]
+    step_4 = set(g.calc_position(mapping[index]) for index in g.predefined_indexes(step=4))
+    shots = []
+    for _ in range(100):
+        position = g.get_next_regular_shot_position()
+        g.enemy_field[g.calc_index(position)] = MISS
+        shots.append(position)
+
+    # сначала шаблон с шагом 4, и ни одной клетки дважды
+    assert set(shots[:len(step_4)]) == step_4
+    assert len(set(shots)) == 100
+    assert g.shot_queue_cursors == [len(queue) for queue in g.shot_queues]
+    with pytest.raises(IndexError):
+        g.get_next_regular_shot_position()
+
+
+def test_enemy_ships_left():
+    random.seed(7)
+    target = Game()
+    target.start_new_game()
+    g = Game()
+    g.start_new_game()
+    assert g.enemy_ships_left == {4: 1, 3: 2, 2: 3, 1: 4}
+
+    while not target.is_defeat():
+        g.do_shot()
+        g.handle_enemy_reply(target.handle_enemy_shot(g.last_shot_position))
+
+        alive = [len(cells) for ship_id, cells in enumerate(target.ship_cells) if target.ship_decks[ship_id]]
+        assert sorted(g.enemy_ships_left.elements()) == sorted(alive)
+        assert sum(g.enemy_ships_left.values()) == g.enemy_ships_count
+
+
+def _old_state(g, version):
+    """Состояние g в формате версии 1 или 2: флаги использованных выстрелов шаблонов вместо очередей"""
+    data = g.to_bytes()
+    # в версии 1 нет флагов оставшихся кораблей после полей
+    fields_end = 1 + 2 + len(g.ships) + 5 + 2 * 25
+    game_start = fields_end + 2
+    state = bytearray([version]) + data[1:fields_end if version == 1 else game_start] + data[game_start:game_start + 3]
+    for step, queue, cursor in zip((4, 2), g.shot_queues, g.shot_queue_cursors):
+        used = set(queue[:cursor])
+        indexes = g.predefined_indexes(step)
+        state.append(len(indexes))
+        state.extend(_pack_flags([index in used for index in indexes]))
+    return bytes(state)
+
+
+@pytest.mark.parametrize('version', [1, 2])
+def test_read_old_state_versions(version):
+    random.seed(8)
+    target = Game()
+    target.start_new_game()
+    g = Game()
+    g.start_new_game()
+
+    while not target.is_defeat():
+        restored = Game.from_bytes(_old_state(g, version))
+        assert restored.enemy_ships_left == g.enemy_ships_left
+        assert restored.frontier == g.frontier
+
+        # очереди выстрелов проходятся заново, но обстрелянные клетки в них пропускаются
+        g = restored
+        g.do_shot()
+        assert g.enemy_field[g.calc_index(g.last_shot_position)] == EMPTY
+        g.handle_enemy_reply(target.handle_enemy_shot(g.last_shot_position))
+
+
+def test_frontier_follows_replies():
+    random.seed(5)
+    target = Game()
+    target.start_new_game()
+    g = Game()
+    g.start_new_game()
+
+    while not target.is_defeat():
+        g.do_shot()
+        g.handle_enemy_reply(target.handle_enemy_shot(g.last_shot_position))
+        if g.first_ship_hit_position is not None:
+            # обновленный по ответам край корабля совпадает с пройденным заново по полю
+            assert g.frontier == g._walk_frontier(g.calc_index(g.first_ship_hit_position))
+
+        # повторный ответ ничего не меняет
+        frontier = list(g.frontier or [])
+        g.handle_enemy_reply('hit' if g.enemy_field[g.calc_index(g.last_shot_position)] == SHIP else 'miss')
+        assert (g.frontier or []) == frontier
+
+
+def test_shots_skip_cells_without_room(game):
+    # однопалубных и двухпалубных не осталось
+    game.enemy_ships_left = collections.Counter({4: 1, 3: 2})
+
+    # между промахами по вертикали помещается только две палубы
+    for position in [(5, 3), (5, 6)]:
+        game.mark_enemy_position(position, MISS)
+    game.mark_enemy_position((5, 5), SHIP)
+    assert sorted(game.get_next_possible_shots((5, 5))) == [(4, 5), (6, 5)]
+
+    # клетка (1, 1) зажата промахами со всех сторон
+    for position in [(2, 1), (1, 2)]:
+        game.mark_enemy_position(position, MISS)
+    assert not game._fits_any_ship(game.calc_index((1, 1)))
+    assert game._fits_any_ship(game.calc_index((3, 3)))
@@ -0,0 +1,88 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import layouts
+from seabattle.game import Game, SHIP
+
+import random
+import time
+import pytest
+
+
+def test_pool_inline_refill():
+    pool = layouts.LayoutPool(capacity=8, refill='inline')
+
+    field = pool.get()
+    assert field.count(SHIP) == sum(Game.default_ships)
+    assert pool.stats['misses'] == 1
+    assert len(pool) == 8
+
+    # поле отдается копией, и его можно менять
+    field[field.index(SHIP)] = 0
+    assert pool.get().count(SHIP) == sum(Game.default_ships)
+    assert pool.stats['hits'] == 1
+
+
+def test_pool_background_refill():
+    pool = layouts.LayoutPool(capacity=8, low_watermark=4)
+    pool.get()
+
+    deadline = time.time() + 5
+    while len(pool) < 8 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(pool) == 8
+
+
+def test_pool_stop():
+    pool = layouts.LayoutPool(capacity=8, low_watermark=4)
+    pool.get()
+    thread = pool._thread
+    pool.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+
+    # после остановки пул отдает поля, генерируя их сам
+    assert pool.get().count(SHIP) == sum(Game.default_ships)
+    assert pool._thread is thread
+
+
+def test_pool_unknown_refill():
+    with pytest.raises(ValueError):
+        layouts.LayoutPool(refill='never')
+
+
+def test_layout_file(tmpdir):
+    path = str(tmpdir.join('layouts.bin'))
+    fields = [layouts.generate_field() for _ in range(20)]
+    assert layouts.LayoutFile.write(path, iter(fields), size=10) == 20
+
+    layout_file = layouts.LayoutFile(path)
+    assert len(layout_file) == 20
+    assert [tuple(field) for field in layout_file] == fields
+    assert tuple(layout_file.get()) in fields
+
+    g = Game()
+    g.start_new_game(field=layout_file.get())
+    assert g.ships_count == len(Game.default_ships)
+
+
+def test_broken_layout_file(tmpdir):
+    path = tmpdir.join('layouts.bin')
+    path.write_binary(b'garbage-garbage-garbage')
+
+    with pytest.raises(ValueError):
+        layouts.LayoutFile(str(path))
+
+    # файл без записей: выбрать из него нечего
+    assert layouts.LayoutFile.write(str(path), iter([]), size=10) == 0
+    with pytest.raises(ValueError):
+        layouts.LayoutFile(str(path))
+
+
+def test_uniformity():
+    random.seed(0)
+    pool = layouts.LayoutPool(capacity=1000, refill='inline')
+    pool.fill()
+
+    report = layouts.uniformity_report(list(pool._layouts), reference_count=2000)
+    assert report['layouts'] == 1000
+    assert report['max_deviation'] < 0.08
@@ -0,0 +1,116 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import game, layouts, montecarlo
+from seabattle.game import EMPTY, SHIP, MISS
+
+import random
+import time
+
+
+def _samples(g):
+    samples = montecarlo.Samples(g.size ** 2, g._masks()[1])
+    return g.draw_samples(samples, time.time() + 0.05)
+
+
+def test_samples_are_consistent():
+    g = montecarlo.Game()
+    g.start_new_game()
+    for position in [(1, 1), (3, 3), (6, 2)]:
+        g.do_specified_shot(position)
+        g.handle_enemy_reply('miss')
+    g.do_specified_shot((5, 5))
+    g.handle_enemy_reply('hit')
+    g.do_specified_shot((5, 6))
+    g.handle_enemy_reply('hit')
+
+    samples = _samples(g)
+    assert len(samples) > 100
+    misses = [i for i, v in enumerate(g.enemy_field) if v == MISS]
+    hits = set(g.target_hits)
+    for mask, placed in samples.layouts:
+        assert sorted(len(option[2]) for option in placed) == sorted(g.default_ships)
+        assert not any(mask & (1 << i) for i in misses)
+        assert any(hits.issubset(option[2]) for option in placed)
+        # корабли не касаются друг друга
+        for i, option in enumerate(placed):
+            for other in placed[i + 1:]:
+                assert not option[1] & other[0]
+
+    # считаются только клетки добиваемого корабля, и это продолжения вертикали
+    counted = [i for i, count in enumerate(samples.counts) if count and g.enemy_field[i] == EMPTY]
+    assert set(g.calc_position(i)[0] for i in counted) == {5}
+
+
+def test_shot_budget(monkeypatch):
+    monkeypatch.setattr(montecarlo.Game, 'budget', 0.002)
+    g = montecarlo.Game()
+    g.start_new_game()
+    started = time.time()
+    g.do_shot()
+    assert time.time() - started < 0.05
+    assert montecarlo.stats.info()['samples'] > 0
+
+
+def test_samples_survive_miss(monkeypatch):
+    monkeypatch.setattr(montecarlo.Game, 'budget', 0.005)
+    g = montecarlo.Game()
+    g.start_new_game()
+    g.do_shot()
+    g.handle_enemy_reply('miss')
+
+    samples = montecarlo.cache.pop(g._cache_key())
+    index = g.calc_index(g.last_shot_position)
+    assert len(samples) > 0
+    assert not any(mask & (1 << index) for mask, _ in samples.layouts)
+    assert samples.counts[index] == 0
+
+    # после попадания выборка набирается заново
+    g.do_shot()
+    g.handle_enemy_reply('hit')
+    assert montecarlo.cache.pop(g._cache_key()) is None
+
+
+def test_full_game(monkeypatch):
+    monkeypatch.setattr(montecarlo.Game, 'budget', 0.001)
+    random.seed(0)
+    target = game.Game()
+    target.start_new_game(field=list(layouts.generate_field()))
+
+    g = montecarlo.Game()
+    g.start_new_game()
+    shots = 0
+    while not target.is_defeat():
+        g.do_shot()
+        assert g.enemy_field[g.calc_index(g.last_shot_position)] == EMPTY
+        g.handle_enemy_reply(target.handle_enemy_shot(g.last_shot_position))
+        assert vars(montecarlo.Game.from_bytes(g.to_bytes())) == vars(g)
+        shots += 1
+
+    assert shots < 100
+    assert g.enemy_field.count(SHIP) == sum(g.default_ships)
+
+
+def test_simulation_is_reproducible(monkeypatch):
+    game_cls = montecarlo.Game.for_simulation()
+    assert game_cls.samples_per_shot == montecarlo.SIMULATION_SAMPLES
+    assert montecarlo.Game.samples_per_shot == 0
+    monkeypatch.setattr(game_cls, 'samples_per_shot', 200)
+
+    def shots():
+        monkeypatch.setattr(montecarlo, 'cache', montecarlo.SampleCache())
+        random.seed(2)
+        target = game.Game()
+        target.start_new_game(field=list(layouts.generate_field()))
+        g = game_cls()
+        g.start_new_game()
+        positions = []
+        for _ in range(30):
+            g.do_shot()
+            positions.append(g.last_shot_position)
+            g.handle_enemy_reply(target.handle_enemy_shot(g.last_shot_position))
+        return positions
+
+    # выбор выстрела не зависит от времени: медленная машина стреляет так же
+    first = shots()
+    monkeypatch.setattr(montecarlo.time, 'time', lambda: 0.0)
+    assert shots() == first
@@ -0,0 +1,171 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import nlu
+
+import threading
+import time
+
+
+def _normalize(message):
+    return ' '.join(message.lower().replace(',', ' ').split())
+
+
+def _response(intent, entities=()):
+    return {'intent': {'name': intent, 'confidence': 0.9}, 'entities': list(entities), 'text': 'исходная реплика'}
+
+
+class FakeModel(object):
+    def __init__(self):
+        self.version = 1
+        self.now = 0
+
+    def fingerprint(self, path):
+        return self.version
+
+    def clock(self):
+        return self.now
+
+
+def test_cache_uses_normalized_message():
+    cache = nlu.NLUCache(_normalize, fingerprint=lambda path: 'model')
+    assert cache.get('Мимо') is None
+
+    cache.put('Мимо', _response('miss'))
+    response = cache.get('  мимо  ')
+    assert response['intent'] == {'name': 'miss', 'confidence': 0.9}
+    assert response['text'] == '  мимо  '
+
+    # ответ из кэша -- копия, которую можно менять
+    response['intent']['name'] = 'hit'
+    assert cache.get('мимо')['intent']['name'] == 'miss'
+
+    info = cache.info()
+    assert info['hits'] == 2
+    assert info['misses'] == 1
+    assert info['hit_ratio'] == 2 / 3.0
+    assert info['entries'] == 1
+    assert info['memory_bytes'] > 0
+
+
+def test_cache_keeps_entities_of_exact_message():
+    cache = nlu.NLUCache(_normalize, fingerprint=lambda path: 'model')
+    # обе реплики нормализуются в «мимо д 5», но сущность в них стоит на разных позициях
+    cache.put('Мимо, д 5', _response('miss', [{'entity': 'hit', 'value': 'д 5', 'start': 6, 'end': 9}]))
+    assert cache.get('мимо   д 5') is None
+
+    cache.put('мимо   д 5', _response('miss', [{'entity': 'hit', 'value': 'д 5', 'start': 7, 'end': 10}]))
+    assert cache.get('Мимо, д 5')['entities'][0]['start'] == 6
+    assert cache.get('мимо   д 5')['entities'][0]['start'] == 7
+    assert cache.info()['entries'] == 2
+
+
+def test_cache_eviction():
+    cache = nlu.NLUCache(_normalize, capacity=2, fingerprint=lambda path: 'model')
+    cache.put('мимо', _response('miss'))
+    cache.put('ранил', _response('hit'))
+    cache.get('мимо')
+    cache.put('убил', _response('kill'))
+
+    assert cache.get('ранил') is None
+    assert cache.get('мимо') is not None
+    assert cache.stats['evictions'] == 1
+
+    memory = cache.info()['memory_bytes']
+    cache.put('мимо', _response('miss'))
+    assert cache.info()['memory_bytes'] == memory
+
+
+def test_cache_invalidated_when_model_changes():
+    model = FakeModel()
+    cache = nlu.NLUCache(_normalize, fingerprint=model.fingerprint, interval=5, clock=model.clock)
+    cache.put('мимо', _response('miss'))
+
+    model.version = 2
+    model.now = 1
+    # отпечаток проверяется не чаще раза в interval секунд
+    assert cache.get('мимо') is not None
+
+    model.now = 6
+    assert cache.get('мимо') is None
+    assert cache.stats['invalidations'] == 1
+    assert cache.info()['memory_bytes'] == 0
+
+
+def test_model_fingerprint(tmpdir):
+    model = tmpdir.mkdir('model')
+    model.join('model.pkl').write('1')
+    fingerprint = nlu.model_fingerprint(str(model))
+    assert fingerprint == nlu.model_fingerprint(str(model))
+
+    model.join('model.pkl').write('22')
+    changed = nlu.model_fingerprint(str(model))
+    assert changed != fingerprint
+
+    # новая модель в подкаталоге, как ее сохраняет обучение
+    model.mkdir('new').join('model.pkl').write('1')
+    assert nlu.model_fingerprint(str(model)) != changed
+
+
+class FakeBatchModel(object):
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def parse_batch(self, texts):
+        # первая пачка ждет, пока в очереди не накопятся остальные реплики
+        self.release.wait(5)
+        self.batches.append(list(texts))
+        if 'ошибка' in texts:
+            raise ValueError('broken model')
+        return [_response('miss') for _ in texts]
+
+
+def _parse_all(parser, messages):
+    results = {}
+
+    def parse(message):
+        try:
+            results[message] = parser.parse(message)
+        except ValueError as e:
+            results[message] = e
+
+    threads = [threading.Thread(target=parse, args=(message,)) for message in messages]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_batch_parser_groups_concurrent_messages():
+    model = FakeBatchModel()
+    parser = nlu.BatchParser(model.parse_batch, max_batch_size=3, max_wait=0.05)
+    threads, results = _parse_all(parser, ['мимо', 'ранил', 'убил', 'повтори', 'сдаюсь'])
+    time.sleep(0.2)
+    model.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 5
+    assert all(response['intent']['name'] == 'miss' for response in results.values())
+    assert max(len(batch) for batch in model.batches) == 3
+    assert sorted(sum(model.batches, [])) == sorted(results)
+    info = parser.info()
+    assert info['messages'] == 5
+    assert info['mean_batch_size'] > 1
+
+
+def test_batch_parser_error_reaches_every_caller():
+    model = FakeBatchModel()
+    parser = nlu.BatchParser(model.parse_batch, max_batch_size=2, max_wait=0.5)
+    # пока модель занята первой репликой, две следующие собираются в одну пачку
+    first, first_results = _parse_all(parser, ['повтори'])
+    time.sleep(0.1)
+    threads, results = _parse_all(parser, ['ошибка', 'мимо'])
+    time.sleep(0.1)
+    model.release.set()
+    for thread in first + threads:
+        thread.join(5)
+
+    assert [sorted(batch) for batch in model.batches] == [['повтори'], sorted(['ошибка', 'мимо'])]
+    assert first_results['повтори']['intent']['name'] == 'miss'
+    assert all(isinstance(result, ValueError) for result in results.values())
+    assert parser.info()['batches'] == 2
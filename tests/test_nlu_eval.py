@@ -0,0 +1,50 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import nlu_eval
+
+
+class FakeComponent(object):
+    name = 'fake'
+
+    def process(self, message):
+        return message.upper()
+
+
+def test_component_timer():
+    component = FakeComponent()
+    timer = nlu_eval.ComponentTimer()
+    with timer.timing([component], 'process'):
+        assert component.process('мимо') == 'МИМО'
+        component.process('ранил')
+
+    # после замера остается метод класса
+    assert 'process' not in vars(component)
+    [(name, calls, total, mean)] = timer.report()
+    assert (name, calls) == ('fake', 2)
+    assert total >= mean >= 0
+
+
+def test_split_folds():
+    examples = list(range(10))
+    folds = nlu_eval.split_folds(examples, 3)
+    assert len(folds) == 3
+    assert sorted(sum([test for _, test in folds], [])) == examples
+    for train, test in folds:
+        assert sorted(train + test) == examples
+
+    assert nlu_eval.split_folds(examples, 1) == [(examples, examples)]
+
+
+def test_summarize():
+    predictions = [
+        nlu_eval.Prediction('miss', 'miss', 0.95, 0.001),
+        nlu_eval.Prediction('miss', 'miss', 0.5, 0.002),
+        nlu_eval.Prediction('hit', 'kill', 0.9, 0.003),
+        nlu_eval.Prediction('kill', 'kill', 0.85, 0.004),
+    ]
+    summary = nlu_eval.summarize(predictions, threshold=0.8)
+    assert summary['examples'] == 4
+    assert summary['accuracy'] == 0.75
+    assert summary['confident'] == 0.5
+    assert summary['below_threshold'] == 0.25
+    assert summary['p50_ms'] == 3
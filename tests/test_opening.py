@@ -0,0 +1,78 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import game, opening
+
+import pytest
+
+
+@pytest.fixture
+def books():
+    yield
+    opening.use_books({})
+
+
+def test_build_book():
+    layouts = [{0, 1}, {1, 2}, {1, 3}, {3}]
+    # клетка 1 накрывает три расстановки, затем 3 -- последнюю
+    assert opening.build_book(layouts, 4, length=3) == [1, 3]
+    assert opening.build_book(layouts, 4, length=1, candidates=[0, 2, 3]) == [3]
+
+
+def test_read_write_book(tmpdir):
+    path = str(tmpdir.join('book.json'))
+    opening.write_book(path, [5, 7], 10, [4, 3], 100)
+    assert opening.read_book(path) == (10, (4, 3), (5, 7))
+    assert opening.load(path) == {(10, (4, 3)): (5, 7)}
+
+
+def test_load_missing_or_disabled(tmpdir, monkeypatch):
+    assert opening.load(str(tmpdir.join('missing.json'))) == {}
+    monkeypatch.setenv('SEABATTLE_OPENING_BOOK', '')
+    assert opening.load() == {}
+
+
+@pytest.mark.parametrize('content', ['{"size": 10', '{"size": 10, "ships": [4]}', '[1, 2]'])
+def test_load_broken(tmpdir, books, content):
+    path = tmpdir.join('book.json')
+    path.write(content)
+    assert opening.load(str(path)) == {}
+
+    opening.use_books(opening.load(str(path)))
+    assert opening.get_book(10, game.BaseGame.default_ships) == ()
+
+
+def test_default_book(books):
+    opening.use_books(opening.load(opening.BOOK_PATH))
+    shots = opening.get_book(10, game.BaseGame.default_ships)
+    assert shots
+    assert opening.get_book(8, game.BaseGame.default_ships) == ()
+
+
+def test_game_follows_book(books):
+    opening.use_books({(10, tuple(game.BaseGame.default_ships)): (55, 0)})
+    g = game.Game()
+    g.start_new_game()
+    g.symmetry = 0
+    g.enemy_field[0] = game.MISS
+    assert g.get_next_regular_shot_position() == g.calc_position(55)
+    g.enemy_field[55] = game.MISS
+    # книга кончилась -- обычный узор
+    assert g.calc_index(g.get_next_regular_shot_position()) not in (0, 55)
+
+
+@pytest.mark.parametrize('symmetry', range(8))
+def test_book_follows_symmetry(books, symmetry):
+    opening.use_books({(10, tuple(game.BaseGame.default_ships)): (55, 0)})
+    g = game.Game()
+    g.start_new_game()
+    g.symmetry = symmetry
+    assert g.calc_index(g.get_next_regular_shot_position()) == g.tables.symmetries[symmetry][55]
+
+
+def test_symmetry_varies_between_games():
+    symmetries = set()
+    for _ in range(100):
+        g = game.Game()
+        g.start_new_game()
+        symmetries.add(g.symmetry)
+    assert symmetries == set(range(8))
@@ -0,0 +1,111 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import prefork
+
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import queue
+    from http.client import HTTPConnection
+except ImportError:
+    import Queue as queue
+    from httplib import HTTPConnection
+
+import pytest
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# главный процесс с одним обработчиком на свободном порту; лог -- в stdout
+MASTER = '''
+import logging, sys
+from seabattle import prefork
+logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
+master = prefork.Master('127.0.0.1', 0, processes=1, preload=False, workers=1)
+print('Port %s' % master.listener.getsockname()[1])
+sys.stdout.flush()
+master.run()
+'''
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps'), reason='needs /proc smaps')
+def test_memory_report():
+    pid = os.getpid()
+    report = prefork.memory_report([pid, 0])
+
+    # несуществующий процесс в отчет не попадает
+    assert list(report) == [pid]
+    memory = report[pid]
+    assert memory['rss'] > 0
+    assert memory['shared'] + memory['private'] == memory['rss']
+    assert 0 <= memory['shared_fraction'] <= 1
+
+
+class Output(object):
+    """Строки stdout процесса, прочитанные фоновым потоком"""
+
+    def __init__(self, stream):
+        self._lines = queue.Queue()
+        thread = threading.Thread(target=self._read, args=(stream,))
+        thread.daemon = True
+        thread.start()
+
+    def _read(self, stream):
+        for line in iter(stream.readline, b''):
+            self._lines.put(line.decode('utf-8'))
+
+    def wait_for(self, pattern, timeout=10):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                line = self._lines.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                raise AssertionError('No line matching %r in %s s' % (pattern, timeout))
+            match = re.search(pattern, line)
+            if match:
+                return match
+
+
+def _ready(port):
+    connection = HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request('GET', '/ready')
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+    finally:
+        connection.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_master_restarts_worker():
+    env = dict(os.environ, SEABATTLE_WARM_UP='0', SEABATTLE_SESSION_BACKEND='memory')
+    process = subprocess.Popen([sys.executable, '-u', '-c', MASTER], cwd=ROOT, env=env, stdout=subprocess.PIPE)
+    try:
+        output = Output(process.stdout)
+        port = int(output.wait_for(r'^Port (\d+)').group(1))
+
+        worker = int(output.wait_for(r'Started worker (\d+)').group(1))
+        output.wait_for(r'All 1 workers are ready')
+        assert _ready(port) == (200, {'ready': True})
+
+        # упавший обработчик заменяется новым, и тот тоже становится готовым
+        os.kill(worker, signal.SIGKILL)
+        restarted = int(output.wait_for(r'Started worker (\d+)').group(1))
+        assert restarted != worker
+        output.wait_for(r'All 1 workers are ready')
+        assert _ready(port) == (200, {'ready': True})
+
+        process.send_signal(signal.SIGTERM)
+        output.wait_for(r'All workers stopped')
+        assert process.wait() == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
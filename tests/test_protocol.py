@@ -0,0 +1,35 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import dialog_manager as dm, protocol
+
+import json
+
+
+REQUEST = {
+    'version': '1.0',
+    'session': {'user_id': 'игрок', 'session_id': '1', 'new': False},
+    'request': {'command': 'мимо 1 2', 'original_utterance': 'мимо 1 2'},
+}
+
+
+def test_encode_response():
+    for dmresponse in [
+        dm.DMResponse('miss', 'Мимо. Я хожу 5, 7', 'Мимо - Я хожу - 5 - - - - 7', False),
+        dm.DMResponse('victory', 'Ура, победа!', None, True),
+    ]:
+        expected = {
+            'version': REQUEST['version'],
+            'session': REQUEST['session'],
+            'response': protocol._response(dmresponse),
+        }
+        # второй раз поле response берется из кэша
+        for _ in range(2):
+            assert json.loads(protocol.encode_response(REQUEST, dmresponse)) == expected
+
+
+def test_shot_responses_match_templates():
+    for shot in ['5, 7', '10, 10', 'е, 5']:
+        response_dict = {'shot': shot, 'tts_shot': dm._shot_to_tts(shot)}
+        assert dm.SHOT_RESPONSES['miss', shot] == (
+            dm.MESSAGE_TEMPLATES['miss'] % response_dict, dm.TTS_TEMPLATES['miss'] % response_dict)
+    assert len(dm.SHOT_RESPONSES) == 2 * 200
@@ -0,0 +1,193 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import protocol, server
+
+import json
+import threading
+
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+import mock
+import pytest
+
+
+REQUEST = json.dumps({
+    'version': '1.0',
+    'session': {'user_id': 'user'},
+    'request': {'command': 'мимо', 'original_utterance': 'мимо'},
+})
+
+
+@pytest.fixture
+def webhook_server():
+    s = server.WebhookServer(('127.0.0.1', 0), workers=1, queue_size=1, deadline=0.2)
+    yield s
+    s.pool.close()
+    s.server_close()
+
+
+def test_worker_pool_overload():
+    release = threading.Event()
+    pool = server.WorkerPool(workers=1, queue_size=1)
+
+    running = pool.submit(release.wait)
+    # пока первая задача выполняется, вторая ждет в очереди, а третьей места нет
+    while not running.started:
+        threading.Event().wait(0.001)
+    queued = pool.submit(lambda: 42)
+    with pytest.raises(server.Overloaded):
+        pool.submit(lambda: 0)
+
+    release.set()
+    assert queued.wait(1)
+    assert queued.result == 42
+    pool.close()
+
+
+def test_dispatch(webhook_server):
+    with mock.patch.object(protocol, 'handle_webhook', return_value='{"ok": true}') as handle_webhook:
+        assert webhook_server.dispatch(REQUEST) == '{"ok": true}'
+    handle_webhook.assert_called_once_with(REQUEST)
+
+
+def test_dispatch_retries_on_deadline(webhook_server):
+    release = threading.Event()
+    with mock.patch.object(protocol, 'handle_webhook', side_effect=lambda data: release.wait()):
+        # первая реплика выполняется дольше срока, вторая не успевает начаться и отменяется
+        first = json.loads(webhook_server.dispatch(REQUEST))
+        second = json.loads(webhook_server.dispatch(REQUEST))
+        release.set()
+
+    for response in (first, second):
+        assert response['response']['text'] == protocol.RETRY_TEXT
+        assert response['session'] == {'user_id': 'user'}
+    assert webhook_server.stats['late'] == 1
+    assert webhook_server.stats['expired'] == 1
+
+
+def test_dispatch_cancels_reply_waiting_for_user():
+    s = server.WebhookServer(('127.0.0.1', 0), workers=2, queue_size=1, deadline=0.2)
+    release = threading.Event()
+    try:
+        with mock.patch.object(protocol, 'handle_webhook', side_effect=lambda data: release.wait()) as handle_webhook:
+            # свободный поток берет вторую реплику, но она ждет первую реплику того же игрока и еще отменяется
+            s.dispatch(REQUEST)
+            s.dispatch(REQUEST)
+            release.set()
+            s.pool.close()
+        assert handle_webhook.call_count == 1
+    finally:
+        release.set()
+        s.server_close()
+
+    assert s.stats['late'] == 1
+    assert s.stats['expired'] == 1
+
+
+def _reply(message_id, command='д5'):
+    return json.dumps({
+        'version': '1.0',
+        'session': {'user_id': 'user', 'session_id': 's', 'message_id': message_id},
+        'request': {'command': command, 'original_utterance': command},
+    })
+
+
+def test_dispatch_answers_repeat_of_late_reply(webhook_server):
+    release = threading.Event()
+    moves = []
+
+    def handle_webhook(data):
+        if not moves:
+            release.wait()
+        moves.append(json.loads(data)['request']['command'])
+        return json.dumps({'version': '1.0', 'session': json.loads(data)['session'],
+                           'response': {'text': 'ход %s' % len(moves), 'end_session': False}})
+
+    with mock.patch.object(protocol, 'handle_webhook', side_effect=handle_webhook):
+        late = json.loads(webhook_server.dispatch(_reply(1)))
+        release.set()
+        # игрок повторяет ход после просьбы: ответ берется у опоздавшей реплики, ход не делается второй раз
+        repeated = json.loads(webhook_server.dispatch(_reply(2)))
+        following = json.loads(webhook_server.dispatch(_reply(3, 'е5')))
+
+    assert late['response']['text'] == protocol.RETRY_TEXT
+    assert repeated['response']['text'] == 'ход 1'
+    assert repeated['session']['message_id'] == 2
+    assert following['response']['text'] == 'ход 2'
+    assert moves == ['д5', 'е5']
+    assert webhook_server.stats['late'] == 1
+    assert webhook_server.stats['repeated'] == 1
+    assert len(webhook_server.late_replies) == 0
+
+
+def test_late_replies_match_only_repeats():
+    replies = server.LateReplies(capacity=1)
+    task = server.Task(None, ())
+    replies.put('a', 1, 'д5', task)
+    assert replies.pop('a', 1, 'д5') is task
+    replies.put('a', 1, 'д5', task)
+    assert replies.pop('a', 2, 'е5') is None
+    assert len(replies) == 0
+
+    # при переполнении забывается самый давний игрок
+    replies.put('a', 1, 'д5', task)
+    replies.put('b', 1, 'д5', task)
+    assert replies.pop('a', 1, 'д5') is None
+    assert replies.pop('b', 2, 'д5') is task
+
+
+def test_dispatch_retries_on_error(webhook_server):
+    with mock.patch.object(protocol, 'handle_webhook', side_effect=RuntimeError):
+        response = json.loads(webhook_server.dispatch(REQUEST))
+
+    assert response['response']['text'] == protocol.RETRY_TEXT
+    assert webhook_server.stats['errors'] == 1
+
+
+def test_retry_response_for_broken_request():
+    response = json.loads(protocol.retry_response('{'))
+    assert response == {'response': {'text': protocol.RETRY_TEXT, 'end_session': False}}
+
+
+def _request(port, method, path, body=None):
+    connection = HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request(method, path, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+    finally:
+        connection.close()
+
+
+def test_http_round_trip(monkeypatch):
+    monkeypatch.setenv('SEABATTLE_WARM_UP', '0')
+    s = server.WebhookServer(('127.0.0.1', 0), workers=1, queue_size=4, deadline=5)
+    port = s.server_address[1]
+    thread = threading.Thread(target=s.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        # до прогрева сервер не готов принимать игроков
+        assert _request(port, 'GET', '/ready') == (503, {'ready': False})
+        server.warm_up(s).join(5)
+        assert _request(port, 'GET', '/ready') == (200, {'ready': True})
+
+        # «новая игра» разбирает быстрый путь, модель NLU не нужна
+        body = json.dumps({
+            'version': '1.0',
+            'session': {'user_id': 'http', 'session_id': '1', 'message_id': 0, 'new': False},
+            'request': {'command': 'новая игра', 'original_utterance': 'новая игра'},
+        }).encode('utf-8')
+        status, response = _request(port, 'POST', '/', body)
+        assert status == 200
+        assert response['version'] == '1.0'
+        assert response['session']['user_id'] == 'http'
+        assert 'новая игра' in response['response']['text']
+        assert response['response']['end_session'] is False
+        assert s.stats['requests'] == 1
+    finally:
+        s.shutdown_gracefully()
+        s.server_close()
@@ -0,0 +1,113 @@
+# coding: utf-8
+
+from __future__ import unicode_literals
+
+from seabattle import game as gm, session
+
+import pytest
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, clock, tmpdir):
+    if request.param == 'memory':
+        return session.MemoryStore(capacity=2, ttl=10, clock=clock)
+    return session.SQLiteStore(str(tmpdir.join('sessions.db')), capacity=2, ttl=10, clock=clock)
+
+
+def test_get_put(store):
+    assert store.get('user1') is None
+
+    store.put('user1', {'game': None, 'last': None, 'opponent': 'яндекс'})
+    assert store.get('user1')['opponent'] == 'яндекс'
+    assert store.stats['hits'] == 1
+    assert store.stats['misses'] == 1
+
+
+def test_lru_eviction(store, clock):
+    store.put('user1', {'opponent': 1})
+    clock.now += 1
+    store.put('user2', {'opponent': 2})
+    clock.now += 1
+    # обращение к user1 делает user2 самой давней сессией
+    assert store.get('user1') is not None
+    clock.now += 1
+    store.put('user3', {'opponent': 3})
+
+    assert len(store) == 2
+    assert store.get('user2') is None
+    assert store.get('user1') is not None
+    assert store.stats['evictions'] == 1
+
+
+def test_ttl(store, clock):
+    store.put('user1', {'opponent': 1})
+    store.put('user2', {'opponent': 2})
+
+    clock.now += 8
+    assert store.touch('user1')
+    clock.now += 8
+
+    assert store.get('user1') is not None
+    assert store.get('user2') is None
+    assert store.stats['expirations'] == 1
+
+
+def test_expire(store, clock):
+    store.put('user1', {'opponent': 1})
+    store.put('user2', {'opponent': 2})
+
+    assert store.expire('user1') == 1
+    assert store.get('user1') is None
+
+    clock.now += 20
+    assert store.expire() == 1
+    assert len(store) == 0
+
+
+def test_sqlite_store_is_shared(tmpdir):
+    path = str(tmpdir.join('sessions.db'))
+    worker_1 = session.SQLiteStore(path)
+    worker_2 = session.SQLiteStore(path)
+
+    worker_1.put(42, {'game': None, 'last': None, 'opponent': 'алиса'})
+    assert worker_2.get(42)['opponent'] == 'алиса'
+
+
+def test_module_api():
+    session.configure(backend='memory', capacity=10)
+
+    session_obj = session.get('user1')
+    assert session_obj == {'game': None, 'last': None, 'opponent': None}
+
+    session_obj['opponent'] = 'яндекс'
+    session.put('user1', session_obj)
+    assert session.get('user1')['opponent'] == 'яндекс'
+
+    assert session.expire('user1') == 1
+    assert session.get('user1')['opponent'] is None
+
+
+def test_sqlite_store_keeps_game(tmpdir):
+    store = session.SQLiteStore(str(tmpdir.join('sessions.db')))
+
+    game_obj = gm.Game()
+    game_obj.start_new_game(numbers=True)
+    game_obj.do_shot()
+    store.put('user1', {'game': game_obj, 'last': None, 'opponent': 'алиса'})
+
+    restored = store.get('user1')['game']
+    assert isinstance(restored, gm.Game)
+    assert vars(restored) == vars(game_obj)
@@ -0,0 +1,57 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import simulate
+
+import sys
+import pytest
+
+
+def test_elo_ratings():
+    ratings = simulate.elo_ratings(['a', 'b', 'c'], [[0, 30, 50], [20, 0, 40], [0, 10, 0]])
+
+    assert ratings['a'] > ratings['b'] > ratings['c']
+    assert sum(ratings.values()) / 3 == pytest.approx(simulate.ELO_BASE)
+
+    # равный счет -- равные рейтинги
+    ratings = simulate.elo_ratings(['a', 'b'], [[0, 10], [10, 0]])
+    assert ratings['a'] == pytest.approx(ratings['b'])
+
+
+def test_tournament_is_reproducible():
+    names = ['seabattle.game', 'seabattle.density', 'seabattle.bitboard']
+
+    wins, ratings = simulate.tournament(names, games=6, seed=1, processes=2, chunk_size=4)
+    for i in range(len(names)):
+        assert wins[i][i] == 0
+        for j in range(i + 1, len(names)):
+            assert wins[i][j] + wins[j][i] == 6
+
+    assert simulate.tournament(names, games=6, seed=1, processes=1, chunk_size=3) == (wins, ratings)
+
+
+def test_tournament_with_montecarlo_is_reproducible():
+    names = ['seabattle.game', 'seabattle.montecarlo']
+
+    result = simulate.tournament(names, games=2, seed=3, processes=2, chunk_size=1)
+    assert result[0][0][1] + result[0][1][0] == 2
+    assert simulate.tournament(names, games=2, seed=3, processes=1, chunk_size=2) == result
+
+
+def test_load_strategy_for_simulation():
+    from seabattle import game, montecarlo
+
+    assert simulate.load_strategy('seabattle.game') is game.Game
+    assert simulate.load_strategy('seabattle.montecarlo').samples_per_shot == montecarlo.SIMULATION_SAMPLES
+
+
+def test_print_tournament_without_games(capsys):
+    simulate.print_tournament(['seabattle.game', 'seabattle.density'], games=0, seed=0, processes=1)
+    lines = capsys.readouterr()[0].splitlines()
+    assert len(lines) == 3
+    assert '%' not in ''.join(lines)
+
+
+def test_games_must_be_positive(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['simulate', 'seabattle.game', 'seabattle.density', '--tournament', '--games', '0'])
+    with pytest.raises(SystemExit):
+        simulate.main()
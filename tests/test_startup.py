@@ -0,0 +1,44 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+# импорт модулей навыка без модели NLU; TensorFlow и spaCy грузятся секундами
+IMPORT_BUDGET = 1.0
+HEAVY_MODULES = ('rasa_nlu', 'tensorflow', 'spacy', 'sklearn')
+
+SCRIPT = '''
+import json, sys, time
+started = time.time()
+import %s
+print(json.dumps({
+    'seconds': time.time() - started,
+    'heavy': sorted(m for m in sys.modules if m.split('.')[0] in %r),
+}))
+'''
+
+
+def _import(module):
+    env = dict(os.environ, SEABATTLE_WARM_UP='0')
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT % (module, HEAVY_MODULES)], cwd=ROOT, env=env)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', [
+    'seabattle.game',
+    'seabattle.simulate',
+    'seabattle.dialog_manager',
+    'seabattle.protocol',
+    'seabattle.server',
+])
+def test_import_budget(module):
+    result = _import(module)
+    assert result['heavy'] == []
+    assert result['seconds'] < IMPORT_BUDGET
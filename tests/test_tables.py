@@ -0,0 +1,60 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import tables
+from seabattle.game import UP, DOWN, LEFT, RIGHT
+
+
+def test_tables_are_cached():
+    assert tables.get(10) is tables.get(10)
+    assert tables.get(10) is not tables.get(3)
+
+
+def test_neighbours():
+    t = tables.get(3)
+
+    assert sorted(t.neighbours_4[0]) == [1, 3]
+    assert sorted(t.neighbours_4[4]) == [1, 3, 5, 7]
+    assert sorted(t.neighbours_8[0]) == [1, 3, 4]
+    assert sorted(t.neighbours_8[4]) == [0, 1, 2, 3, 5, 6, 7, 8]
+    assert sorted(t.neighbours_8[5]) == [1, 2, 4, 7, 8]
+
+
+def test_lines():
+    t = tables.get(3)
+
+    assert t.rows[1] == (3, 4, 5)
+    assert t.columns[2] == (2, 5, 8)
+
+    assert t.rays[4][UP] == (1,)
+    assert t.rays[4][DOWN] == (7,)
+    assert t.rays[5][LEFT] == (4, 3)
+    assert t.rays[3][RIGHT] == (4, 5)
+    assert t.rays[2][RIGHT] == ()
+
+
+def test_placements():
+    t = tables.get(10)
+
+    assert len(t.placements(1)) == 100
+    assert len(t.placements(4)) == 2 * 10 * 7
+
+    for cells, halo in t.placements(3):
+        assert len(cells) == 3
+        assert not set(cells) & set(halo)
+        assert 3 + 2 <= len(halo) <= 3 * (3 + 2) - 3
+
+    assert tables.get(3).halo((0, 1)) == (2, 3, 4, 5)
+
+
+def test_symmetries():
+    t = tables.get(3)
+
+    assert t.symmetries[0] == tuple(range(9))
+    assert len(set(t.symmetries)) == 8
+    for mapping in t.symmetries:
+        assert sorted(mapping) == list(range(9))
+
+    # отражение по главной диагонали, по горизонтали и по вертикали
+    assert t.symmetries[1][1] == 3
+    assert t.symmetries[2][0] == 2
+    assert t.symmetries[4][0] == 6
@@ -0,0 +1,104 @@
+# coding: utf-8
+from __future__ import unicode_literals
+from seabattle import tracing
+
+import json
+import logging
+import time
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    tracing.reset_metrics()
+    yield
+    tracing.reset_metrics()
+
+
+def test_span_without_trace_is_noop():
+    with tracing.span('nothing'):
+        pass
+    tracing.annotate(intent='hit')
+
+    assert tracing.finish_trace() is None
+    assert tracing.metrics() == {}
+
+
+def test_trace_records_spans():
+    tracing.start_trace('request')
+    with tracing.span('parse'):
+        time.sleep(0.002)
+    with tracing.span('handler'):
+        pass
+    tracing.annotate(intent='hit')
+    record = tracing.finish_trace()
+
+    assert [name for name, _ in record['spans']] == ['parse', 'handler']
+    assert record['spans'][0][1] >= 2
+    assert record['total_ms'] >= record['spans'][0][1]
+    assert record['attributes'] == {'intent': 'hit'}
+    assert tracing.current_trace() is None
+
+    metrics = tracing.metrics()
+    assert set(metrics) == {'request', 'parse', 'handler'}
+    assert metrics['parse']['count'] == 1
+
+
+def test_histogram_percentiles():
+    histogram = tracing.Histogram()
+    assert histogram.percentile(50) is None
+
+    for value in range(1, 101):
+        histogram.add(value)
+
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert summary['mean'] == pytest.approx(50.5)
+    assert summary['max'] == 100
+    # перцентиль -- граница корзины, которая не дальше 25% от точного значения
+    assert 50 <= summary['p50'] <= 50 * 1.25
+    assert 90 <= summary['p90'] <= 90 * 1.25
+    assert 99 <= summary['p99'] <= 100
+
+
+def test_queue_handler():
+    records = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    handler = tracing.QueueHandler([ListHandler()], maxsize=100)
+    logger = logging.getLogger('seabattle.tests.queue')
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        logger.warning('shot %s', 'а, 1')
+        handler.flush()
+    finally:
+        logger.removeHandler(handler)
+
+    assert records == ['shot а, 1']
+
+
+def test_trace_log_record_is_compact_json():
+    messages = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            messages.append(record.getMessage())
+
+    handler = ListHandler()
+    tracing.trace_log.addHandler(handler)
+    tracing.trace_log.setLevel(logging.INFO)
+    try:
+        tracing.start_trace('request')
+        tracing.finish_trace()
+    finally:
+        tracing.trace_log.removeHandler(handler)
+        tracing.trace_log.setLevel(logging.NOTSET)
+
+    assert len(messages) == 1
+    assert ' ' not in messages[0]
+    assert json.loads(messages[0])['name'] == 'request'